@@ -0,0 +1,89 @@
+"""
+Per-frame cost of the coach.py landmark classifiers.
+
+Builds random MediaPipe landmark protobufs (hands, face mesh, pose) and
+times, per frame:
+
+  convert  - landmarks_to_array for one hand, one face and one pose
+  single   - analyze_* on one frame at a time (convert + classify)
+  batched  - classify_* over all frames at once, arrays already converted
+
+    uv run bench/coach_frame.py --frames 2000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+import coach
+
+from mediapipe.framework.formats import landmark_pb2
+
+def landmark_list(points):
+    landmarks = landmark_pb2.NormalizedLandmarkList()
+
+    for x, y, z in points:
+        landmarks.landmark.add(x=x, y=y, z=z)
+
+    return landmarks
+
+def timed(function, repeat):
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best  = min(best, time.perf_counter() - start)
+
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng   = np.random.default_rng(0)
+    shape = (180, 320, 3)
+
+    hands = rng.random((args.frames, 21, 3), dtype=np.float32)
+    faces = rng.random((args.frames, 468, 3), dtype=np.float32)
+    poses = rng.random((args.frames, 33, 3), dtype=np.float32)
+    prev  = rng.random((args.frames, 2), dtype=np.float32)
+
+    hand_pb = [landmark_list(h) for h in hands]
+    face_pb = [landmark_list(f) for f in faces]
+    pose_pb = [landmark_list(p) for p in poses]
+
+    def convert():
+        for h, f, p in zip(hand_pb, face_pb, pose_pb):
+            coach.landmarks_to_array(h)
+            coach.landmarks_to_array(f)
+            coach.landmarks_to_array(p)
+
+    def single():
+        for h, f, p, w in zip(hand_pb, face_pb, pose_pb, prev):
+            coach.analyze_hand_gestures(h, shape, tuple(w))
+            coach.analyze_eye_contact(f, shape)
+            coach.analyze_interview_posture(p)
+
+    def batched():
+        coach.classify_gestures(hands, prev)
+        coach.classify_eye_contact(faces, shape)
+        coach.classify_posture(poses)
+
+    results = {
+        name: round(timed(function, args.repeat) / args.frames * 1e6, 3)
+        for name, function in [("convert", convert), ("single", single), ("batched", batched)]
+    }
+
+    print(json.dumps({"frames": args.frames, "us_per_frame": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Cohort statistics over a synthetic analytics database: load --sessions
+interviews (and as many coach reports) spread over --days days into a fresh
+CohortStore, then time answer_stats / coach_stats queries, median of
+--repeat runs each. The same aggregates computed from the raw answers table
+are timed alongside, and checked against the rollups.
+
+    uv run bench/cohorts.py --sessions 100000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import tempfile
+
+from datetime import date, timedelta
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+FOCUS_AREAS  = ["Python", "Java", "SQL", "System Design", "Algorithms", "React", "Leadership",
+                "Communication", "Testing", "Cloud", "Security", "Machine Learning"]
+INTERVIEWERS = ["todd", "jeff", "karen"]
+TYPES        = ["technical", "behavioral"]
+WEIGHTS      = [2, 4, 3, 1, 0.5]
+
+def sessions(count, days, answers):
+    today = date.today()
+
+    for i in range(count):
+        day      = today - timedelta(days=random.randrange(days))
+        session  = {
+            "session_id"     : f"s{i}",
+            "day"            : day,
+            "interview_type" : random.choice(TYPES),
+            "interviewer"    : random.choice(INTERVIEWERS),
+            "focus_areas"    : random.sample(FOCUS_AREAS, random.randint(1, 3)),
+        }
+
+        yield [
+            {
+                **session,
+                "question_id"  : q,
+                "grade"        : random.choices("ABCDF", WEIGHTS)[0],
+                "strengths"    : random.randint(0, 4),
+                "improvements" : random.randint(0, 4),
+            }
+            for q in range(answers)
+        ], {
+            "key"         : f"c{i}",
+            "day"         : day,
+            "duration"    : random.randint(30, 900),
+            "eye_contact" : random.randint(20, 100),
+            "posture"     : random.randint(30, 100),
+        }
+
+def timed(function, repeat):
+    times = []
+
+    for _ in range(repeat):
+        start  = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - start) * 1000)
+
+    return round(statistics.median(times), 3), result
+
+def raw_by_focus_area(db, since):
+    """The answer_stats(["focus_area"], since) numbers straight from the answers table."""
+    rows = db.execute(
+        """
+        SELECT area.value, COUNT(*), AVG(CASE grade WHEN 'A' THEN 4 WHEN 'B' THEN 3 WHEN 'C' THEN 2 WHEN 'D' THEN 1 ELSE 0 END)
+        FROM answers, json_each(answers.focus_areas) AS area
+        WHERE day >= ?
+        GROUP BY area.value
+        ORDER BY area.value
+        """,
+        (since,)
+    ).fetchall()
+
+    return [(area, count, round(mean, 3)) for area, count, mean in rows]
+
+def raw_by_type(db):
+    return db.execute(
+        """
+        SELECT interview_type, interviewer, COUNT(*)
+        FROM answers
+        GROUP BY interview_type, interviewer
+        ORDER BY interview_type, interviewer
+        """
+    ).fetchall()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--answers", type=int, default=5, help="answers per session")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--batch", type=int, default=1000, help="sessions per transaction")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+
+    os.chdir(SRC)
+    sys.path.insert(0, SRC)
+
+    from cohorts import CohortStore
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = CohortStore(os.path.join(directory, "cohorts.db"))
+
+        start   = time.perf_counter()
+        answers = []
+        coach   = []
+
+        for session_answers, report in sessions(args.sessions, args.days, args.answers):
+            answers += session_answers
+            coach.append(report)
+
+            if len(coach) == args.batch:
+                store.record_answers(answers)
+                store.record_coach(coach)
+                answers, coach = [], []
+
+        store.record_answers(answers)
+        store.record_coach(coach)
+
+        load_s = time.perf_counter() - start
+        week   = date.today() - timedelta(days=7)
+        db     = store.connection()
+
+        queries = {
+            "focus_area, last 7 days"        : lambda: store.answer_stats(["focus_area"], since=week),
+            "focus_area, all time"           : lambda: store.answer_stats(["focus_area"]),
+            "interview_type x interviewer"   : lambda: store.answer_stats(["interview_type", "interviewer"]),
+            "week, all time"                 : lambda: store.answer_stats(["week"]),
+            "week, focus_area=Python"        : lambda: store.answer_stats(["week"], focus_area="Python"),
+            "day x focus_area, last 30 days" : lambda: store.answer_stats(["day", "focus_area"], since=date.today() - timedelta(days=30)),
+            "coach by week"                  : lambda: store.coach_stats(["week"]),
+        }
+
+        results = {name: timed(query, args.repeat)[0] for name, query in queries.items()}
+
+        raw_ms, raw = timed(lambda: raw_by_focus_area(db, 0), max(1, args.repeat // 4))
+        rollup      = [(r["focus_area"], r["answers"], r["mean_score"]) for r in store.answer_stats(["focus_area"])]
+
+        raw_type_ms, raw_type = timed(lambda: raw_by_type(db), max(1, args.repeat // 4))
+        rollup_type           = [(r["interview_type"], r["interviewer"], r["answers"]) for r in store.answer_stats(["interview_type", "interviewer"])]
+
+        size = sum(os.path.getsize(path) for path in (store.path, store.path + "-wal") if os.path.exists(path))
+
+        print(json.dumps({
+            "config"          : vars(args),
+            "answers"         : args.sessions * args.answers,
+            "load_s"          : round(load_s, 2),
+            "answers_per_s"   : round(args.sessions * args.answers / load_s),
+            "db_mb"           : round(size / 1024 / 1024, 1),
+            "rollup_rows"     : db.execute("SELECT COUNT(*) FROM answer_rollup").fetchone()[0],
+            "query_ms"        : results,
+            "raw_query_ms"    : {
+                "focus_area, all time"         : raw_ms,
+                "interview_type x interviewer" : raw_type_ms,
+            },
+            "rollups_match"   : raw == rollup and raw_type == rollup_type,
+        }, indent=2))
+
+if __name__ == "__main__":
+    main()
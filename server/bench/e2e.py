@@ -0,0 +1,372 @@
+"""
+End-to-end benchmark of the interview server against a stub Ollama.
+
+Starts the stub (bench/stub_ollama.py), a local page server for the job
+posting and the Flask app itself, then drives complete interviews:
+
+    start_interview -> (next_question, next_response) x N -> next_question
+    -> feedback -> summarize, plus one /api/coach upload per session
+
+at the requested concurrency. Fixture media (resume PDF, spoken-answer
+webm, coach webm) is generated with ffmpeg into a temporary directory.
+Per-stage p50/p95/p99 and throughput are printed as JSON; pass --compare
+with the output of an earlier run to see the change per stage.
+
+    uv run bench/e2e.py --sessions 8 --concurrency 4 --out run.json
+    uv run bench/e2e.py --sessions 8 --concurrency 4 --compare run.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import base64
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+
+from concurrent.futures import ThreadPoolExecutor
+from http.server        import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from functools          import partial
+
+import stub_ollama
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+JOB_PAGE = """<html>
+<head><title>Senior Software Engineer, Platform, Core Workflows, Remote | Benchmark Careers</title></head>
+<body>
+<h3>Company Description</h3>
+<p>Benchmark Corp builds workflow software used by thousands of enterprises around the world.</p>
+<h3>Job Description</h3>
+<p>Team overview.</p>
+<p>You will design, build and operate the services behind our workflow platform.</p>
+<ul>
+<li>Design and build scalable backend services in Python</li>
+<li>Own the reliability and performance of production systems</li>
+<li>Mentor engineers and lead technical design reviews</li>
+</ul>
+<h3>Qualifications</h3>
+<ul>
+<li>Five or more years building production backend services</li>
+<li>Experience with distributed systems and observability</li>
+</ul>
+<ul>
+<li>Experience running machine learning models in production</li>
+</ul>
+</body>
+</html>
+"""
+
+RESUME = [
+    "Jane Doe - Software Engineer",
+    "Experience: Backend engineer at Example Inc, 2018-2024.",
+    "Built Python services handling 10k requests per second.",
+    "Skills: Python, Flask, PostgreSQL, Kubernetes, Prometheus.",
+]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def make_pdf(lines):
+    """A one-page PDF with the given lines of text, enough for pypdf to extract."""
+    text    = "\n".join(f"({line}) Tj T*" for line in lines)
+    stream  = f"BT /F1 11 Tf 14 TL 72 720 Td {text} ET".encode()
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+
+    output  = b"%PDF-1.4\n"
+    offsets = []
+
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+
+    xref    = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    return output
+
+def ffmpeg(*args):
+    subprocess.run(["ffmpeg", "-loglevel", "error", "-y", *args], check=True)
+
+def make_fixtures(directory, answer_seconds, video_seconds):
+    paths = {
+        "resume" : os.path.join(directory, "resume.pdf"),
+        "answer" : os.path.join(directory, "answer.webm"),
+        "video"  : os.path.join(directory, "coach.webm"),
+        "job"    : os.path.join(directory, "job.html"),
+    }
+
+    with open(paths["resume"], "wb") as f:
+        f.write(make_pdf(RESUME))
+
+    with open(paths["job"], "w") as f:
+        f.write(JOB_PAGE)
+
+    ffmpeg(
+        "-f", "lavfi", "-i", f"sine=frequency=220:duration={answer_seconds}",
+        "-c:a", "libopus", paths["answer"]
+    )
+    ffmpeg(
+        "-f", "lavfi", "-i", f"testsrc=size=1280x720:rate=30:duration={video_seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=220:duration={video_seconds}",
+        "-c:v", "libvpx", "-b:v", "1M", "-c:a", "libopus", paths["video"]
+    )
+
+    return paths
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    body     = b""
+
+    for name, value in fields.items():
+        body += f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n".encode()
+
+    for name, (filename, data) in files.items():
+        body += (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode() + data + b"\r\n"
+
+    body += f"--{boundary}--\r\n".encode()
+
+    return body, f"multipart/form-data; boundary={boundary}"
+
+class Client:
+    def __init__(self, base, timings):
+        self.base    = base
+        self.timings = timings
+
+    def call(self, stage, method, path, body=None, content_type=None):
+        request = urllib.request.Request(self.base + path, data=body, method=method)
+
+        if content_type:
+            request.add_header("Content-Type", content_type)
+
+        start = time.perf_counter()
+
+        try:
+            with urllib.request.urlopen(request, timeout=900) as response:
+                data = json.loads(response.read())
+                ok   = True
+        except Exception as e:
+            data = {"error": str(e)}
+            ok   = False
+
+        self.timings.append((stage, time.perf_counter() - start, ok))
+
+        return data if ok else None
+
+def interview(base, fixtures, job_url, answers, timings):
+    client = Client(base, timings)
+
+    with open(fixtures["resume"], "rb") as f:
+        body, content_type = multipart(
+            {
+                "interviewer"    : "todd",
+                "interview_type" : "technical",
+                "focus_areas"    : json.dumps(["Python", "System Design"]),
+                "job_link"       : job_url,
+            },
+            {"file": ("resume.pdf", f.read())}
+        )
+
+    started = client.call("start_interview", "POST", "/api/start_interview", body, content_type)
+
+    if started is None:
+        return False
+
+    session = started["session_id"]
+
+    with open(fixtures["answer"], "rb") as f:
+        recording = json.dumps({"data": "data:audio/webm;base64," + base64.b64encode(f.read()).decode()}).encode()
+
+    for _ in range(answers):
+        question = client.call("next_question", "GET", f"/api/interview/{session}/next_question")
+
+        if question is None or question.get("finished"):
+            break
+
+        client.call("next_response", "POST", f"/api/interview/{session}/next_response", recording, "application/json")
+
+    client.call("next_question", "GET", f"/api/interview/{session}/next_question")
+    client.call("feedback", "GET", f"/api/interview/{session}/feedback?budget=300")
+    client.call("summarize", "GET", f"/api/interview/{session}/summarize")
+
+    with open(fixtures["video"], "rb") as f:
+        body, content_type = multipart({}, {"file": ("coach.webm", f.read())})
+
+    client.call("coach", "POST", "/api/coach", body, content_type)
+
+    return True
+
+def percentile(values, p):
+    """Nearest-rank percentile."""
+    values = sorted(values)
+    rank   = max(0, math.ceil(p / 100 * len(values)) - 1)
+
+    return values[rank]
+
+def report(timings, wall, sessions, completed, config):
+    stages = {}
+
+    for stage, elapsed, ok in timings:
+        stages.setdefault(stage, {"times": [], "errors": 0})
+
+        if ok:
+            stages[stage]["times"].append(elapsed)
+        else:
+            stages[stage]["errors"] += 1
+
+    summary = {}
+
+    for stage, data in stages.items():
+        times = data["times"]
+
+        summary[stage] = {
+            "count"  : len(times),
+            "errors" : data["errors"],
+            "mean"   : round(sum(times) / len(times), 4) if times else None,
+            "p50"    : round(percentile(times, 50), 4) if times else None,
+            "p95"    : round(percentile(times, 95), 4) if times else None,
+            "p99"    : round(percentile(times, 99), 4) if times else None,
+        }
+
+    return {
+        "config"     : config,
+        "wall_s"     : round(wall, 3),
+        "sessions"   : sessions,
+        "completed"  : completed,
+        "throughput" : {
+            "sessions_per_min" : round(completed / wall * 60, 3),
+            "requests_per_s"   : round(len(timings) / wall, 3),
+        },
+        "stages"     : summary,
+    }
+
+def compare(current, baseline):
+    deltas = {}
+
+    for stage, stats in current["stages"].items():
+        before = baseline["stages"].get(stage)
+
+        if not before or not before["p50"] or not stats["p50"]:
+            continue
+
+        deltas[stage] = {
+            key: f"{(stats[key] - before[key]) / before[key] * 100:+.1f}%"
+            for key in ["p50", "p95", "p99"]
+        }
+
+    return deltas
+
+def wait_for(url, timeout=300):
+    deadline = time.time() + timeout
+
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=5).read()
+            return
+        except Exception:
+            time.sleep(0.5)
+
+    raise TimeoutError(f"{url} did not come up")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=4, help="interviews to run")
+    parser.add_argument("--concurrency", type=int, default=2, help="interviews in flight at once")
+    parser.add_argument("--answers", type=int, default=3, help="questions answered per interview")
+    parser.add_argument("--latency", type=float, default=0.2, help="stub Ollama time to first token")
+    parser.add_argument("--tps", type=float, default=40.0, help="stub Ollama tokens per second")
+    parser.add_argument("--tokens", type=int, default=150, help="stub Ollama tokens per free-text reply")
+    parser.add_argument("--slots", type=int, default=0, help="stub Ollama concurrent generations per model")
+    parser.add_argument("--model", action="append", default=[], help="stub Ollama NAME=SPEEDUP for a faster model")
+    parser.add_argument("--answer-seconds", type=float, default=5.0)
+    parser.add_argument("--video-seconds", type=float, default=10.0)
+    parser.add_argument("--env", action="append", default=[], help="extra KEY=VALUE for the server process")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", help="earlier JSON report to diff against")
+    args = parser.parse_args()
+
+    stub = stub_ollama.start(
+        latency  = args.latency,
+        tps      = args.tps,
+        tokens   = args.tokens,
+        slots    = args.slots,
+        speedups = stub_ollama.parse_speedups(args.model)
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        fixtures = make_fixtures(directory, args.answer_seconds, args.video_seconds)
+
+        pages = ThreadingHTTPServer(("127.0.0.1", 0), partial(SimpleHTTPRequestHandler, directory=directory))
+        threading.Thread(target=pages.serve_forever, daemon=True).start()
+        job_url = f"http://127.0.0.1:{pages.server_address[1]}/job.html"
+
+        port = free_port()
+        env  = dict(os.environ, OLLAMA_HOST=f"http://127.0.0.1:{stub.server_address[1]}")
+        env.update(item.split("=", 1) for item in args.env)
+
+        server = subprocess.Popen(
+            [sys.executable, "-c", f"import main; main.start(); main.app.run(host='127.0.0.1', port={port}, threaded=True)"],
+            cwd=SRC,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+
+        try:
+            base = f"http://127.0.0.1:{port}"
+            wait_for(base + "/metrics")
+
+            timings = []
+            start   = time.perf_counter()
+
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                futures   = [
+                    pool.submit(interview, base, fixtures, job_url, args.answers, timings)
+                    for _ in range(args.sessions)
+                ]
+                completed = sum(1 for future in futures if future.result())
+
+            wall = time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait()
+            pages.shutdown()
+            stub.shutdown()
+
+    config = {
+        key: value for key, value in vars(args).items() if key not in ("out", "compare")
+    }
+    config["llm_calls"] = stub.calls
+
+    result = report(timings, wall, args.sessions, completed, config)
+
+    if args.compare:
+        with open(args.compare) as f:
+            result["compared_to"] = {"file": args.compare, "stages": compare(result, json.load(f))}
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
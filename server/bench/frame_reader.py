@@ -0,0 +1,117 @@
+"""
+Decode throughput and peak memory of coach.read_frames at 720p and 1080p,
+against the OpenCV reader it replaced (full-size BGR decode, cv2.resize,
+then cv2.cvtColor to RGB for MediaPipe).
+
+Each (reader, resolution) pair runs in a fresh process so its VmHWM only
+reflects that run; FFmpeg's own peak is reported separately. MediaPipe is
+not run, only the frames it would be given are produced.
+
+    uv run bench/frame_reader.py --seconds 20
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+RESOLUTIONS = {"720p": "1280x720", "1080p": "1920x1080"}
+
+def opencv_frames(path):
+    """The previous read_frames plus the BGR->RGB step from FrameAnalyser.process"""
+    import cv2
+    import coach
+
+    cap       = cv2.VideoCapture(path)
+    last_slot = None
+
+    while cap.isOpened():
+        success, image = cap.read()
+
+        if not success:
+            break
+
+        seconds = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        slot    = math.floor(seconds * coach.SAMPLE_FPS)
+
+        if slot == last_slot:
+            continue
+
+        last_slot = slot
+        small     = cv2.resize(image, (0, 0), fx=coach.FRAME_SCALE, fy=coach.FRAME_SCALE)
+
+        yield seconds, cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+
+    cap.release()
+
+def measure(reader, path):
+    import coach
+
+    frames = coach.read_frames if reader == "ffmpeg" else opencv_frames
+
+    start = time.perf_counter()
+    count = sum(1 for _ in frames(path))
+    wall  = time.perf_counter() - start
+
+    with open("/proc/self/status") as f:
+        peak = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+    print(json.dumps({
+        "frames"         : count,
+        "wall_s"         : round(wall, 3),
+        "frames_per_s"   : round(count / wall, 1),
+        "peak_rss_mb"    : round(peak / 1024, 1),
+        "ffmpeg_peak_mb" : round(children / 1024, 1) if reader == "ffmpeg" else None,
+    }))
+
+def make_video(path, size, seconds):
+    subprocess.run(
+        [
+            "ffmpeg", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30:duration={seconds}",
+            "-c:v", "libvpx", "-b:v", "4M", "-deadline", "realtime", "-cpu-used", "8",
+            path
+        ],
+        check=True
+    )
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--measure", nargs=2, metavar=("READER", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, size in RESOLUTIONS.items():
+            path = os.path.join(directory, f"{name}.webm")
+            make_video(path, size, args.seconds)
+
+            for reader in ("opencv", "ffmpeg"):
+                output = subprocess.run(
+                    [sys.executable, __file__, "--measure", reader, path],
+                    check=True,
+                    capture_output=True,
+                    text=True
+                ).stdout
+
+                results[f"{reader}@{name}"] = json.loads(output.strip().splitlines()[-1])
+
+    print(json.dumps({"seconds": args.seconds, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
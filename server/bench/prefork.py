@@ -0,0 +1,162 @@
+"""
+Per-worker memory of forked servers with 1, 4 and 8 workers, by how the
+Whisper model gets into them:
+
+    lazy     each worker loads its own copy after the fork (what happens
+             without serve.py: load_models on the first transcription)
+    preload  the master loads the model and then forks
+    shared   serve.preload(): weights in shared memory and gc.freeze()
+
+Every worker runs the encoder and one decoder step over 5 s of silence and
+a full garbage collection, then the master reads each worker's USS (private
+pages) and PSS (shared pages split between the processes mapping them)
+from /proc/<pid>/smaps_rollup. Each (mode, workers) pair is a fresh process.
+
+--random-weights builds the same architecture without downloading the
+checkpoint; the memory footprint is the same.
+
+    uv run bench/prefork.py --model base --workers 1 4 8
+"""
+import os
+import sys
+import gc
+import json
+import argparse
+import subprocess
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+MODES = ("lazy", "preload", "shared")
+
+# Architectures of the checkpoints, for --random-weights.
+DIMS = {
+    "tiny"  : dict(n_audio_state=384, n_audio_head=6, n_audio_layer=4, n_text_state=384, n_text_head=6, n_text_layer=4),
+    "base"  : dict(n_audio_state=512, n_audio_head=8, n_audio_layer=6, n_text_state=512, n_text_head=8, n_text_layer=6),
+    "small" : dict(n_audio_state=768, n_audio_head=12, n_audio_layer=12, n_text_state=768, n_text_head=12, n_text_layer=12),
+}
+
+def random_model(name, *args, **kwargs):
+    from whisper.model import Whisper, ModelDimensions
+
+    return Whisper(ModelDimensions(n_mels=80, n_audio_ctx=1500, n_vocab=51865, n_text_ctx=448, **DIMS[name]))
+
+def smaps(pid):
+    values = {}
+
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+
+    return {
+        "rss_mb" : round(values["Rss"] / 1024, 1),
+        "pss_mb" : round(values["Pss"] / 1024, 1),
+        "uss_mb" : round((values["Private_Clean"] + values["Private_Dirty"]) / 1024, 1),
+    }
+
+def work():
+    import numpy as np
+    import torch
+    import whisper
+    import transcription
+
+    torch.set_num_threads(1)
+
+    model = transcription.load_models(MODEL)
+    audio = whisper.pad_or_trim(np.zeros(transcription.SAMPLE_RATE * 5, dtype=np.float32))
+    mel   = whisper.log_mel_spectrogram(audio, model.dims.n_mels)
+
+    with torch.inference_mode():
+        features = model.embed_audio(mel[None])
+        model.logits(torch.tensor([[whisper.tokenizer.get_tokenizer(True).sot]]), features)
+
+    gc.collect()
+
+def run(mode, workers):
+    sys.path.insert(0, SRC)
+    os.chdir(SRC)
+
+    import serve
+    import transcription
+
+    if mode == "preload":
+        transcription.load_models(MODEL)
+    elif mode == "shared":
+        serve.preload(MODEL)
+
+    children = []
+
+    for _ in range(workers):
+        ready, done = os.pipe(), os.pipe()
+        pid         = os.fork()
+
+        if pid == 0:
+            work()
+            os.write(ready[1], b"1")
+            os.read(done[0], 1)
+            os._exit(0)
+
+        children.append((pid, ready, done))
+
+    for _, ready, _ in children:
+        os.read(ready[0], 1)
+
+    # Measured once every worker is warm, so PSS reflects the final sharing.
+    report = {
+        "master"  : smaps(os.getpid()),
+        "workers" : [smaps(pid) for pid, _, _ in children],
+    }
+
+    for pid, _, done in children:
+        os.write(done[1], b"1")
+        os.waitpid(pid, 0)
+
+    count = len(report["workers"])
+
+    print(json.dumps({
+        "uss_mb_per_worker" : round(sum(w["uss_mb"] for w in report["workers"]) / count, 1),
+        "pss_mb_per_worker" : round(sum(w["pss_mb"] for w in report["workers"]) / count, 1),
+        "pss_mb_total"      : round(sum(w["pss_mb"] for w in report["workers"]) + report["master"]["pss_mb"], 1),
+        "master"            : report["master"],
+    }))
+
+def main():
+    global MODEL
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="base", choices=list(DIMS))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    parser.add_argument("--random-weights", action="store_true", help="don't download the checkpoint")
+    parser.add_argument("--run", nargs=2, metavar=("MODE", "WORKERS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    MODEL = args.model
+
+    if args.run:
+        if args.random_weights:
+            import whisper
+            whisper.load_model = random_model
+
+        run(args.run[0], int(args.run[1]))
+        return
+
+    results = {}
+
+    for mode in args.modes:
+        for workers in args.workers:
+            command = [sys.executable, __file__, "--model", args.model, "--run", mode, str(workers)]
+
+            if args.random_weights:
+                command.append("--random-weights")
+
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+
+            results[f"{mode}x{workers}"] = json.loads(output.strip().splitlines()[-1])
+
+    print(json.dumps({"model": args.model, "random_weights": args.random_weights, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
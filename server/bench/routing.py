@@ -0,0 +1,83 @@
+"""
+End-to-end interview latency under the two LLM routing tables in llm.py.
+
+Runs bench/e2e.py once with LLM_ROUTING=single (every call on the 24B model)
+and once with LLM_ROUTING=split (low-stakes calls on DRAFT_LLM), against a
+stub Ollama that serves `--slots` generations per model at once and runs the
+draft model `--speedup` times faster. Prints both reports' per-stage
+percentiles side by side with the change from single to split.
+
+    uv run bench/routing.py --sessions 8 --concurrency 4 --slots 2 --speedup 4
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def run(routing, args, passthrough, out):
+    command = [
+        sys.executable, os.path.join(HERE, "e2e.py"),
+        "--sessions", str(args.sessions),
+        "--concurrency", str(args.concurrency),
+        "--slots", str(args.slots),
+        "--model", f"{args.draft}={args.speedup}",
+        "--env", f"LLM_ROUTING={routing}",
+        "--env", f"DRAFT_LLM={args.draft}",
+        "--out", out,
+        *passthrough
+    ]
+
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+
+    with open(out) as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(epilog="Other arguments are passed on to e2e.py.")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--slots", type=int, default=2, help="stub generations per model at once")
+    parser.add_argument("--draft", default="llama3.2:3b", help="DRAFT_LLM for the split run")
+    parser.add_argument("--speedup", type=float, default=4.0, help="how much faster the draft model is")
+    parser.add_argument("--out", help="write the JSON comparison here")
+    args, passthrough = parser.parse_known_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        reports = {
+            routing: run(routing, args, passthrough, os.path.join(directory, f"{routing}.json"))
+            for routing in ("single", "split")
+        }
+
+    stages = {}
+
+    for stage in reports["single"]["stages"]:
+        single = reports["single"]["stages"][stage]
+        split  = reports["split"]["stages"].get(stage, {})
+
+        stages[stage] = {
+            "single" : {key: single.get(key) for key in ("p50", "p95", "errors")},
+            "split"  : {key: split.get(key) for key in ("p50", "p95", "errors")},
+        }
+
+        if single.get("p50") and split.get("p50"):
+            stages[stage]["p50_change"] = f"{(split['p50'] - single['p50']) / single['p50'] * 100:+.1f}%"
+
+    result = {
+        "config"     : vars(args) | {"passthrough": passthrough},
+        "wall_s"     : {routing: report["wall_s"] for routing, report in reports.items()},
+        "throughput" : {routing: report["throughput"] for routing, report in reports.items()},
+        "stages"     : stages,
+    }
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Parse time per job page for scraping.extract_job over a corpus of saved
+HTML pages, against the previous implementation (the whole page parsed, and
+XPath strings compiled on every call, ServiceNow layout only).
+
+The corpus is a directory of <host>_<anything>.html files; the host picks
+the adapter, as the URL does when scraping. Without --corpus a synthetic one
+is generated: ServiceNow-layout pages, pages of another site in the same
+layout, and pages with JSON-LD JobPosting metadata, each padded with
+--padding KB of scripts and related-job cards around the posting, the way
+career sites are.
+
+For every page the median of --repeat runs is taken, per mode:
+
+    legacy   the old scrape_job parsing
+    full     extract_job with scraping.SUBTREE off
+    subtree  extract_job as shipped
+
+    uv run bench/scraping.py --padding 32 512 2048
+    uv run bench/scraping.py --corpus saved_pages/
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+import tempfile
+
+from collections import defaultdict
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+sys.path.insert(0, SRC)
+
+import scraping
+
+from lxml import html
+
+POSTING = """
+<h3>Company Description</h3>
+<p>{company} builds workflow software used by thousands of enterprises around the world.</p>
+<h3>Job Description</h3>
+<p>Team overview.</p>
+<p>You will design, build and operate the services behind our {team} platform.</p>
+<ul>
+<li>Design and build scalable backend services in Python</li>
+<li>Own the reliability and performance of production systems</li>
+<li>Mentor engineers and lead technical design reviews</li>
+</ul>
+<h3>Qualifications</h3>
+<ul>
+<li>Five or more years building production backend services</li>
+<li>Experience with distributed systems and observability</li>
+</ul>
+<ul>
+<li>Experience running machine learning models in production</li>
+</ul>
+"""
+
+JOB_POSTING = {
+    "@context"             : "https://schema.org",
+    "@type"                : "JobPosting",
+    "title"                : "Senior Software Engineer",
+    "description"          : "<p>You will design, build and operate the services behind our platform.</p><ul><li>Remote friendly</li></ul>",
+    "hiringOrganization"   : {"@type": "Organization", "name": "Example Corp"},
+    "jobLocation"          : {"@type": "Place", "address": {"@type": "PostalAddress", "addressLocality": "Bloomington"}},
+    "occupationalCategory" : "Engineering",
+    "responsibilities"     : "<ul><li>Design and build scalable backend services</li><li>Own the reliability of production systems</li></ul>",
+    "qualifications"       : "Five or more years building production services\nExperience with distributed systems",
+}
+
+SITES = {
+    "careers.servicenow.com" : "ServiceNow",
+    "careers.example.org"    : "Example Org",
+    "jobs.example.com"       : "Example Corp",
+}
+
+def padding(kb, seed):
+    """Scripts and related-job cards making up the rest of a career page"""
+    rng   = random.Random(seed)
+    state = json.dumps({"jobs": [{"id": rng.randrange(10**9), "title": "Engineer " * 4} for _ in range(kb * 8)]})
+    cards = "".join(
+        f'<div class="card"><a href="/jobs/{i}"><span>Engineer {i}</span></a><p>Location {i % 50}</p></div>'
+        for i in range(kb * 4)
+    )
+
+    return f"<script>window.__STATE__ = {state}</script>", f"<section>{cards}</section>"
+
+def page(host, index, kb):
+    head, tail = padding(kb, index)
+    company    = SITES[host]
+    meta       = f'<meta property="og:site_name" content="{company}">'
+
+    if host == "jobs.example.com":
+        body = f'<script type="application/ld+json">{json.dumps(JOB_POSTING)}</script><div class="description">{POSTING.format(company=company, team="hiring")}</div>'
+    else:
+        body = f'<div class="description">{POSTING.format(company=company, team=f"team {index}")}</div>'
+
+    return (
+        f"<html><head><title>Senior Software Engineer, Platform, Core Workflows, Remote | {company} Careers</title>{meta}"
+        f"{head}</head><body><nav>{'<a href=/>Home</a>' * 200}</nav>{body}{tail}</body></html>"
+    )
+
+def generate(directory, sizes, pages):
+    for kb in sizes:
+        for host in SITES:
+            for i in range(pages):
+                with open(os.path.join(directory, f"{host}_{kb}kb_{i}.html"), "w") as f:
+                    f.write(page(host, i, kb))
+
+def legacy(content):
+    """The parsing in scrape_job before the adapters"""
+    tree     = html.fromstring(content)
+    job_data = {
+        'role': '',
+        'location': '',
+        'department': '',
+        'workflow': '',
+        'company': 'ServiceNow',
+        'company_description': '',
+        'job_description': '',
+        'key_responsibilities': [],
+        'basic_qualifications': [],
+        'preferred_qualifications': []
+    }
+
+    title = tree.xpath('//title/text()')
+    if title:
+        job_data.update(scraping.extract_role_info(title[0].strip()))
+
+    company_desc = tree.xpath('//h3[contains(text(), "Company Description")]/following-sibling::p[1]//text()')
+    if company_desc:
+        job_data['company_description'] = scraping.clean_text(' '.join(company_desc))
+
+    job_desc = tree.xpath('//h3[contains(text(), "Job Description")]/following-sibling::p[2]//text()')
+    if job_desc:
+        job_data['job_description'] = scraping.clean_text(' '.join(job_desc))
+
+    job_resp = tree.xpath('//h3[contains(text(), "Job Description")]/following-sibling::ul[1]/li//text()')
+    if job_resp:
+        job_data['key_responsibilities'] = scraping.extract_list_items(job_resp)
+
+    basic_quals = tree.xpath('//h3[contains(text(), "Qualifications")]/following-sibling::ul[1]/li//text()')
+    if basic_quals:
+        job_data['basic_qualifications'] = scraping.extract_list_items(basic_quals)
+
+    preferred_quals = tree.xpath('//h3[contains(text(), "Qualifications")]/following-sibling::ul[2]/li//text()')
+    if preferred_quals:
+        job_data['preferred_qualifications'] = scraping.extract_list_items(preferred_quals)
+
+    return job_data
+
+def extract(subtree):
+    def run(content, url):
+        scraping.SUBTREE = subtree
+        return scraping.extract_job(content, url)
+
+    return run
+
+def bucket(size):
+    limit = next((kb for kb in (64, 256, 1024, 4096) if size <= kb * 1024), None)
+
+    return f"<= {limit} KB" if limit else "> 4096 KB"
+
+def timed(function, repeat, *args):
+    times = []
+
+    for _ in range(repeat):
+        start  = time.perf_counter()
+        result = function(*args)
+        times.append((time.perf_counter() - start) * 1000)
+
+    return statistics.median(times), result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="directory of saved <host>_<name>.html pages")
+    parser.add_argument("--padding", type=int, nargs="+", default=[32, 512, 2048], help="KB around each synthetic posting")
+    parser.add_argument("--pages", type=int, default=3, help="synthetic pages per site and size")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = args.corpus or directory
+
+        if not args.corpus:
+            generate(directory, args.padding, args.pages)
+
+        files   = sorted(name for name in os.listdir(corpus) if name.endswith(".html"))
+        results = defaultdict(lambda: defaultdict(list))
+        sizes   = defaultdict(list)
+        differ  = []
+
+        for name in files:
+            with open(os.path.join(corpus, name), "rb") as f:
+                content = f.read()
+
+            host   = name.split("_")[0]
+            url    = f"https://{host}/jobs/{name}"
+            group  = f"{scraping.adapter_for(url).name}{' json-ld' if scraping.find_job_posting(content) else ''}, {bucket(len(content))}"
+            runs   = {
+                "legacy"  : timed(lambda: legacy(content), args.repeat),
+                "full"    : timed(extract(False), args.repeat, content, url),
+                "subtree" : timed(extract(True), args.repeat, content, url),
+            }
+
+            sizes[group].append(len(content))
+
+            for mode, (ms, _) in runs.items():
+                results[group][mode].append(ms)
+
+            # The adapters should find what the old code did, bar the company
+            # it hard-coded, on pages without JSON-LD.
+            old = {k: v for k, v in runs["legacy"][1].items() if k != "company"}
+            new = {k: v for k, v in runs["subtree"][1].items() if k != "company"}
+
+            if "json-ld" not in group and (old != new or runs["full"][1] != runs["subtree"][1]):
+                differ.append(name)
+
+        scraping.SUBTREE = True
+
+        report = {}
+
+        for group, modes in sorted(results.items()):
+            medians = {mode: statistics.median(times) for mode, times in modes.items()}
+
+            report[group] = {
+                "pages"          : len(sizes[group]),
+                "mean_kb"        : round(statistics.mean(sizes[group]) / 1024),
+                "ms_per_page"    : {mode: round(ms, 3) for mode, ms in medians.items()},
+                "speedup"        : round(medians["legacy"] / medians["subtree"], 1),
+            }
+
+        print(json.dumps({
+            "config"        : vars(args),
+            "results"       : report,
+            "outputs_match" : not differ,
+            "differ"        : differ,
+        }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Check coach.Smoother against the list-based apply_smoothing it replaced, on
+recorded-style label sequences, and time both.
+
+Sequences mimic classifier output: labels persist for a few frames, then
+flicker or switch, for the gesture (7 labels), eye contact and posture
+(bool label, varying feedback) streams.
+
+    uv run bench/smoothing.py --frames 20000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+import coach
+
+def apply_smoothing(current, history, history_list, confidence_threshold=0.6):
+    """The previous implementation, kept here as the reference"""
+    history_list.append(current)
+
+    if len(history_list) > coach.MAX_HISTORY:
+        history_list.pop(0)
+
+    counts = {}
+    for item in history_list:
+        if item[0] not in counts:
+            counts[item[0]] = 0
+        counts[item[0]] += 1
+
+    if not counts:
+        return current
+
+    most_common = max(counts.items(), key=lambda x: x[1])
+    confidence = most_common[1] / len(history_list)
+
+    if confidence >= confidence_threshold:
+        for item in history_list:
+            if item[0] == most_common[0]:
+                return item
+
+    return current
+
+def sequence(items, frames, stickiness, seed):
+    rng     = random.Random(seed)
+    current = rng.choice(items)
+    output  = []
+
+    for _ in range(frames):
+        if rng.random() > stickiness:
+            current = rng.choice(items)
+        output.append(current)
+
+    return output
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=20000)
+    args = parser.parse_args()
+
+    streams = {
+        "gesture"     : coach.GESTURES,
+        "eye_contact" : [(i == 0, text) for i, text in enumerate(coach.EYE_CONTACT_FEEDBACK)],
+        "posture"     : [(flag, text) for flag in (True, False) for text in coach.POSTURE_FEEDBACK],
+    }
+
+    results = {}
+
+    for seed, (name, items) in enumerate(streams.items()):
+        for stickiness in (0.0, 0.5, 0.9):
+            labels = sequence(items, args.frames, stickiness, seed)
+
+            start     = time.perf_counter()
+            history   = []
+            reference = [apply_smoothing(item, history, history) for item in labels]
+            old       = time.perf_counter() - start
+
+            start    = time.perf_counter()
+            smoother = coach.Smoother()
+            smoothed = [smoother.update(item) for item in labels]
+            new      = time.perf_counter() - start
+
+            mismatches = sum(a != b for a, b in zip(reference, smoothed))
+
+            results[f"{name}@{stickiness}"] = {
+                "mismatches"   : mismatches,
+                "list_us"      : round(old / args.frames * 1e6, 3),
+                "smoother_us"  : round(new / args.frames * 1e6, 3),
+            }
+
+    print(json.dumps(results, indent=2))
+
+    if any(r["mismatches"] for r in results.values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
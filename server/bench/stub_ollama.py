@@ -0,0 +1,171 @@
+"""
+A stand-in for the Ollama HTTP API with a configurable speed.
+
+Answers POST /api/chat after `latency` seconds of "prefill" plus one token
+per 1/`tps` seconds. When the request carries a JSON schema in `format`, the
+reply is a minimal instance of that schema, so model_validate_json succeeds.
+
+Like Ollama, each model can serve at most `slots` requests at once (0 for no
+limit) and queues the rest; `--model NAME=SPEEDUP` makes a (smaller) model
+that many times faster than the default.
+
+    uv run bench/stub_ollama.py --port 11435 --latency 0.2 --tps 40
+    uv run bench/stub_ollama.py --slots 2 --model llama3.2:3b=4
+"""
+import json
+import time
+import argparse
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def instance(schema, defs, name=""):
+    """Build a small value that validates against a (pydantic) JSON schema."""
+    if "$ref" in schema:
+        return instance(defs[schema["$ref"].split("/")[-1]], defs, name)
+
+    if "enum" in schema:
+        return schema["enum"][len(schema["enum"]) // 2]
+
+    if "anyOf" in schema:
+        return instance(schema["anyOf"][0], defs, name)
+
+    kind = schema.get("type", "string")
+
+    if kind == "object":
+        return {
+            key: instance(value, defs, key)
+            for key, value in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [instance(schema.get("items", {}), defs, name) for _ in range(3)]
+    if kind == "integer":
+        return 50
+    if kind == "number":
+        return 0.5
+    if kind == "boolean":
+        return True
+
+    # The grading prompt asks for a bare letter grade in a free-form string.
+    if name == "grade":
+        return "B"
+
+    return f"Stub {name or 'text'} from the benchmark server."
+
+class StubOllama(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.2, tps=40.0, tokens=150, slots=0, speedups=None):
+        super().__init__(address, Handler)
+
+        self.latency  = latency
+        self.tps      = tps
+        self.tokens   = tokens
+        self.slots    = slots
+        self.speedups = speedups or {}
+        self.models   = {}
+        self.calls    = 0
+        self.lock     = threading.Lock()
+
+    def slot(self, model):
+        """A semaphore limiting concurrent generations of one model."""
+        with self.lock:
+            if model not in self.models:
+                self.models[model] = threading.BoundedSemaphore(self.slots) if self.slots else None
+
+            return self.models[model]
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        # The client only probes the root to check the server is up.
+        self.reply({"status": "ok"} if self.path != "/" else "Ollama is running")
+
+    def do_POST(self):
+        length  = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path != "/api/chat":
+            self.send_error(404)
+            return
+
+        with self.server.lock:
+            self.server.calls += 1
+
+        schema = request.get("format")
+
+        if isinstance(schema, dict):
+            content = json.dumps(instance(schema, schema.get("$defs", {})))
+            tokens  = max(1, len(content) // 4)
+        else:
+            tokens  = self.server.tokens
+            content = " ".join(["token"] * tokens)
+
+        model         = request.get("model", "stub")
+        speedup       = self.server.speedups.get(model, 1.0)
+        prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4
+        latency       = self.server.latency / speedup
+        generation    = tokens / (self.server.tps * speedup)
+        slot          = self.server.slot(model)
+
+        if slot is not None:
+            with slot:
+                time.sleep(latency + generation)
+        else:
+            time.sleep(latency + generation)
+
+        self.reply({
+            "model"                : model,
+            "created_at"           : time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "message"              : {"role": "assistant", "content": content},
+            "done"                 : True,
+            "done_reason"          : "stop",
+            "total_duration"       : int((latency + generation) * 1e9),
+            "prompt_eval_count"    : prompt_tokens,
+            "prompt_eval_duration" : int(latency * 1e9),
+            "eval_count"           : tokens,
+            "eval_duration"        : int(generation * 1e9),
+        })
+
+    def reply(self, body):
+        data = json.dumps(body).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def parse_speedups(items):
+    """["llama3.2:3b=4"] -> {"llama3.2:3b": 4.0}"""
+    return {name: float(speedup) for name, speedup in (item.rsplit("=", 1) for item in items)}
+
+def start(port=0, **kwargs):
+    """Run a stub server on a background thread and return it."""
+    server = StubOllama(("127.0.0.1", port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tps", type=float, default=40.0, help="generated tokens per second")
+    parser.add_argument("--tokens", type=int, default=150, help="tokens per free-text reply")
+    parser.add_argument("--slots", type=int, default=0, help="concurrent generations per model, 0 for no limit")
+    parser.add_argument("--model", action="append", default=[], help="NAME=SPEEDUP for a faster model")
+    args = parser.parse_args()
+
+    server = StubOllama(
+        ("127.0.0.1", args.port),
+        latency  = args.latency,
+        tps      = args.tps,
+        tokens   = args.tokens,
+        slots    = args.slots,
+        speedups = parse_speedups(args.model)
+    )
+    print(f"Stub Ollama listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,147 @@
+"""
+Peak server RSS and latency of next_response by clip size, comparing the
+base64 JSON route against the streaming upload route.
+
+Every (route, size) pair runs against a fresh server process so its VmHWM
+(peak resident set) only reflects that one request. Transcription and the
+LLM are replaced with no-ops: only the upload path is being measured.
+
+    uv run bench/upload.py --sizes 1 8 32 64
+"""
+import os
+import sys
+import json
+import time
+import base64
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+SESSION = "bench"
+
+def serve(port):
+    os.chdir(SRC)
+    sys.path.insert(0, SRC)
+
+    import main
+
+    from werkzeug.serving import make_server
+
+    # Stands in for llm.Interviewer as far as main.answer() uses it: the
+    # lock and responses behind idempotent retries, and process_response
+    # returning (reply, is follow-up, reply id). Keep it in step.
+    class Session:
+        lock      = threading.RLock()
+        responses = {}
+
+        def process_response(self, transcript):
+            return "", False, None
+
+    main.transcribe_webm = lambda path, **kwargs: {"text": ""}
+    main.ctx[SESSION]    = Session()
+
+    # Only once the port is bound, or the first request can be refused.
+    server = make_server("127.0.0.1", port, main.app)
+
+    print("ready", flush=True)
+    server.serve_forever()
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def peak_rss_mb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+
+def post(port, path, body, headers):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    conn.request("POST", path, body=body, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+
+    return response.status
+
+def run(route, clip, size):
+    port   = free_port()
+    server = subprocess.Popen(
+        [sys.executable, __file__, "--serve", str(port)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True
+    )
+
+    try:
+        server.stdout.readline()
+
+        baseline = peak_rss_mb(server.pid)
+        start    = time.perf_counter()
+
+        if route == "base64":
+            with open(clip, "rb") as f:
+                data = "data:audio/webm;base64," + base64.b64encode(f.read()).decode()
+
+            status = post(
+                port,
+                f"/api/interview/{SESSION}/next_response",
+                json.dumps({"data": data}),
+                {"Content-Type": "application/json"}
+            )
+        else:
+            with open(clip, "rb") as f:
+                status = post(
+                    port,
+                    f"/api/interview/{SESSION}/next_response/upload",
+                    f,
+                    {"Content-Type": "application/octet-stream", "Content-Length": str(size)}
+                )
+
+        latency = time.perf_counter() - start
+
+        return {
+            "route"        : route,
+            "clip_mb"      : size / 2**20,
+            "status"       : status,
+            "latency_s"    : round(latency, 4),
+            "peak_rss_mb"  : round(peak_rss_mb(server.pid), 1),
+            "added_rss_mb" : round(peak_rss_mb(server.pid) - baseline, 1),
+        }
+    finally:
+        server.kill()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 8, 32, 64], help="clip sizes in MB")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve)
+
+    results = []
+
+    for mb in args.sizes:
+        size = mb * 2**20
+
+        with tempfile.NamedTemporaryFile(suffix=".webm") as clip:
+            clip.write(os.urandom(size))
+            clip.flush()
+
+            for route in ["base64", "upload"]:
+                results.append(run(route, clip.name, size))
+                print(json.dumps(results[-1]), file=sys.stderr)
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
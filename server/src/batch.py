@@ -0,0 +1,366 @@
+"""
+Grade and coach a directory of recorded interviews offline, with the same
+modules the server uses: transcription, per-answer grading through
+feedback.tmpl, and coach_video_file. Sessions run across a process pool.
+
+    uv run src/batch.py archive/ --out rescored/ --workers 4
+
+Each subdirectory of the input is a session holding a session.json in the
+shape of a /feedback report (an archived one can be used as is):
+
+    {
+        "metadata" : {"interviewer": "todd", "interview_type": "technical"},
+        "answers"  : [
+            {"question_id": 1, "question": "...", "answer": "..."},
+            {"question_id": 2, "question": "...", "audio": "2.wav"}
+        ],
+        "video"    : "interview.webm"
+    }
+
+Answers given as audio (any format FFmpeg reads, relative to the session)
+are transcribed first. "video" is optional; without it the session's only
+.webm file that is not an answer, if any, is coached.
+
+Every finished session is written to <out>/<session>.json, which is also its
+checkpoint: a rerun skips sessions that completed with the current settings,
+and for the rest reuses whatever stage results (transcripts, grades, coach
+report) are still valid, so after a prompt change only the grading runs
+again. A throughput summary is printed as JSON at the end.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import multiprocessing
+
+import torch
+
+import transcription
+
+from concurrent.futures         import ProcessPoolExecutor, as_completed, wait
+from concurrent.futures.process import BrokenProcessPool
+
+log = logging.getLogger(__name__)
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+
+SESSION_FILE = 'session.json'
+
+# Sessions run in parallel; each one also grades its answers GRADING_WORKERS
+# at a time, and analyses its video in a single process (coach shards would
+# only compete with the other sessions for the same cores).
+WORKERS      = max(1, (os.cpu_count() or 1) // 2)
+COACH_SHARDS = 1
+
+def settings(whisper_model):
+    """
+    What each stage's results depend on. A checkpoint's stage results are
+    reused only while their entry here is unchanged.
+    """
+    from llm   import TEMPLATES, route
+    from coach import analysis_key
+
+    grading = json.dumps({"template": TEMPLATES['feedback'], **route("grading")}, sort_keys=True)
+
+    return {
+        "transcription" : {"model": whisper_model},
+        "grading"       : {"fingerprint": hashlib.sha256(grading.encode()).hexdigest()[:16]},
+        # The coach settings, for no video in particular.
+        "coach"         : {"fingerprint": analysis_key("")[:16]},
+    }
+
+def find_sessions(folder):
+    return sorted(
+        entry.name for entry in os.scandir(folder)
+        if entry.is_dir() and os.path.exists(os.path.join(entry.path, SESSION_FILE))
+    )
+
+def load_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_json(path, value):
+    temp = path + ".tmp"
+
+    with open(temp, 'w') as f:
+        json.dump(value, f, indent=2)
+
+    os.replace(temp, path)
+
+def video_path(folder, session):
+    if session.get("video"):
+        return os.path.join(folder, session["video"])
+
+    audio  = {answer.get("audio") for answer in session["answers"]}
+    videos = sorted(name for name in os.listdir(folder) if name.endswith(".webm") and name not in audio)
+
+    return os.path.join(folder, videos[0]) if len(videos) == 1 else None
+
+def has_audio(folder):
+    answers = (load_json(os.path.join(folder, SESSION_FILE)) or {}).get("answers")
+
+    return isinstance(answers, list) and any(isinstance(a, dict) and a.get("audio") for a in answers)
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+def init_worker(threads):
+    torch.set_num_threads(threads)
+
+def process_session(folder, output, config, coach=True):
+    """
+    Run one session and write its checkpoint. Returns the counts and stage
+    timings that go into the summary.
+    """
+    from llm   import grader, grade_answer, outcome, grade_to_score, score_to_grade, GRADING_ERRORS
+    from coach import coach_video_file, analysis_key
+
+    start    = time.perf_counter()
+    session  = load_json(os.path.join(folder, SESSION_FILE))
+    previous = load_json(output) or {}
+
+    if session is None or not isinstance(session.get("answers"), list):
+        raise ValueError(f"{SESSION_FILE} is missing or has no answers")
+
+    def reusable(stage):
+        return previous.get("settings", {}).get(stage) == config[stage]
+
+    earlier = previous.get("answers", []) if len(previous.get("answers", [])) == len(session["answers"]) else []
+    earlier = earlier or [{}] * len(session["answers"])
+    stats   = {"answers": len(session["answers"]), "transcribed": 0, "graded": 0, "reused": 0, "video_seconds": 0}
+    seconds = {"transcription": 0.0, "grading": 0.0, "coach": 0.0}
+    answers = []
+
+    # Transcription: answers given as audio, unless transcribed already.
+    for answer, before in zip(session["answers"], earlier):
+        result = {
+            "question_id" : answer.get("question_id"),
+            "question"    : answer["question"],
+            "answer"      : answer.get("answer"),
+            "audio"       : answer.get("audio"),
+        }
+
+        if result["answer"] is None and result["audio"]:
+            if reusable("transcription") and before.get("audio") == result["audio"] and before.get("answer") is not None:
+                result["answer"]        = before["answer"]
+                result["transcription"] = before.get("transcription")
+            else:
+                began      = time.perf_counter()
+                transcript = transcription.transcribe_webm(
+                    os.path.join(folder, result["audio"]), config["transcription"]["model"]
+                )
+
+                seconds["transcription"] += time.perf_counter() - began
+                stats["transcribed"]     += 1
+
+                result["answer"]        = transcript["text"]
+                result["transcription"] = {"language": transcript["language"], "translated": transcript["translated"]}
+
+        answers.append(result)
+
+    # Grading runs on the grader threads while the video is analysed below.
+    began   = time.perf_counter()
+    pending = []
+
+    for result, before in zip(answers, earlier):
+        unchanged = before.get("status") == "complete" and (before.get("question"), before.get("answer")) == (result["question"], result["answer"])
+
+        if reusable("grading") and unchanged:
+            pending.append(None)
+            result["status"], result["evaluation"] = "complete", before["evaluation"]
+            stats["reused"] += 1
+        else:
+            pending.append(grader.submit(grade_answer, result["question"], result["answer"]))
+
+    video  = video_path(folder, session) if coach else None
+    report = None
+    key    = None
+
+    if video is not None:
+        key = analysis_key(file_digest(video))
+
+        if previous.get("coach_key") == key and previous.get("coach") is not None:
+            report = previous["coach"]
+        else:
+            began_coach = time.perf_counter()
+
+            try:
+                report = coach_video_file(video, workers=COACH_SHARDS)
+            except Exception as e:
+                log.warning("Coaching %s failed: %s", video, e)
+            else:
+                stats["video_seconds"] += report["duration"]
+
+            seconds["coach"] += time.perf_counter() - began_coach
+
+    wait([future for future in pending if future is not None])
+
+    seconds["grading"] = time.perf_counter() - began
+
+    for result, future in zip(answers, pending):
+        if future is None:
+            continue
+
+        result["status"], evaluation = outcome(future, f"grading of question {result['question_id']}")
+        result["evaluation"]         = evaluation if result["status"] == "complete" else {"error": GRADING_ERRORS[result["status"]], "grade": None}
+
+        stats["graded"] += 1
+
+    grades = [grade_to_score(r["evaluation"]["grade"]) for r in answers if r["evaluation"]["grade"] is not None]
+
+    complete = all(r["status"] == "complete" for r in answers) and (video is None or report is not None)
+
+    save_json(output, {
+        "session"      : os.path.basename(folder),
+        "status"       : "complete" if complete else "partial",
+        "settings"     : config,
+        "metadata"     : session.get("metadata", {}),
+        "answers"      : answers,
+        "grade"        : score_to_grade(sum(grades) / len(grades)) if grades else "N/A",
+        "video"        : video and os.path.relpath(video, folder),
+        "coach_key"    : key if report is not None else None,
+        "coach"        : report,
+        "seconds"      : {stage: round(value, 3) for stage, value in seconds.items()},
+    })
+
+    return {
+        **stats,
+        "complete" : complete,
+        "seconds"  : {**seconds, "total": time.perf_counter() - start},
+    }
+
+def run(args):
+    sessions = find_sessions(args.sessions)
+    config   = settings(args.whisper_model)
+    todo     = []
+
+    os.makedirs(args.out, exist_ok=True)
+
+    for name in sessions:
+        checkpoint = load_json(os.path.join(args.out, f"{name}.json")) or {}
+
+        if args.force or checkpoint.get("status") != "complete" or checkpoint.get("settings") != config:
+            todo.append(name)
+
+    log.info("%d sessions, %d to run (%d done already)", len(sessions), len(todo), len(sessions) - len(todo))
+
+    if args.force:
+        for name in todo:
+            try:
+                os.remove(os.path.join(args.out, f"{name}.json"))
+            except FileNotFoundError:
+                pass
+
+    # Load Whisper before forking, so the workers share one copy of it
+    # (see serve.py) instead of each loading its own.
+    if any(has_audio(os.path.join(args.sessions, name)) for name in todo):
+        transcription.preload(args.whisper_model)
+
+    summary = {
+        "sessions" : len(sessions),
+        "skipped"  : len(sessions) - len(todo),
+        "complete" : 0,
+        "partial"  : 0,
+        "failed"   : 0,
+    }
+    totals  = {"answers": 0, "transcribed": 0, "graded": 0, "reused": 0, "video_seconds": 0}
+    seconds = {"transcription": 0.0, "grading": 0.0, "coach": 0.0, "total": 0.0}
+    start   = time.perf_counter()
+
+    pool = ProcessPoolExecutor(
+        max_workers = args.workers,
+        mp_context  = multiprocessing.get_context("fork"),
+        initializer = init_worker,
+        initargs    = (max(1, (os.cpu_count() or 1) // args.workers),)
+    )
+
+    futures = {
+        pool.submit(
+            process_session,
+            os.path.join(args.sessions, name),
+            os.path.join(args.out, f"{name}.json"),
+            config,
+            not args.no_coach
+        ): name
+        for name in todo
+    }
+
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            name = futures[future]
+
+            try:
+                result = future.result()
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                summary["failed"] += 1
+                log.error("[%d/%d] %s failed: %s", done, len(todo), name, e)
+                continue
+
+            summary["complete" if result["complete"] else "partial"] += 1
+
+            for key in totals:
+                totals[key] += result[key]
+            for key in seconds:
+                seconds[key] += result["seconds"][key]
+
+            log.info(
+                "[%d/%d] %s: %s, %d answers in %.1fs",
+                done, len(todo), name, "complete" if result["complete"] else "partial", result["answers"], result["seconds"]["total"]
+            )
+    except (KeyboardInterrupt, BrokenProcessPool) as e:
+        # Finished sessions are checkpointed already; a rerun picks up the rest.
+        log.error("Stopped (%s), rerun to resume", type(e).__name__)
+        pool.shutdown(wait=False, cancel_futures=True)
+        summary["interrupted"] = True
+    else:
+        pool.shutdown()
+
+    wall = time.perf_counter() - start
+    ran  = summary["complete"] + summary["partial"]
+
+    return {
+        **summary,
+        **totals,
+        "workers"             : args.workers,
+        "wall_s"              : round(wall, 2),
+        "sessions_per_minute" : round(ran / wall * 60, 2) if wall > 0 else None,
+        "answers_per_s"       : round(totals["answers"] / wall, 2) if wall > 0 else None,
+        # Summed over the sessions: these overlap in time across the workers.
+        "stage_s"             : {stage: round(value, 1) for stage, value in seconds.items()},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Grade and coach a directory of recorded interviews")
+    parser.add_argument("sessions", help="directory with one subdirectory per session")
+    parser.add_argument("--out", required=True, help="directory for the results and checkpoints")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--whisper-model", default="base")
+    parser.add_argument("--no-coach", action="store_true", help="skip the video analysis")
+    parser.add_argument("--force", action="store_true", help="ignore existing checkpoints")
+    args = parser.parse_args()
+
+    logging.basicConfig(level = os.environ.get('LOG_LEVEL', 'INFO'))
+
+    args.sessions = os.path.abspath(args.sessions)
+    args.out      = os.path.abspath(args.out)
+
+    # llm reads its prompts relative to src/.
+    os.chdir(SRC)
+
+    summary = run(args)
+
+    print(json.dumps(summary, indent=2))
+
+    return 1 if summary["failed"] or summary.get("interrupted") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,19 @@
 import cv2
 import mediapipe as mp
 import numpy as np
-import math
 import time
+import math
+import json
+import hashlib
+import threading
+import subprocess
+import multiprocessing
+
+from collections        import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools          import repeat
+
+import metrics
 
 # Initialize MediaPipe solutions
 mp_drawing = mp.solutions.drawing_utils
@@ -11,18 +22,104 @@ mp_hands = mp.solutions.hands
 mp_face_mesh = mp.solutions.face_mesh
 mp_pose = mp.solutions.pose
 
-mp_hands.model_complexity = 0
-mp_pose.model_complexity = 0
+# Lightest Hands model; gestures only need coarse landmarks. (Pose stays on
+# the default model, which ships with mediapipe instead of being downloaded.)
+MODEL_COMPLEXITY = 0
+
+# Two-stage detection: run Pose first and only run FaceMesh/Hands when a
+# person is present and has moved by more than MOTION_THRESHOLD (normalised
+# coordinates) since the last analysed frame, on crops around the pose's
+# face and hand keypoints.
+CASCADE          = True
+MOTION_THRESHOLD = 0.01
+FACE_PADDING     = 0.35   # ROI margin, in shoulder widths
+HAND_PADDING     = 0.5
+MIN_ROI          = 32     # Pixels; smaller crops fall back to the full frame
+
+# Frames analysed per second of video; the rest are decoded and dropped.
+# Analysed frames are downscaled by FRAME_SCALE first.
+SAMPLE_FPS  = 5
+FRAME_SCALE = 0.25
+
+# Long recordings are split by time range across this many worker processes,
+# each with its own capture and MediaPipe graphs, in shards of at least
+# MIN_SHARD_SECONDS.
+SHARD_WORKERS     = 4
+MIN_SHARD_SECONDS = 30
+
+# Bump whenever a change alters the reports, so cached ones are not reused.
+ANALYSIS_VERSION = 2
 
 # Drawing specifications
 drawing_spec = mp_drawing.DrawingSpec(thickness=1, circle_radius=1)
 
 # History tracking for smoothing
-gesture_history = []
-eye_contact_history = []
-posture_history = []
 MAX_HISTORY = 15
 
+class Smoother:
+    """
+    Temporal smoothing to reduce flickering feedback, for one stream.
+
+    Keeps the last `size` (label, feedback) items. Once one label makes up
+    at least `confidence_threshold` of them, its oldest item in the window
+    is returned instead of the current one. Ties go to the label seen first.
+    Each label keeps its own queue of items, so its count and oldest item
+    are O(1) to read, and labels are bucketed by count with the top count
+    tracked as counts move by one, so the majority is found without
+    scanning the labels: only those tied at the top count are compared,
+    and when they qualify there are at most 1 / confidence_threshold.
+    """
+
+    def __init__(self, size=MAX_HISTORY, confidence_threshold=0.6):
+        self.size                 = size
+        self.confidence_threshold = confidence_threshold
+        self.window               = deque()  # labels, oldest first
+        self.items                = {}       # label -> deque of (sequence, item)
+        self.buckets              = {}       # count -> labels with that many items
+        self.top                  = 0        # highest count
+        self.sequence             = 0
+
+    def move(self, label, count, change):
+        """Move `label` from the bucket for `count` to the next one up or down."""
+        if count:
+            self.buckets[count].discard(label)
+
+        if count + change:
+            self.buckets.setdefault(count + change, set()).add(label)
+
+    def update(self, current):
+        label = current[0]
+
+        self.window.append(label)
+        self.items.setdefault(label, deque()).append((self.sequence, current))
+        self.sequence += 1
+
+        count = len(self.items[label])
+        self.move(label, count - 1, 1)
+        self.top = max(self.top, count)
+
+        # Keep only recent history
+        if len(self.window) > self.size:
+            oldest = self.window.popleft()
+            count  = len(self.items[oldest])
+
+            self.items[oldest].popleft()
+            self.move(oldest, count, -1)
+
+            if not self.items[oldest]:
+                del self.items[oldest]
+
+            if count == self.top and not self.buckets[count]:
+                self.top -= 1
+
+        if self.top / len(self.window) < self.confidence_threshold:
+            return current
+
+        # Most common label; on a tie, the one whose oldest item came first
+        label = min(self.buckets[self.top], key=lambda l: self.items[l][0][0])
+
+        return self.items[label][0][1]
+
 # Analytics for interview feedback
 class InterviewAnalytics:
     def __init__(self):
@@ -40,9 +137,15 @@ class InterviewAnalytics:
         }
         self.poor_posture_duration = 0
         self.last_poor_posture_time = None
+        self.session_end_time = None
+
+        # Each stream is smoothed independently
+        self.gesture_smoother = Smoother()
+        self.eye_contact_smoother = Smoother()
+        self.posture_smoother = Smoother()
         
-    def update_eye_contact(self, has_contact):
-        current_time = time.time()
+    def update_eye_contact(self, has_contact, current_time=None):
+        current_time = time.time() if current_time is None else current_time
         if has_contact:
             if self.last_eye_contact_time is not None:
                 self.eye_contact_duration += (current_time - self.last_eye_contact_time)
@@ -54,8 +157,8 @@ class InterviewAnalytics:
         if gesture_type in self.hand_gesture_counts:
             self.hand_gesture_counts[gesture_type] += 1
     
-    def update_posture(self, is_good_posture):
-        current_time = time.time()
+    def update_posture(self, is_good_posture, current_time=None):
+        current_time = time.time() if current_time is None else current_time
         if not is_good_posture:
             if self.last_poor_posture_time is not None:
                 self.poor_posture_duration += (current_time - self.last_poor_posture_time)
@@ -64,7 +167,8 @@ class InterviewAnalytics:
             self.last_poor_posture_time = None
             
     def get_session_duration(self):
-        return time.time() - self.session_start_time
+        end_time = time.time() if self.session_end_time is None else self.session_end_time
+        return end_time - self.session_start_time
     
     def get_eye_contact_percentage(self):
         session_duration = self.get_session_duration()
@@ -83,331 +187,602 @@ class InterviewAnalytics:
             return "neutral"
         return max(self.hand_gesture_counts, key=self.hand_gesture_counts.get)
 
-# Initialize analytics
-analytics = InterviewAnalytics()
+# Landmark indices used by the classifiers below
+WRIST        = mp_hands.HandLandmark.WRIST
+THUMB_IP     = mp_hands.HandLandmark.THUMB_IP
+THUMB_TIP    = mp_hands.HandLandmark.THUMB_TIP
+FINGER_TIPS  = [
+    mp_hands.HandLandmark.INDEX_FINGER_TIP,
+    mp_hands.HandLandmark.MIDDLE_FINGER_TIP,
+    mp_hands.HandLandmark.RING_FINGER_TIP,
+    mp_hands.HandLandmark.PINKY_TIP,
+]
+# The pinky is compared against its own tip, as the per-landmark checks did.
+FINGER_PIPS  = [
+    mp_hands.HandLandmark.INDEX_FINGER_PIP,
+    mp_hands.HandLandmark.MIDDLE_FINGER_PIP,
+    mp_hands.HandLandmark.RING_FINGER_PIP,
+    mp_hands.HandLandmark.PINKY_TIP,
+]
+NOSE_TIP     = 1
+LEFT_EYE     = 159
+RIGHT_EYE    = 386
+SHOULDERS    = [mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.RIGHT_SHOULDER]
+HIPS         = [mp_pose.PoseLandmark.LEFT_HIP, mp_pose.PoseLandmark.RIGHT_HIP]
+
+# Pose keypoints that bound the face (nose to ears) and hands (wrists to fingers)
+FACE_KEYPOINTS = list(range(mp_pose.PoseLandmark.NOSE, mp_pose.PoseLandmark.MOUTH_RIGHT + 1))
+HAND_KEYPOINTS = list(range(mp_pose.PoseLandmark.LEFT_WRIST, mp_pose.PoseLandmark.RIGHT_THUMB + 1))
+
+# Classifier outputs, in priority order, with interview-specific feedback
+GESTURES = [
+    ("excessive_movement", "Try to keep hands more still - reduces appearance of nervousness"),
+    ("hand_near_face", "Avoid touching face during interview - shows more confidence"),
+    ("thumbs_up", "Thumbs up is positive but use sparingly in professional interviews"),
+    ("closed_fist", "Relax your hands - clenched fists may signal tension to interviewer"),
+    ("pointing", "Pointing can emphasize key points, but use judiciously"),
+    ("open_palm", "Good open palm gesture - conveys honesty and openness"),
+    ("neutral", "Neutral hand position is appropriate"),
+]
+EYE_CONTACT_FEEDBACK = [
+    "Good eye contact - shows confidence and engagement",
+    "Try to face the interviewer directly",
+    "Keep your gaze level - avoid looking up or down too much",
+]
+POSTURE_FEEDBACK = [
+    "Keep shoulders level to project confidence",
+    "Sit up straight - shows engagement and professionalism",
+    "Lean slightly forward to show interest",
+    "Good interview posture - projects professionalism",
+    "Adjust posture to appear more confident",
+]
+
+def landmarks_to_array(landmarks):
+    """Copy a MediaPipe landmark list into an (N, 3) float32 array of x, y, z"""
+    return np.array([(p.x, p.y, p.z) for p in landmarks.landmark], dtype=np.float32)
+
+def classify_gestures(hands, previous_wrists=None):
+    """
+    Classify a batch of hands for interview-relevant gestures.
+
+    hands is (F, 21, 3); previous_wrists is (F, 2) with the wrist x, y seen
+    before each hand (NaN where there was none). Returns (F,) indices into
+    GESTURES.
+    """
+    wrist  = hands[:, WRIST]
+    tips   = hands[:, FINGER_TIPS, 1]
+    pips   = hands[:, FINGER_PIPS, 1]
+
+    # Check for excessive movement, which can indicate nervousness
+    if previous_wrists is None:
+        excessive_movement = np.zeros(len(hands), dtype=bool)
+    else:
+        movement_distance  = np.hypot(wrist[:, 0] - previous_wrists[:, 0], wrist[:, 1] - previous_wrists[:, 1])
+        excessive_movement = movement_distance > 0.05  # NaN compares False
+
+    bent      = tips > pips
+    extended  = tips < pips
+    thumb_out = hands[:, THUMB_TIP, 0] > hands[:, THUMB_IP, 0]
+
+    # Closed fist (tension), open palm (positive), pointing (assertive)
+    all_fingers_bent = bent.all(axis=1)
+    fingers_extended = thumb_out & extended.all(axis=1)
+    pointing         = extended[:, 0] & bent[:, 1:].all(axis=1)
+
+    # Hand near face, assuming the top 30% of the frame is the face region
+    hand_near_face = wrist[:, 1] < 0.3
+
+    # Thumbs up: thumb above wrist and out, other fingers bent
+    thumbs_up = (hands[:, THUMB_TIP, 1] < wrist[:, 1]) & thumb_out & all_fingers_bent
+
+    return np.select(
+        [excessive_movement, hand_near_face, thumbs_up, all_fingers_bent, pointing, fingers_extended],
+        range(6),
+        default=6
+    )
+
+def classify_eye_contact(faces, image_shape):
+    """
+    Classify a batch of (F, 468, 3) face meshes for eye contact with the
+    camera. Returns (F,) booleans and (F,) indices into EYE_CONTACT_FEEDBACK.
+    """
+    h, w, _ = image_shape
+
+    # Nose position in pixels against the center of the frame (the camera)
+    nose_x          = np.trunc(faces[:, NOSE_TIP, 0] * w)
+    looking_forward = np.abs(nose_x - w // 2) < (w // 8)
+
+    # Check if eyes are level (not looking up/down too much)
+    eyes_level = np.abs(faces[:, LEFT_EYE, 1] - faces[:, RIGHT_EYE, 1]) < 0.02
+
+    good_eye_contact = looking_forward & eyes_level
+
+    return good_eye_contact, np.select([good_eye_contact, ~looking_forward], [0, 1], default=2)
+
+def classify_posture(poses):
+    """
+    Classify a batch of (F, 33, 3) poses for interview-appropriate posture.
+    Returns (F,) booleans and (F,) indices into POSTURE_FEEDBACK.
+    """
+    shoulders = poses[:, SHOULDERS]
+    hips      = poses[:, HIPS]
+
+    # Shoulder slumping, leaning and spine alignment
+    straight_shoulders = np.abs(shoulders[:, 0, 1] - shoulders[:, 1, 1]) < 0.05
+    straight_hips      = np.abs(hips[:, 0, 1] - hips[:, 1, 1]) < 0.05
+    straight_spine     = (np.abs(shoulders[:, :, 0] - hips[:, :, 0]) < 0.1).all(axis=1)
+
+    # Slight forward lean is good for engagement
+    shoulders_forward = (shoulders[:, :, 2] < -0.05).all(axis=1)
+
+    good_posture = straight_shoulders & straight_hips & straight_spine
+
+    return good_posture, np.select(
+        [~straight_shoulders, ~straight_spine, ~shoulders_forward, good_posture],
+        range(4),
+        default=4
+    )
 
 def analyze_hand_gestures(hand_landmarks, image_shape, previous_hand_positions=None):
     """
     Analyze hand landmarks for interview-relevant gestures
     Returns gesture type and interview-specific feedback
     """
-    # Get image dimensions
-    h, w, _ = image_shape
-    
-    # Extract key landmarks
-    wrist = hand_landmarks.landmark[mp_hands.HandLandmark.WRIST]
-    thumb_tip = hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_TIP]
-    index_tip = hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_TIP]
-    middle_tip = hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_TIP]
-    ring_tip = hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_TIP]
-    pinky_tip = hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_TIP]
-    
-    # Check for excessive movement (if we have previous positions)
-    # This can indicate nervousness in an interview
-    excessive_movement = False
+    hands    = landmarks_to_array(hand_landmarks)[None]
+    previous = None
+
     if previous_hand_positions is not None:
-        movement_distance = math.sqrt(
-            (wrist.x - previous_hand_positions[0])**2 + 
-            (wrist.y - previous_hand_positions[1])**2
-        )
-        excessive_movement = movement_distance > 0.05  # Threshold for rapid movement
-    
-    # Check for closed fist (often indicates tension)
-    all_fingers_bent = (
-        index_tip.y > hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_PIP].y and
-        middle_tip.y > hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_PIP].y and
-        ring_tip.y > hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_PIP].y and
-        pinky_tip.y > hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_TIP].y
-    )
-    
-    # Check for open palm (positive gesture in interviews)
-    fingers_extended = (
-        thumb_tip.x > hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_IP].x and
-        index_tip.y < hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_PIP].y and
-        middle_tip.y < hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_PIP].y and
-        ring_tip.y < hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_PIP].y and
-        pinky_tip.y < hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_TIP].y
-    )
-    
-    # Check for pointing gesture (can be assertive but overuse is negative)
-    pointing = (
-        index_tip.y < hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_PIP].y and
-        middle_tip.y > hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_PIP].y and
-        ring_tip.y > hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_PIP].y and
-        pinky_tip.y > hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_TIP].y
-    )
-    
-    # Check for hand near face (nervous habit in interviews)
-    hand_near_face = wrist.y < 0.3  # Assuming top 30% of frame is face region
-    
-    # Check for thumbs up (positive affirmation)
-    thumbs_up = (
-        thumb_tip.y < wrist.y and  # Thumb is above wrist
-        thumb_tip.x > hand_landmarks.landmark[mp_hands.HandLandmark.THUMB_IP].x and
-        index_tip.y > hand_landmarks.landmark[mp_hands.HandLandmark.INDEX_FINGER_PIP].y and
-        middle_tip.y > hand_landmarks.landmark[mp_hands.HandLandmark.MIDDLE_FINGER_PIP].y and
-        ring_tip.y > hand_landmarks.landmark[mp_hands.HandLandmark.RING_FINGER_PIP].y and
-        pinky_tip.y > hand_landmarks.landmark[mp_hands.HandLandmark.PINKY_TIP].y
-    )
-    
-    # Determine the primary gesture and interview-specific feedback
-    if excessive_movement:
-        return "excessive_movement", "Try to keep hands more still - reduces appearance of nervousness"
-    elif hand_near_face:
-        return "hand_near_face", "Avoid touching face during interview - shows more confidence"
-    elif thumbs_up:
-        return "thumbs_up", "Thumbs up is positive but use sparingly in professional interviews"
-    elif all_fingers_bent:
-        return "closed_fist", "Relax your hands - clenched fists may signal tension to interviewer"
-    elif pointing:
-        return "pointing", "Pointing can emphasize key points, but use judiciously"
-    elif fingers_extended:
-        return "open_palm", "Good open palm gesture - conveys honesty and openness"
-    else:
-        return "neutral", "Neutral hand position is appropriate"
+        previous = np.array([previous_hand_positions], dtype=np.float32)
+
+    return GESTURES[classify_gestures(hands, previous)[0]]
 
 def analyze_eye_contact(face_landmarks, image_shape):
     """
     Analyze face landmarks to determine if making eye contact
     Returns boolean and interview-specific feedback
     """
-    h, w, _ = image_shape
-    
-    # Get relevant landmarks (nose and eyes)
-    nose_tip = face_landmarks.landmark[1]
-    left_eye = face_landmarks.landmark[159]  # Left eye center
-    right_eye = face_landmarks.landmark[386]  # Right eye center
-    
-    # Convert to pixel coordinates
-    nose_x, nose_y = int(nose_tip.x * w), int(nose_tip.y * h)
-    
-    # Define center region (where the camera is)
-    center_x, center_y = w // 2, h // 2
-    
-    # For interviews, eye contact should be maintained but not constant staring
-    # Check if looking generally forward (towards camera)
-    looking_forward = abs(nose_x - center_x) < (w // 8)
-    
-    # Check if eyes are level (not looking up/down too much)
-    eyes_level = abs(left_eye.y - right_eye.y) < 0.02
-    
-    # Combined check for good interview eye contact
-    good_eye_contact = looking_forward and eyes_level
-    
-    if good_eye_contact:
-        feedback = "Good eye contact - shows confidence and engagement"
-    elif not looking_forward:
-        feedback = "Try to face the interviewer directly"
-    elif not eyes_level:
-        feedback = "Keep your gaze level - avoid looking up or down too much"
-    else:
-        feedback = "Improve eye contact to build rapport"
-        
-    return good_eye_contact, feedback
+    good, feedback = classify_eye_contact(landmarks_to_array(face_landmarks)[None], image_shape)
+
+    return bool(good[0]), EYE_CONTACT_FEEDBACK[feedback[0]]
 
 def analyze_interview_posture(pose_landmarks):
     """
     Analyze pose landmarks for interview-appropriate posture
     Returns boolean and interview-specific feedback
     """
-    # Get shoulder landmarks
-    left_shoulder = pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER]
-    right_shoulder = pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER]
-    
-    # Get hip landmarks
-    left_hip = pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_HIP]
-    right_hip = pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_HIP]
-    
-    # Check for shoulder slumping (bad in interviews)
-    shoulder_slope = abs(left_shoulder.y - right_shoulder.y)
-    
-    # Check for leaning (should sit straight in interviews)
-    hip_slope = abs(left_hip.y - right_hip.y)
-    
-    # Check for spine straightness (important for interview posture)
-    left_alignment = abs(left_shoulder.x - left_hip.x)
-    right_alignment = abs(right_shoulder.x - right_hip.x)
-    
-    # Check for forward lean (slight forward lean is good for engagement)
-    shoulders_forward = (left_shoulder.z < -0.05) and (right_shoulder.z < -0.05)
-    
-    # Interview-specific posture metrics
-    straight_shoulders = shoulder_slope < 0.05
-    straight_hips = hip_slope < 0.05
-    straight_spine = (left_alignment < 0.1 and right_alignment < 0.1)
-    
-    # Combined check for good interview posture
-    good_posture = straight_shoulders and straight_hips and straight_spine
-    
-    # Generate interview-specific feedback
-    if not straight_shoulders:
-        feedback = "Keep shoulders level to project confidence"
-    elif not straight_spine:
-        feedback = "Sit up straight - shows engagement and professionalism"
-    elif not shoulders_forward:
-        feedback = "Lean slightly forward to show interest"
-    elif good_posture:
-        feedback = "Good interview posture - projects professionalism"
-    else:
-        feedback = "Adjust posture to appear more confident"
-        
-    return good_posture, feedback
+    good, feedback = classify_posture(landmarks_to_array(pose_landmarks)[None])
 
-def apply_smoothing(current, history, history_list, confidence_threshold=0.6):
-    """Apply temporal smoothing to reduce flickering feedback"""
-    # Add current to history
-    history_list.append(current)
-    
-    # Keep only recent history
-    if len(history_list) > MAX_HISTORY:
-        history_list.pop(0)
-    
-    # Count occurrences
-    counts = {}
-    for item in history_list:
-        if item[0] not in counts:
-            counts[item[0]] = 0
-        counts[item[0]] += 1
-    
-    # Find most common
-    if not counts:
-        return current  # Return current if no history
-    
-    most_common = max(counts.items(), key=lambda x: x[1])
-    confidence = most_common[1] / len(history_list)
-    
-    # Only return if confidence is high enough
-    if confidence >= confidence_threshold:
-        for item in history_list:
-            if item[0] == most_common[0]:
-                return item
-    
-    return current
+    return bool(good[0]), POSTURE_FEEDBACK[feedback[0]]
 
-def process_frame(image, prev_hand_pos=None):
-    """Process a single frame for interview-specific feedback"""
-    
-    # Convert the BGR image to RGB
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    
-    # Process with MediaPipe
-    with mp_hands.Hands(static_image_mode=False, 
-                       max_num_hands=2, 
-                       min_detection_confidence=0.5) as hands, \
-         mp_face_mesh.FaceMesh(static_image_mode=False,
-                              max_num_faces=1,
-                              min_detection_confidence=0.5) as face_mesh, \
-         mp_pose.Pose(static_image_mode=False,
-                     min_detection_confidence=0.5) as pose:
-        
-        # Process for all landmarks
-        hand_results = hands.process(image_rgb)
-        face_results = face_mesh.process(image_rgb)
-        pose_results = pose.process(image_rgb)
-        
-        # Track current hand position for movement analysis
-        current_hand_pos = prev_hand_pos
-        
-        # Interview-focused hand gesture analysis
-        if hand_results.multi_hand_landmarks:
-            for hand_landmarks in hand_results.multi_hand_landmarks:
-                
-                # Track wrist position for movement analysis
-                wrist = hand_landmarks.landmark[mp_hands.HandLandmark.WRIST]
-                current_hand_pos = (wrist.x, wrist.y)
-                
-                # Interview-specific gesture analysis
-                gesture, feedback = analyze_hand_gestures(
-                    hand_landmarks, 
-                    image.shape, 
-                    prev_hand_pos
-                )
-                
-                # Apply smoothing
-                global gesture_history
-                gesture, feedback = apply_smoothing(
-                    (gesture, feedback), 
-                    gesture_history, 
-                    gesture_history
-                )
-                
-                # Update analytics
-                analytics.update_gesture(gesture)
-                
-        
-        # Interview-focused eye contact analysis
-        if face_results.multi_face_landmarks:
-            for face_landmarks in face_results.multi_face_landmarks:
-                
-                # Interview-specific eye contact analysis
-                has_eye_contact, eye_feedback = analyze_eye_contact(
-                    face_landmarks, 
-                    image.shape
-                )
-                
-                # Apply smoothing
-                global eye_contact_history
-                has_eye_contact, eye_feedback = apply_smoothing(
-                    (has_eye_contact, eye_feedback), 
-                    eye_contact_history, 
-                    eye_contact_history
-                )
-                
-                # Update analytics
-                analytics.update_eye_contact(has_eye_contact)
-                
-                # Display feedback
-                status_color = (0, 255, 0) if has_eye_contact else (0, 0, 255)
+class FrameAnalyser:
+    """
+    Runs the MediaPipe models over the frames of one video and returns each
+    frame's landmarks as arrays, ready for the batched classifiers in
+    analyze_frames. The graphs are created once and reused for every frame.
 
-        
-        # Interview-focused posture analysis
-        if pose_results.pose_landmarks:
+    With cascade enabled, Pose runs first and gates the other two models:
+    FaceMesh and Hands are skipped when no person is found, their previous
+    landmarks are reused when the pose hasn't moved, and otherwise they run
+    on face/hand crops taken from the pose keypoints instead of the full
+    frame. `stats` counts frames analysed and skipped per model.
+    """
 
-            
-            # Interview-specific posture analysis
-            good_posture, posture_feedback = analyze_interview_posture(
-                pose_results.pose_landmarks
+    def __init__(self, cascade=CASCADE):
+        self.cascade = cascade
+
+        # Fed crops whose size and origin change between frames under the
+        # cascade, so Hands and FaceMesh can't carry a tracked region over
+        # from one frame to the next: they detect on every crop instead.
+        self.hands = mp_hands.Hands(static_image_mode=cascade,
+                                    max_num_hands=2,
+                                    model_complexity=MODEL_COMPLEXITY,
+                                    min_detection_confidence=0.5)
+        self.face_mesh = mp_face_mesh.FaceMesh(static_image_mode=cascade,
+                                               max_num_faces=1,
+                                               min_detection_confidence=0.5)
+        self.pose = mp_pose.Pose(static_image_mode=False,
+                                 min_detection_confidence=0.5)
+
+        self.last_pose  = None
+        self.last_hands = []
+        self.last_faces = []
+
+        self.stats = {
+            model: {"analysed": 0, "skipped": 0}
+            for model in ["pose", "face_mesh", "hands"]
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.hands.close()
+        self.face_mesh.close()
+        self.pose.close()
+
+    def process(self, image, current_time=None):
+        """Process a single BGR frame"""
+
+        # Convert the BGR image to RGB
+        return self.process_rgb(cv2.cvtColor(image, cv2.COLOR_BGR2RGB), current_time)
+
+    def process_rgb(self, image_rgb, current_time=None):
+        """Process a single RGB frame"""
+        pose = self.run_pose(image_rgb)
+
+        if not self.cascade:
+            hands = self.run_hands(image_rgb)
+            faces = self.run_face_mesh(image_rgb)
+        elif pose is None:
+            # Nobody in frame: nothing for the hand and face models to find.
+            hands, faces = [], []
+            self.skip("hands", "face_mesh")
+        elif self.last_pose is not None and np.abs(pose[:, :2] - self.last_pose[:, :2]).max() < MOTION_THRESHOLD:
+            # The person hasn't moved since the last analysed frame.
+            hands, faces = self.last_hands, self.last_faces
+            self.skip("hands", "face_mesh")
+        else:
+            hands = self.run_hands(image_rgb, roi(pose, HAND_KEYPOINTS, image_rgb.shape, HAND_PADDING))
+            faces = self.run_face_mesh(image_rgb, roi(pose, FACE_KEYPOINTS, image_rgb.shape, FACE_PADDING))
+
+        if pose is not None:
+            self.last_pose  = pose
+            self.last_hands = hands
+            self.last_faces = faces
+
+        return {
+            "time"  : time.time() if current_time is None else current_time,
+            "shape" : image_rgb.shape,
+            "hands" : hands,
+            "faces" : faces,
+            "pose"  : pose,
+        }
+
+    def skip(self, *models):
+        for model in models:
+            self.stats[model]["skipped"] += 1
+
+    def run_pose(self, image_rgb):
+        self.stats["pose"]["analysed"] += 1
+
+        with metrics.MEDIAPIPE_SECONDS.time(model="pose"):
+            results = self.pose.process(image_rgb)
+
+        if not results.pose_landmarks:
+            return None
+
+        return landmarks_to_array(results.pose_landmarks)
+
+    def run_hands(self, image_rgb, box=None):
+        if box is False:
+            self.skip("hands")
+            return []
+
+        self.stats["hands"]["analysed"] += 1
+
+        with metrics.MEDIAPIPE_SECONDS.time(model="hands"):
+            results = self.hands.process(crop(image_rgb, box))
+
+        return [uncrop(landmarks_to_array(h), box, image_rgb.shape) for h in results.multi_hand_landmarks or []]
+
+    def run_face_mesh(self, image_rgb, box=None):
+        if box is False:
+            self.skip("face_mesh")
+            return []
+
+        self.stats["face_mesh"]["analysed"] += 1
+
+        with metrics.MEDIAPIPE_SECONDS.time(model="face_mesh"):
+            results = self.face_mesh.process(crop(image_rgb, box))
+
+        return [uncrop(landmarks_to_array(f), box, image_rgb.shape) for f in results.multi_face_landmarks or []]
+
+def roi(pose, keypoints, image_shape, padding):
+    """
+    Pixel box (x0, y0, x1, y1) around the given pose keypoints, grown by
+    `padding` times the shoulder width on every side and clipped to the
+    image. None (use the full frame) if the box would be too small to be
+    worth cropping, False if it lies entirely outside the frame.
+    """
+    h, w, _ = image_shape
+
+    points   = pose[keypoints, :2] * (w, h)
+    shoulder = np.linalg.norm((pose[SHOULDERS[0], :2] - pose[SHOULDERS[1], :2]) * (w, h))
+    margin   = max(padding * shoulder, MIN_ROI / 2)
+
+    x0, y0 = np.floor(points.min(axis=0) - margin).astype(int)
+    x1, y1 = np.ceil(points.max(axis=0) + margin).astype(int)
+
+    x0, y0 = max(x0, 0), max(y0, 0)
+    x1, y1 = min(x1, w), min(y1, h)
+
+    if x1 <= x0 or y1 <= y0:
+        return False
+
+    if x1 - x0 < MIN_ROI or y1 - y0 < MIN_ROI:
+        return None
+
+    return int(x0), int(y0), int(x1), int(y1)
+
+def crop(image, box):
+    if box is None:
+        return image
+
+    x0, y0, x1, y1 = box
+
+    return np.ascontiguousarray(image[y0:y1, x0:x1])
+
+def uncrop(landmarks, box, image_shape):
+    """Map landmarks normalised to a crop back to full-frame coordinates"""
+    if box is None:
+        return landmarks
+
+    h, w, _ = image_shape
+    x0, y0, x1, y1 = box
+
+    landmarks[:, 0] = (landmarks[:, 0] * (x1 - x0) + x0) / w
+    landmarks[:, 1] = (landmarks[:, 1] * (y1 - y0) + y0) / h
+    landmarks[:, 2] = landmarks[:, 2] * (x1 - x0) / w
+
+    return landmarks
+
+def analyze_frames(frames, analytics):
+    """
+    Classify the landmarks of a whole video in a few NumPy passes, then feed
+    the results through smoothing and analytics in frame order.
+    """
+
+    # Every hand is compared with the last wrist position seen before its frame.
+    hands, previous = [], []
+    prev_hand_pos = (np.nan, np.nan)
+
+    for frame in frames:
+        for hand in frame["hands"]:
+            hands.append(hand)
+            previous.append(prev_hand_pos)
+
+        if frame["hands"]:
+            prev_hand_pos = tuple(frame["hands"][-1][WRIST, :2])
+
+    if hands:
+        gestures = classify_gestures(np.stack(hands), np.array(previous, dtype=np.float32))
+
+        for index in gestures:
+            gesture, feedback = analytics.gesture_smoother.update(GESTURES[index])
+            analytics.update_gesture(gesture)
+
+    faces = [(frame["time"], frame["shape"], face) for frame in frames for face in frame["faces"]]
+
+    if faces:
+        # Every frame of a video shares one shape.
+        good, feedback = classify_eye_contact(np.stack([f[2] for f in faces]), faces[0][1])
+
+        for (current_time, _, _), contact, index in zip(faces, good.tolist(), feedback):
+            has_eye_contact, eye_feedback = analytics.eye_contact_smoother.update(
+                (contact, EYE_CONTACT_FEEDBACK[index])
             )
-            
-            # Apply smoothing
-            global posture_history
-            good_posture, posture_feedback = apply_smoothing(
-                (good_posture, posture_feedback), 
-                posture_history, 
-                posture_history
+            analytics.update_eye_contact(has_eye_contact, current_time)
+
+    poses = [(frame["time"], frame["pose"]) for frame in frames if frame["pose"] is not None]
+
+    if poses:
+        good, feedback = classify_posture(np.stack([p[1] for p in poses]))
+
+        for (current_time, _), upright, index in zip(poses, good.tolist(), feedback):
+            good_posture, posture_feedback = analytics.posture_smoother.update(
+                (upright, POSTURE_FEEDBACK[index])
             )
-            
-            # Update analytics
-            analytics.update_posture(good_posture)
-            
-            # Display feedback
-            status_color = (0, 255, 0) if good_posture else (0, 0, 255)
-    
-    return current_hand_pos
+            analytics.update_posture(good_posture, current_time)
 
-def coach_video_file(path):
-    # Open video source
+def frame_size(path):
+    """(width, height) of the analysed frames: the video's size times FRAME_SCALE"""
     cap = cv2.VideoCapture(path)
-    
-    # For tracking hand movement
-    prev_hand_pos = None
 
-    count = 0
+    width  = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
-    while cap.isOpened():
-        count += 1
+    cap.release()
 
-        success, image = cap.read()
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Could not read the frame size of {path}")
 
-        if not success or count > 10:
-            break
+    return max(1, round(width * FRAME_SCALE)), max(1, round(height * FRAME_SCALE))
 
-        image = cv2.resize(image, (0 , 0), fx=0.25, fy=0.25) 
-        prev_hand_pos = process_frame(image, prev_hand_pos)
+def read_frames(path, start=0.0, end=None):
+    """
+    Yield (seconds, frame) for every 1/SAMPLE_FPS tick with a timestamp in
+    [start, end), as RGB already downscaled by FRAME_SCALE. Ticks are aligned
+    to the start of the video, so shards sample the same frames a single
+    pass would.
 
-    # Clean up
-    cap.release()
-    
+    FFmpeg does the sampling, scaling and colour conversion and writes raw
+    rgb24 to a pipe, which is read into one preallocated buffer. Each frame
+    yielded is a view of that buffer, only valid until the next one is read
+    (MediaPipe copies its input, so analysing it in place is safe).
+    """
+    width, height = frame_size(path)
+
+    first   = math.ceil(start * SAMPLE_FPS)
+    command = ['ffmpeg', '-loglevel', 'error', '-ss', str(first / SAMPLE_FPS)]
+
+    if end is not None:
+        command += ['-t', str(end - first / SAMPLE_FPS)]
+
+    command += [
+        '-i', path,
+        '-an',
+        '-vf', f'fps={SAMPLE_FPS},scale={width}:{height}',
+        '-pix_fmt', 'rgb24',
+        '-f', 'rawvideo',
+        'pipe:1'
+    ]
+
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    frame   = np.empty((height, width, 3), dtype=np.uint8)
+    buffer  = memoryview(frame).cast('B')
+
+    try:
+        index = 0
+
+        while read_exactly(process.stdout, buffer):
+            seconds = (first + index) / SAMPLE_FPS
+
+            if end is not None and seconds >= end:
+                break
+
+            yield seconds, frame
+            index += 1
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+
+def read_exactly(pipe, buffer):
+    """Fill buffer from pipe; False at end of stream (or on a partial frame)"""
+    filled = 0
+
+    while filled < len(buffer):
+        count = pipe.readinto(buffer[filled:])
+
+        if not count:
+            return False
+
+        filled += count
+
+    return True
+
+def ffprobe(path, *options):
+    return subprocess.run(
+        ['ffprobe', '-v', 'error', *options, path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        check=True,
+        text=True
+    ).stdout
+
+def video_duration(path):
+    """Duration in seconds, or None if FFmpeg cannot tell without decoding"""
+    try:
+        duration = ffprobe(path, '-show_entries', 'format=duration', '-of', 'csv=p=0').strip()
+
+        if duration not in ("", "N/A"):
+            return float(duration)
+
+        # MediaRecorder webms have no duration in their header, so the end of
+        # the last video packet is used. This only demuxes the file.
+        packets = ffprobe(
+            path, '-select_streams', 'v:0', '-show_entries', 'packet=pts_time,duration_time', '-of', 'csv=p=0'
+        ).split()
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+    for packet in reversed(packets):
+        pts, _, length = packet.partition(",")
+
+        try:
+            return float(pts) + (float(length) if length not in ("", "N/A") else 0.0)
+        except ValueError:
+            continue
+
+    return None
+
+def analyse_shard(path, start, end, cascade):
+    """Run MediaPipe over one time range of a video, returning its frames' landmarks"""
+    with FrameAnalyser(cascade) as analyser:
+        frames = [analyser.process_rgb(image, seconds) for seconds, image in read_frames(path, start, end)]
+
+    return frames, analyser.stats
+
+shard_pool    = None
+shard_workers = 0
+shard_lock    = threading.Lock()
+
+def get_shard_pool(workers):
+    global shard_pool, shard_workers
+
+    with shard_lock:
+        if shard_pool is None or shard_workers != workers:
+            # Work already queued on the old pool still runs to completion.
+            if shard_pool is not None:
+                shard_pool.shutdown(wait=False)
+
+            # Spawned rather than forked: the server process has live threads.
+            # Spawned workers import the entry script again (serve.py, which
+            # keeps its imports for after the fork), not what it has loaded.
+            shard_pool    = ProcessPoolExecutor(
+                max_workers = workers,
+                mp_context  = multiprocessing.get_context("spawn")
+            )
+            shard_workers = workers
+
+        return shard_pool
+
+def shard_bounds(duration, workers):
+    """Split [0, duration) into up to `workers` ranges on the sampling grid"""
+    count = min(workers, int(duration // MIN_SHARD_SECONDS))
+
+    if count < 2:
+        return [(0.0, None)]
+
+    step   = math.ceil(duration / count * SAMPLE_FPS) / SAMPLE_FPS
+    starts = [i * step for i in range(count)]
+
+    return list(zip(starts, starts[1:] + [None]))
+
+def coach_video_file(path, cascade=CASCADE, workers=SHARD_WORKERS):
+    duration = video_duration(path)
+    shards   = shard_bounds(duration, workers) if duration and workers > 1 else [(0.0, None)]
+
+    if len(shards) == 1:
+        results = [analyse_shard(path, 0.0, None, cascade)]
+    else:
+        starts, ends = zip(*shards)
+        results      = list(get_shard_pool(workers).map(
+            analyse_shard, repeat(path), starts, ends, repeat(cascade)
+        ))
+
+    # Reduce: the shards' frames are replayed in order through one set of
+    # smoothers and analytics, so smoothing and the eye-contact/posture
+    # durations carry across shard boundaries exactly as in a single pass.
+    frames = [frame for shard, _ in results for frame in shard]
+    stats  = {
+        model: {key: sum(s[model][key] for _, s in results) for key in counts}
+        for model, counts in results[0][1].items()
+    }
+
+    analytics = InterviewAnalytics()
+    analytics.session_start_time = 0.0
+    analytics.session_end_time   = duration or (frames[-1]["time"] + 1 / SAMPLE_FPS if frames else 0.0)
+
+    analyze_frames(frames, analytics)
+
+    analysis = build_report(analytics)
+
+    analysis['frames'] = stats
+    analysis['shards'] = len(shards)
+
+    return analysis
+
+def analysis_key(digest, cascade=CASCADE):
+    """Cache key for the report on a video with this sha256, at the current settings"""
+    params = json.dumps(
+        {
+            "version"          : ANALYSIS_VERSION,
+            "sample_fps"       : SAMPLE_FPS,
+            "frame_scale"      : FRAME_SCALE,
+            "model_complexity" : MODEL_COMPLEXITY,
+            "cascade"          : cascade,
+        },
+        sort_keys=True
+    )
+
+    return hashlib.sha256(f"{digest}:{params}".encode()).hexdigest()
+
+def build_report(analytics):
+    """Turn a video's analytics into the coaching report returned by the API"""
     analysis = {
         "duration"    : int( analytics.get_session_duration() ),
         "eye_contact" : int( analytics.get_eye_contact_percentage() ),
@@ -0,0 +1,369 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+
+from collections import defaultdict
+from datetime    import date
+
+from llm import grade_to_score, score_to_grade
+
+log = logging.getLogger(__name__)
+
+# Finished per-answer evaluations and coach reports, kept in SQLite so cohort
+# statistics ("average grade per focus area this week") do not need anything
+# regenerated. Every row is also added to a daily rollup in the same
+# transaction, and queries read only the rollups: their size depends on the
+# number of days and distinct interview types, interviewers and focus areas,
+# not on the number of sessions.
+ANALYTICS_DB = os.environ.get('ANALYTICS_DB', os.path.join('analytics', 'cohorts.db'))
+
+GRADES = ["A", "B", "C", "D", "F"]
+
+# Rollup rows under this focus area count every answer once; the other rows
+# count an answer once per focus area of its interview.
+ALL = "*"
+
+# Columns cohort queries can group and filter answers by. "week" is the
+# Monday starting it.
+ANSWER_GROUPS  = ["day", "week", "interview_type", "interviewer", "focus_area"]
+ANSWER_FILTERS = ["interview_type", "interviewer", "focus_area"]
+COACH_GROUPS   = ["day", "week"]
+COACH_METRICS  = ["duration", "eye_contact", "posture"]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS answers (
+    session_id     TEXT    NOT NULL,
+    question_id    INTEGER NOT NULL,
+    day            INTEGER NOT NULL,
+    interview_type TEXT    NOT NULL,
+    interviewer    TEXT    NOT NULL,
+    focus_areas    TEXT    NOT NULL,
+    grade          TEXT    NOT NULL,
+    strengths      INTEGER NOT NULL,
+    improvements   INTEGER NOT NULL,
+    PRIMARY KEY (session_id, question_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS answer_rollup (
+    day            INTEGER NOT NULL,
+    interview_type TEXT    NOT NULL,
+    interviewer    TEXT    NOT NULL,
+    focus_area     TEXT    NOT NULL,
+    answers        INTEGER NOT NULL,
+    score_sum      REAL    NOT NULL,
+    score_sq_sum   REAL    NOT NULL,
+    {", ".join(f"grade_{g.lower()} INTEGER NOT NULL" for g in GRADES)},
+    PRIMARY KEY (focus_area, day, interview_type, interviewer)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS coach_reports (
+    key         TEXT    PRIMARY KEY,
+    day         INTEGER NOT NULL,
+    duration    INTEGER NOT NULL,
+    eye_contact INTEGER NOT NULL,
+    posture     INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS coach_rollup (
+    day     INTEGER PRIMARY KEY,
+    reports INTEGER NOT NULL,
+    {", ".join(f"{m}_sum REAL NOT NULL, {m}_sq_sum REAL NOT NULL" for m in COACH_METRICS)}
+);
+"""
+
+def ordinal(value):
+    """A date, ISO date string or None as a date ordinal (the `day` column)."""
+    if value is None or isinstance(value, int):
+        return value
+
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+
+    return value.toordinal()
+
+def group_column(name):
+    """SQL for a group-by column: week is derived from day."""
+    return "day - (day - 1) % 7" if name == "week" else name
+
+def group_value(name, value):
+    return date.fromordinal(value).isoformat() if name in ("day", "week") else value
+
+def spread(count, total, squares):
+    """Mean and population standard deviation from a count, sum and sum of squares."""
+    mean     = total / count
+    variance = max(0.0, squares / count - mean * mean)
+
+    return round(mean, 3), round(variance ** 0.5, 3)
+
+class CohortStore:
+    """
+    Append-only store of finished evaluations and coach reports. Recording
+    the same answer (session and question) or coach report (analysis key)
+    twice has no effect, so reports can be recorded every time they are
+    served.
+    """
+
+    def __init__(self, path=ANALYTICS_DB):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.path  = path
+        self.local = threading.local()
+        self.lock  = threading.Lock()
+
+        self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        """One connection per thread, in WAL mode so reads never wait for a write."""
+        if not hasattr(self.local, 'connection'):
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+
+            self.local.connection = connection
+
+        return self.local.connection
+
+    def record_answers(self, answers):
+        """
+        Add graded answers: dicts with session_id, question_id, day (a date),
+        interview_type, interviewer, focus_areas (a list), grade ("A" to
+        "F"), strengths and improvements (counts). Returns how many were new.
+        """
+        rollup = defaultdict(lambda: [0, 0.0, 0.0] + [0] * len(GRADES))
+        added  = 0
+
+        with self.lock, self.connection() as db:
+            for answer in answers:
+                day   = ordinal(answer['day'])
+                areas = sorted(set(answer['focus_areas'])) or [""]
+
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        answer['session_id'], answer['question_id'], day,
+                        answer['interview_type'], answer['interviewer'], json.dumps(areas),
+                        answer['grade'], answer['strengths'], answer['improvements'],
+                    )
+                )
+
+                if cursor.rowcount == 0:
+                    continue
+
+                added += 1
+                score  = grade_to_score(answer['grade'])
+
+                for area in [ALL] + areas:
+                    row     = rollup[(day, answer['interview_type'], answer['interviewer'], area)]
+                    row[0] += 1
+                    row[1] += score
+                    row[2] += score * score
+                    row[3 + GRADES.index(answer['grade'])] += 1
+
+            grades = [f"grade_{g.lower()}" for g in GRADES]
+
+            db.executemany(
+                f"""
+                INSERT INTO answer_rollup (day, interview_type, interviewer, focus_area, answers, score_sum, score_sq_sum, {", ".join(grades)})
+                VALUES ({", ".join("?" * (7 + len(GRADES)))})
+                ON CONFLICT DO UPDATE SET
+                    answers      = answers + excluded.answers,
+                    score_sum    = score_sum + excluded.score_sum,
+                    score_sq_sum = score_sq_sum + excluded.score_sq_sum,
+                    {", ".join(f"{g} = {g} + excluded.{g}" for g in grades)}
+                """,
+                [(*key, *values) for key, values in rollup.items()]
+            )
+
+        return added
+
+    def record_coach(self, reports):
+        """Add coach reports: dicts with key, day and the COACH_METRICS. Returns how many were new."""
+        rollup = defaultdict(lambda: [0] + [0.0] * (2 * len(COACH_METRICS)))
+        added  = 0
+
+        with self.lock, self.connection() as db:
+            for report in reports:
+                day    = ordinal(report['day'])
+                values = [int(report[metric]) for metric in COACH_METRICS]
+
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO coach_reports VALUES (?, ?, ?, ?, ?)",
+                    (report['key'], day, *values)
+                )
+
+                if cursor.rowcount == 0:
+                    continue
+
+                added  += 1
+                row     = rollup[day]
+                row[0] += 1
+
+                for i, value in enumerate(values):
+                    row[1 + 2 * i] += value
+                    row[2 + 2 * i] += value * value
+
+            columns = [f"{m}{suffix}" for m in COACH_METRICS for suffix in ("_sum", "_sq_sum")]
+
+            db.executemany(
+                f"""
+                INSERT INTO coach_rollup (day, reports, {", ".join(columns)})
+                VALUES ({", ".join("?" * (2 + len(columns)))})
+                ON CONFLICT DO UPDATE SET
+                    reports = reports + excluded.reports,
+                    {", ".join(f"{c} = {c} + excluded.{c}" for c in columns)}
+                """,
+                [(day, *values) for day, values in rollup.items()]
+            )
+
+        return added
+
+    def record_evaluation(self, session_id, question_id, interviewer, interview_type, focus_areas, evaluation):
+        """Record one graded answer, as grade_answer returns it. Errors are logged, not raised."""
+        try:
+            return self.record_answers([{
+                "session_id"     : session_id,
+                "question_id"    : question_id,
+                "day"            : date.today(),
+                "interview_type" : interview_type,
+                "interviewer"    : interviewer,
+                "focus_areas"    : focus_areas,
+                "grade"          : evaluation['grade'],
+                "strengths"      : len(evaluation['strengths']),
+                "improvements"   : len(evaluation['areas_for_improvement']),
+            }])
+        except sqlite3.Error:
+            log.exception("Could not record the evaluation of question %s in session %s", question_id, session_id)
+            return 0
+
+    def record_coach_report(self, key, report):
+        """Record an /api/coach report by its analysis key. Errors are logged, not raised."""
+        try:
+            return self.record_coach([{"key": key, "day": date.today(), **report}])
+        except sqlite3.Error:
+            log.exception("Could not record coach report %s", key)
+            return 0
+
+    def where(self, since, until, filters):
+        clauses, params = [], []
+
+        if since is not None:
+            clauses.append("day >= ?")
+            params.append(ordinal(since))
+
+        if until is not None:
+            clauses.append("day < ?")
+            params.append(ordinal(until))
+
+        for column, value in filters.items():
+            clauses.append(f"{column} = ?")
+            params.append(value)
+
+        return clauses, params
+
+    def answer_stats(self, group_by=(), since=None, until=None, **filters):
+        """
+        Grade statistics per cohort: answers, mean score (A=4 to F=0) with its
+        standard deviation and letter grade, and the grade distribution.
+        `group_by` takes ANSWER_GROUPS, `since` (inclusive) and `until`
+        (exclusive) are dates, and `filters` match interview_type,
+        interviewer or focus_area exactly.
+        """
+        for column in group_by:
+            if column not in ANSWER_GROUPS:
+                raise ValueError(f"Cannot group answers by {column!r}")
+
+        for column in filters:
+            if column not in ANSWER_FILTERS:
+                raise ValueError(f"Cannot filter answers by {column!r}")
+
+        clauses, params = self.where(since, until, filters)
+
+        # Only the per-area rows split answers by focus area.
+        if "focus_area" not in group_by and "focus_area" not in filters:
+            clauses.append("focus_area = ?")
+            params.append(ALL)
+        elif "focus_area" not in filters:
+            clauses.append("focus_area != ?")
+            params.append(ALL)
+
+        columns = [f"{group_column(g)} AS {g}" for g in group_by]
+        grades  = [f"SUM(grade_{g.lower()})" for g in GRADES]
+
+        rows = self.connection().execute(
+            f"""
+            SELECT {", ".join(columns + ["SUM(answers)", "SUM(score_sum)", "SUM(score_sq_sum)"] + grades)}
+            FROM answer_rollup
+            {"WHERE " + " AND ".join(clauses) if clauses else ""}
+            {"GROUP BY " + ", ".join(group_by) if group_by else ""}
+            ORDER BY {", ".join(group_by) if group_by else 1}
+            """,
+            params
+        ).fetchall()
+
+        output = []
+
+        for row in rows:
+            keys                  = row[:len(group_by)]
+            count, total, squares = row[len(group_by):len(group_by) + 3]
+            distribution          = row[len(group_by) + 3:]
+
+            if not count:
+                continue
+
+            mean, stddev = spread(count, total, squares)
+
+            output.append({
+                **{g: group_value(g, k) for g, k in zip(group_by, keys)},
+                "answers"    : count,
+                "mean_score" : mean,
+                "stddev"     : stddev,
+                "mean_grade" : score_to_grade(mean),
+                "grades"     : dict(zip(GRADES, distribution)),
+            })
+
+        return output
+
+    def coach_stats(self, group_by=(), since=None, until=None):
+        """Mean and standard deviation of each of COACH_METRICS per cohort (COACH_GROUPS)."""
+        for column in group_by:
+            if column not in COACH_GROUPS:
+                raise ValueError(f"Cannot group coach reports by {column!r}")
+
+        clauses, params = self.where(since, until, {})
+        sums            = [f"SUM({m}{suffix})" for m in COACH_METRICS for suffix in ("_sum", "_sq_sum")]
+
+        rows = self.connection().execute(
+            f"""
+            SELECT {", ".join([f"{group_column(g)} AS {g}" for g in group_by] + ["SUM(reports)"] + sums)}
+            FROM coach_rollup
+            {"WHERE " + " AND ".join(clauses) if clauses else ""}
+            {"GROUP BY " + ", ".join(group_by) if group_by else ""}
+            ORDER BY {", ".join(group_by) if group_by else 1}
+            """,
+            params
+        ).fetchall()
+
+        output = []
+
+        for row in rows:
+            keys  = row[:len(group_by)]
+            count = row[len(group_by)]
+
+            if not count:
+                continue
+
+            result = {g: group_value(g, k) for g, k in zip(group_by, keys)}
+            result["reports"] = count
+
+            for i, metric in enumerate(COACH_METRICS):
+                total, squares = row[len(group_by) + 1 + 2 * i:len(group_by) + 3 + 2 * i]
+                mean, stddev   = spread(count, total, squares)
+
+                result[metric] = {"mean": mean, "stddev": stddev}
+
+            output.append(result)
+
+        return output
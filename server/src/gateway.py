@@ -0,0 +1,319 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import logging
+import weakref
+import itertools
+import threading
+
+import httpx
+import ollama
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# Every LLM call goes through chat() / achat() below. Point OLLAMA_HOST at a
+# stub server (see bench/stub_ollama.py) to run without a model.
+OLLAMA_HOST = os.environ.get('OLLAMA_HOST', 'http://127.0.0.1:11434')
+
+# Interactive calls are the ones a candidate is waiting on mid-interview;
+# batch calls produce the end-of-interview reports and can queue behind them.
+PRIORITIES = {"interactive": 0, "batch": 1}
+TIMEOUTS   = {"interactive": 60, "batch": 300}
+
+CALLS = {
+    "questions"          : "interactive",
+    "introduction"       : "interactive",
+    "closer"             : "interactive",
+    "follow_up"          : "interactive",
+    "wrap_up"            : "interactive",
+    "grading"            : "batch",
+    "holistic_feedback"  : "batch",
+    "summary"            : "batch",
+    "summary_turn"       : "batch",
+    "summary_reduce"     : "batch",
+    "sentiment"          : "batch",
+    "sentiment_feedback" : "batch",
+}
+
+# Admission control. At most MAX_IN_FLIGHT requests are sent to Ollama at
+# once (it runs them on a handful of slots anyway); the rest wait in priority
+# order. New requests are turned away once the queue holds QUEUE_LIMITS of
+# them, and batch work is turned away first.
+MAX_IN_FLIGHT = int(os.environ.get('LLM_MAX_IN_FLIGHT', 4))
+QUEUE_LIMITS  = {"interactive": 32, "batch": 16}
+
+# Transient failures (connection drops, Ollama restarting or overloaded) are
+# retried with full jitter: attempt n sleeps uniform(0, BACKOFF * 2**n).
+RETRIES      = 2
+BACKOFF      = 0.5
+RETRY_STATUS = {429, 500, 502, 503}
+
+# A call given a `deadline` (a time.monotonic() value) is not started or
+# retried after it, waits for a slot until then at most, and is sent with the
+# smallest of these timeouts that covers the time left. The steps keep the
+# number of pooled clients small; httpx closing the connection at the timeout
+# is what makes Ollama stop generating.
+TIMEOUT_STEPS = (5, 10, 20, 30, 60, 120, 300)
+
+class Overloaded(Exception):
+    """Raised when a request is not admitted, or waited too long for a slot."""
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call's deadline passes before it could be answered."""
+
+class Admission:
+    """A counting semaphore whose waiters are served by priority, then FIFO."""
+
+    def __init__(self, slots, limits):
+        self.slots   = slots
+        self.limits  = limits
+        self.active  = 0
+        self.waiting = []
+        self.order   = itertools.count()
+        self.cond    = threading.Condition()
+
+    def acquire(self, priority, timeout=None):
+        with self.cond:
+            if len(self.waiting) >= self.limits[priority]:
+                metrics.LLM_REJECTED.inc(priority=priority)
+                raise Overloaded(f"LLM queue is full ({len(self.waiting)} waiting)")
+
+            ticket = (PRIORITIES[priority], next(self.order))
+            heapq.heappush(self.waiting, ticket)
+
+            admitted = self.cond.wait_for(
+                lambda: self.active < self.slots and self.waiting[0] == ticket,
+                timeout
+            )
+
+            if not admitted:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                self.cond.notify_all()
+
+                metrics.LLM_REJECTED.inc(priority=priority)
+                raise Overloaded(f"Timed out after {timeout}s waiting for an LLM slot")
+
+            heapq.heappop(self.waiting)
+            self.active += 1
+
+            # The next waiter may be admitted too if there are slots left.
+            self.cond.notify_all()
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+admission = Admission(MAX_IN_FLIGHT, QUEUE_LIMITS)
+
+IN_FLIGHT = metrics.Gauge(
+    "llm_in_flight",
+    "LLM requests currently sent to Ollama",
+    function = lambda: admission.active
+)
+QUEUED = metrics.Gauge(
+    "llm_queued",
+    "LLM requests waiting for a slot",
+    function = lambda: len(admission.waiting)
+)
+
+# One pooled client per timeout, so connections are kept alive between calls.
+# httpx applies the timeout per network operation, not to the whole request.
+clients       = {}
+async_clients = weakref.WeakKeyDictionary()
+clients_lock  = threading.Lock()
+
+def limits():
+    return httpx.Limits(max_connections=MAX_IN_FLIGHT * 2, max_keepalive_connections=MAX_IN_FLIGHT)
+
+def client(timeout):
+    with clients_lock:
+        if timeout not in clients:
+            clients[timeout] = ollama.Client(host=OLLAMA_HOST, timeout=timeout, limits=limits())
+
+        return clients[timeout]
+
+def async_client(timeout):
+    # httpx async clients are bound to the event loop they were created on.
+    loop = asyncio.get_running_loop()
+
+    with clients_lock:
+        per_loop = async_clients.setdefault(loop, {})
+
+        if timeout not in per_loop:
+            per_loop[timeout] = ollama.AsyncClient(host=OLLAMA_HOST, timeout=timeout, limits=limits())
+
+        return per_loop[timeout]
+
+def configure(host):
+    """Send every later request to `host`, e.g. a stub server in a benchmark."""
+    global OLLAMA_HOST
+
+    with clients_lock:
+        OLLAMA_HOST = host
+        clients.clear()
+        async_clients.clear()
+
+def transient(error):
+    if isinstance(error, ollama.ResponseError):
+        return error.status_code in RETRY_STATUS
+
+    # A timeout already cost the caller its whole budget, so it is not retried.
+    if isinstance(error, httpx.TimeoutException):
+        return False
+
+    return isinstance(error, (ConnectionError, httpx.TransportError))
+
+def timed_out(error):
+    """Whether an exception from chat() means it ran out of time (or a slot)."""
+    return isinstance(error, (DeadlineExceeded, Overloaded, httpx.TimeoutException))
+
+def backoff(attempt):
+    return random.uniform(0, BACKOFF * 2 ** attempt)
+
+def remaining(deadline):
+    """Seconds left before `deadline`, or None without one."""
+    return None if deadline is None else deadline - time.monotonic()
+
+def resolve(call, priority, timeout):
+    priority = priority or CALLS.get(call, "batch")
+    timeout  = timeout or TIMEOUTS[priority]
+
+    return priority, timeout
+
+def attempt_timeout(call, timeout, deadline):
+    """The timeout for one attempt: `timeout`, cut down to fit the deadline."""
+    left = remaining(deadline)
+
+    if left is None:
+        return timeout
+
+    if left <= 0:
+        raise DeadlineExceeded(f"No time left for {call}")
+
+    return min(timeout, next((step for step in TIMEOUT_STEPS if step >= left), timeout))
+
+def admit(call, priority, timeout, deadline):
+    left = remaining(deadline)
+
+    try:
+        admission.acquire(priority, timeout if left is None else min(timeout, left))
+    except Overloaded as e:
+        if deadline is not None and remaining(deadline) <= 0:
+            raise DeadlineExceeded(f"Deadline passed while {call} waited for a slot") from e
+
+        raise
+
+def retry_delay(attempt, deadline):
+    """Backoff before the next attempt, or None if it would pass the deadline."""
+    delay = backoff(attempt)
+    left  = remaining(deadline)
+
+    return delay if left is None or delay < left else None
+
+def record(call, model, start, response):
+    metrics.LLM_SECONDS.observe(time.perf_counter() - start, model=model, call=call)
+
+    if response.prompt_eval_count:
+        metrics.LLM_PROMPT_TOKENS.inc(response.prompt_eval_count, model=model, call=call)
+    if response.prompt_eval_duration:
+        metrics.LLM_PROMPT_SECONDS.observe(response.prompt_eval_duration / 1e9, model=model, call=call)
+    if response.eval_count:
+        metrics.LLM_COMPLETION_TOKENS.inc(response.eval_count, model=model, call=call)
+
+def chat(call, priority=None, timeout=None, deadline=None, **kwargs):
+    """
+    ollama.chat through the shared client, with admission control, retries
+    and latency/token metrics. `call` names the call site (e.g. "grading"),
+    which also picks the priority class unless one is given. Raises
+    DeadlineExceeded once `deadline` has passed.
+    """
+    priority, limit = resolve(call, priority, timeout)
+
+    for attempt in range(RETRIES + 1):
+        start   = time.perf_counter()
+        timeout = attempt_timeout(call, limit, deadline)
+
+        admit(call, priority, timeout, deadline)
+        metrics.LLM_QUEUE_SECONDS.observe(time.perf_counter() - start, priority=priority)
+
+        try:
+            response = client(timeout).chat(**kwargs)
+        except Exception as e:
+            delay = retry_delay(attempt, deadline)
+
+            if attempt == RETRIES or not transient(e) or delay is None:
+                raise
+
+            metrics.LLM_RETRIES.inc(call=call)
+            log.warning("Retrying %s after %s", call, e)
+        else:
+            record(call, kwargs.get('model'), start, response)
+            return response
+        finally:
+            admission.release()
+
+        time.sleep(delay)
+
+async def admit_async(call, priority, timeout, deadline):
+    """
+    admit() on a thread. A slot granted after the caller was cancelled is
+    handed straight back, so cancelling a waiting achat() cannot leak it.
+    """
+    waiting = asyncio.ensure_future(asyncio.to_thread(admit, call, priority, timeout, deadline))
+
+    def give_back(future):
+        if not future.cancelled() and future.exception() is None:
+            admission.release()
+
+    try:
+        await asyncio.shield(waiting)
+    except asyncio.CancelledError:
+        waiting.add_done_callback(give_back)
+        raise
+
+async def achat(call, priority=None, timeout=None, deadline=None, **kwargs):
+    """
+    chat() for asyncio callers: the generation does not hold a thread. Past
+    `deadline` the request is cancelled, which closes its connection, and
+    DeadlineExceeded is raised.
+    """
+    priority, limit = resolve(call, priority, timeout)
+
+    for attempt in range(RETRIES + 1):
+        start    = time.perf_counter()
+        timeout  = attempt_timeout(call, limit, deadline)
+        admitted = False
+
+        try:
+            await admit_async(call, priority, timeout, deadline)
+            admitted = True
+
+            metrics.LLM_QUEUE_SECONDS.observe(time.perf_counter() - start, priority=priority)
+
+            try:
+                response = await asyncio.wait_for(async_client(timeout).chat(**kwargs), remaining(deadline))
+            except TimeoutError as e:
+                raise DeadlineExceeded(f"Deadline passed before {call} was answered") from e
+        except Exception as e:
+            delay = retry_delay(attempt, deadline)
+
+            if attempt == RETRIES or not transient(e) or delay is None:
+                raise
+
+            metrics.LLM_RETRIES.inc(call=call)
+            log.warning("Retrying %s after %s", call, e)
+        else:
+            record(call, kwargs.get('model'), start, response)
+            return response
+        finally:
+            # Also on CancelledError, which is not an Exception.
+            if admitted:
+                admission.release()
+
+        await asyncio.sleep(delay)
@@ -1,8 +1,18 @@
-import ollama
+import os
 import pydantic
 import json
+import logging
+import functools
+import threading
 
-from datetime import datetime
+import metrics
+
+from gateway            import chat, timed_out, remaining
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime           import datetime
+from typing             import Literal
+
+log = logging.getLogger(__name__)
 
 LLM = "mistral-small-24b"
 CFG = {
@@ -10,6 +20,67 @@ CFG = {
     'num_ctx': 10000,
 }
 
+# Small local model for low-stakes text, so the large model's slots stay free
+# for question generation and grading.
+DRAFT_LLM = os.environ.get('DRAFT_LLM', "llama3.2:3b")
+
+# Model and options per call, looked up with route(). "single" runs every
+# call on LLM with CFG; "split" sends the low-stakes ones to DRAFT_LLM, which
+# has to be pulled first (see the README), so it is opt-in.
+# num_ctx has to fit the persona (job description and resume) where it is
+# sent; num_predict bounds the free-text replies.
+ROUTING = os.environ.get('LLM_ROUTING', "single")
+
+ROUTES = {
+    "single" : {},
+    "split"  : {
+        "questions"          : (LLM,       CFG),
+        "grading"            : (LLM,       {'temperature': 0.15, 'num_ctx': 4096}),
+        "holistic_feedback"  : (LLM,       {'temperature': 0.3,  'num_ctx': 10000, 'num_predict': 768}),
+        "summary"            : (DRAFT_LLM, {'temperature': 0.3,  'num_ctx': 4096,  'num_predict': 768}),
+        "summary_turn"       : (DRAFT_LLM, {'temperature': 0.3,  'num_ctx': 4096,  'num_predict': 192}),
+        "summary_reduce"     : (DRAFT_LLM, {'temperature': 0.3,  'num_ctx': 4096,  'num_predict': 512}),
+        "sentiment"          : (DRAFT_LLM, {'temperature': 0.15, 'num_ctx': 8192}),
+        "sentiment_feedback" : (DRAFT_LLM, {'temperature': 0.5,  'num_ctx': 4096,  'num_predict': 256}),
+        "introduction"       : (DRAFT_LLM, {'temperature': 0.7,  'num_ctx': 10000, 'num_predict': 256}),
+        "closer"             : (DRAFT_LLM, {'temperature': 0.7,  'num_ctx': 10000, 'num_predict': 192}),
+        "follow_up"          : (DRAFT_LLM, {'temperature': 0.5,  'num_ctx': 10000, 'num_predict': 192}),
+        "wrap_up"            : (DRAFT_LLM, {'temperature': 0.5,  'num_ctx': 10000, 'num_predict': 128}),
+    },
+}
+
+def route(call):
+    """chat() keyword arguments (model and options) for a call type."""
+    model, options = ROUTES[ROUTING].get(call, (LLM, CFG))
+
+    return {"model": model, "options": options}
+
+# Grade each answer in the background as soon as it arrives, so /feedback only
+# has to wait for the last few evaluations plus the holistic pass.
+INCREMENTAL_GRADING = True
+GRADING_WORKERS     = 2
+
+grader = ThreadPoolExecutor(max_workers=GRADING_WORKERS, thread_name_prefix="grader")
+
+# Comment on each answer (follow_up.tmpl / wrap_up.tmpl, alternating). The
+# reply is generated in the background from the moment the transcript is
+# known, so it never adds to the time until the next question is shown;
+# clients fetch it with reply() once it is ready.
+FOLLOW_UPS    = True
+REPLY_WORKERS = 2
+
+replier = ThreadPoolExecutor(max_workers=REPLY_WORKERS, thread_name_prefix="replier")
+
+# End-of-interview stages that run beside the grading (the holistic feedback,
+# and the voice sentiment analysis in main.py). /feedback waits for them and
+# the grades until its deadline and returns what is ready, marking the rest
+# as pending; they keep running for up to LATE_SECONDS after that deadline so
+# the client can fetch them later, and time out past it.
+REPORT_WORKERS = 2
+LATE_SECONDS   = 120
+
+reporter = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="reporter")
+
 PERSONAS = {
     "todd"  : open("../static/personas/todd.txt").read(),
     "jeff"  : open("../static/personas/jeff.txt").read(),
@@ -26,6 +97,18 @@ TEMPLATES = {
     "closer"       : open("../static/prompts/closer.tmpl").read() 
 }
 
+# Most tokens generated for each structured output. A valid reply is well
+# under these; they only stop a runaway generation that would fail anyway.
+NUM_PREDICT = {
+    "Questions"     : 1024,
+    "Feedback"      : 768,
+    "VoiceAnalysis" : 1024,
+}
+
+# Extra attempts after an output that does not validate. The model is shown
+# its output and the error, and gets twice the token budget.
+REPAIR_RETRIES = 1
+
 class Questions(pydantic.BaseModel):
     questions: list[str]
 
@@ -33,7 +116,7 @@ class Feedback(pydantic.BaseModel):
     strengths             : list[str];
     areas_for_improvement : list[str];
     suggestions           : list[str];
-    grade                 : str;
+    grade                 : Literal["A", "B", "C", "D", "F"];
 
 class Emotion(pydantic.BaseModel):
     score    : int;
@@ -49,6 +132,15 @@ class VoiceAnalysis(pydantic.BaseModel):
     uncertainty : Emotion;
     neutral     : Emotion;    
 
+def synchronized(method):
+    """Run an Interviewer method while holding that session's lock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
 class Interviewer:
     # Interviewer information.
     persona : str;
@@ -71,7 +163,29 @@ class Interviewer:
     start     : str = "N/A";
     end       : str = "N/A";
 
-    def __init__(self, name, mode, link, job_desc, resume, keywords):
+    # Per-answer evaluations, keyed by question_id.
+    evaluations : dict[int, any];
+
+    # Interviewer replies, one per answer in order, and a reply started
+    # before its answer was final (from a partial transcript).
+    replies     : list[any];
+    speculation : any = None;
+
+    # Guards the state above against concurrent requests for one session.
+    lock : any;
+
+    # Results of recent next_response calls by idempotency key, so a retried
+    # request gets the original answer instead of being processed twice.
+    responses : dict[str, any];
+
+    # Report stages by name, as (key, Future): see stage().
+    stages : dict[str, any];
+
+    # Called as on_evaluated(question_id, evaluation) once per completed
+    # grading, on the grader thread.
+    on_evaluated : any = None;
+
+    def __init__(self, name, mode, link, job_desc, resume, keywords, on_evaluated=None):
         self.persona  = PERSONAS[name]
         self.name     = name
         self.mode     = mode
@@ -82,25 +196,31 @@ class Interviewer:
 
         self.persona += f"\n# Job Description\n\n{job_desc}\n\n# Candidate Resume\n\n{resume}\n"
 
-        self.start = now()
+        self.start       = now()
+        self.history     = []
+        self.evaluations = {}
+        self.replies     = []
+        self.lock        = threading.RLock()
+        self.responses   = {}
+        self.stages      = {}
+
+        self.on_evaluated = on_evaluated
 
         self.generate_questions()
 
     def generate_questions(self):
         prompt = TEMPLATES[self.mode] % (self.keywords)
 
-        response = ollama.chat(
-            messages = [
+        self.questions = structured(
+            "questions",
+            Questions,
+            [
                 {'role': 'system', 'content': self.persona},
                 {'role': 'system', 'content': prompt}
-            ],
-            options = CFG,
-            model   = LLM,
-            format  = Questions.model_json_schema()
-        )
-
-        self.questions = Questions.model_validate_json(response.message.content).questions
+            ]
+        ).questions
 
+    @synchronized
     def next_question(self):
         if self.question_idx >= len(self.questions):
             self.end = now()
@@ -112,7 +232,8 @@ class Interviewer:
             {
                 "role": "assistant",
                 "content": question,
-                "time": now()
+                "time": now(),
+                "question_id": len(self.history)
             }
         )
 
@@ -120,55 +241,120 @@ class Interviewer:
 
         return question, self.question_idx
     
+    @synchronized
     def process_response(self, transcript):
-        if self.follow_up:
-            prompt = TEMPLATES['follow_up']
-        else:
-            prompt = TEMPLATES['wrap_up']
+        question = self.current_question()
 
-        self.history.append(
+        # Must be claimed before the answer joins the history, since a
+        # speculative reply only matches the history it was started from.
+        speculation = self.speculate_reply(transcript) if FOLLOW_UPS else None
+
+        message = {
+            "role": "user",
+            "content": transcript,
+            "time": now(),
+            "question_id": question['question_id'] if question else None
+        }
+
+        self.history.append(message)
+
+        if INCREMENTAL_GRADING and question:
+            self.queue_evaluation(question, transcript)
+
+        follow_up        = self.follow_up
+        self.follow_up   = not self.follow_up
+        self.speculation = None
+
+        if speculation is None:
+            return "", follow_up, None
+
+        speculation['message'] = message
+        self.replies.append(speculation)
+
+        speculation['future'].add_done_callback(
+            lambda future: self.record_reply(speculation, future)
+        )
+
+        reply = speculation['future']
+        text  = reply.result() if reply.done() and not reply.exception() else ""
+
+        return text, follow_up, len(self.replies) - 1
+
+    @synchronized
+    def speculate_reply(self, transcript):
+        """
+        Start generating the reply to `transcript` as the next answer, or
+        return the one already started for exactly this transcript. Called
+        with a partial transcript while the answer is still being decoded.
+        """
+        position = len(self.history)
+
+        if self.speculation is not None:
+            if self.speculation['transcript'] == transcript and self.speculation['position'] == position:
+                return self.speculation
+
+            self.speculation['future'].cancel()
+
+        call     = "follow_up" if self.follow_up else "wrap_up"
+        messages = [
+            {'role': 'system', 'content': self.persona},
+            {'role': 'system', 'content': TEMPLATES[call]}
+        ]
+
+        messages += [
+            {'role': m['role'], 'content': m['content']} for m in self.history
+        ]
+        messages.append({'role': 'user', 'content': transcript})
+
+        self.speculation = {
+            "transcript" : transcript,
+            "position"   : position,
+            "follow_up"  : self.follow_up,
+            "future"     : replier.submit(generate_reply, call, messages),
+        }
+
+        return self.speculation
+
+    @synchronized
+    def record_reply(self, reply, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+
+        # Goes right after the answer, even if the interview has moved on.
+        index = next(i for i, m in enumerate(self.history) if m is reply['message'])
+
+        self.history.insert(
+            index + 1,
             {
-                "role": "user",
-                "content": transcript,
+                "role": "assistant",
+                "content": future.result(),
                 "time": now()
             }
         )
 
-        # messages = [
-        #    {'role': 'system', 'content': self.persona},
-        #    {'role': 'system', 'content': prompt}
-        #]
-
-        # messages += self.history
-
-        # response = ollama.chat(
-        #    messages = messages,
-        #    options = CFG,
-        #    model   = LLM
-        #)
+    def reply(self, reply_id=None):
+        """The reply for an answer (the latest by default), or None."""
+        if not self.replies:
+            return None
 
-        # self.history.append(
-        #    {
-        #        "role": "assistant",
-        #        "content": response.message['content'],
-        #        "time": now()
-        #    }
-        # )
+        if reply_id is None:
+            return self.replies[-1]
 
-        self.follow_up = not self.follow_up
+        if 0 <= reply_id < len(self.replies):
+            return self.replies[reply_id]
 
-        return "", False
+        return None
     
     def generate_introduction(self):
         prompt = TEMPLATES['introduction'] % (self.mode)
 
-        response = ollama.chat(
+        response = chat(
+            "introduction",
             messages = [
                 {'role': 'system', 'content': self.persona},
                 {'role': 'user', 'content': prompt}
             ],
-            options = CFG,
-            model   = LLM,
+            **route("introduction")
         )
 
         self.history.append(
@@ -189,33 +375,110 @@ class Interviewer:
             {'role': 'system', 'content': prompt}
         ]
 
-        response = ollama.chat(
+        response = chat(
+            "closer",
             messages = messages,
-            options = CFG,
-            model   = LLM,
+            **route("closer")
         )
 
         return response.message.content
     
-    def generate_feedback(self):
+    @synchronized
+    def current_question(self):
+        for message in reversed(self.history):
+            if 'question_id' in message and message['role'] == "assistant":
+                return message
+
+        return None
+
+    @synchronized
+    def turns(self):
+        """Pair every asked question with the first answer given to it."""
+        questions = {}
+        turns     = []
+
+        for message in self.history:
+            question_id = message.get('question_id')
+
+            if question_id is None:
+                continue
+
+            if message['role'] == "assistant":
+                questions[question_id] = message
+            elif question_id in questions:
+                turns.append((questions.pop(question_id), message))
+
+        return turns
+
+    @synchronized
+    def queue_evaluation(self, question, answer, deadline=None):
+        question_id = question['question_id']
+        evaluation  = self.evaluations.get(question_id)
+
+        # An answer whose grading ran out of time is graded again.
+        if evaluation is None or (evaluation.done() and timed_out(evaluation.exception())):
+            self.evaluations[question_id] = grader.submit(
+                grade_answer, question['content'], answer, deadline
+            )
+
+            self.evaluations[question_id].add_done_callback(
+                lambda future: self.evaluated(question_id, future)
+            )
+
+        return self.evaluations[question_id]
+
+    def evaluated(self, question_id, future):
+        if self.on_evaluated is not None and future.exception() is None:
+            self.on_evaluated(question_id, future.result())
+
+    @synchronized
+    def stage(self, name, key, function, *args):
+        """
+        The Future of report stage `name`, running function(*args) on the
+        reporter pool. It is reused while `key` (what the stage was computed
+        from, e.g. the number of answers) is unchanged, unless it timed out.
+        """
+        previous, future = self.stages.get(name, (None, None))
+
+        if future is None or previous != key or (future.done() and timed_out(future.exception())):
+            future            = reporter.submit(function, *args)
+            self.stages[name] = (key, future)
+
+        return future
+
+    def generate_feedback(self, deadline=None, start=True):
+        """
+        The /feedback report, with whatever finished before `deadline`. Each
+        answer and the holistic feedback carry a status: complete, pending
+        (still running, see LATE_SECONDS), timed_out or failed. With
+        start=False nothing new is started, only finished stages are
+        collected: the follow-up for late results.
+        """
         answers    = []
         questions  = []
         transcript = ""
         history    = []
 
-        print(self.history)
+        metrics.sample_debug(log, "Generating feedback for history: %s", self.history)
 
-        for i in range(len(self.history) - 1):
-            if i % 2 != 0:
-                continue
+        turns = self.turns()
+        late  = None if deadline is None else deadline + LATE_SECONDS
 
-            q = self.history[i]
-            r = self.history[i + 1]
+        # Anything not graded incrementally yet is queued now, so all answers
+        # are graded in parallel with the holistic pass below.
+        if start:
+            pending = [self.queue_evaluation(q, r['content'], late) for q, r in turns]
+        else:
+            pending = [self.evaluations.get(q['question_id']) for q, r in turns]
+
+        for q, r in turns:
+            transcript += f"{q['role']}: {q['content']}\n"
+            transcript += f"{r['role']}: {r['content']}\n"
 
             history.append(
                 {
                     "content"     : q['content'],
-                    "question_id" : i,
+                    "question_id" : q['question_id'],
                     "role"        : "interviewer",
                     "timestamp"   : q['time']
                 }
@@ -228,48 +491,6 @@ class Interviewer:
                     "timestamp"   : r['time']
                 }
             )
-            print(TEMPLATES['feedback'] % (q['content'], r['content']))
-            response = ollama.chat(
-                messages = [
-                    {'role': 'system', 'content': TEMPLATES['feedback'] % (q['content'], r['content'])}
-                ],
-                options = CFG,
-                model   = LLM,
-                format  = Feedback.model_json_schema()
-            )
-
-            feedback = Feedback.model_validate_json(response.message.content)
-
-            feedback = {
-                'strengths'             : feedback.strengths,
-                'areas_for_improvement' : feedback.areas_for_improvement,
-                'suggestions'           : feedback.suggestions,
-                'grade'                 : feedback.grade,
-            }
-
-            feedback = {
-                "question"    : q['content'],
-                "answer"      : r['content'],
-                "question_id" : i,
-                "evaluation"  : feedback,
-            }
-
-            transcript += f"{q['role']}: {q['content']}\n"
-            transcript += f"{r['role']}: {r['content']}\n"
-
-            questions.append(q['content'])
-            answers.append(feedback)
-
-        grades = []
-
-        for answer in answers:
-            grades.append(
-                feedback['evaluation']['grade']
-            )
-
-        grades = [grade_to_score(x) for x in grades]
-        grades = sum(grades) / len(grades)
-        grade  = score_to_grade(grades)
 
         prompt = f"""
         You are an expert interview coach providing overall feedback on multiple interview responses.
@@ -284,13 +505,46 @@ class Interviewer:
         Make your feedback concise but comprehensive, highlighting the most important patterns across all responses.
         """
 
-        response = ollama.chat(
-            model    = LLM,
-            options  = CFG,
-            messages = [
-                {'role': 'system', 'content': prompt}                 
-            ]
-        )
+        if start:
+            holistic = self.stage("holistic", len(turns), holistic_feedback, prompt, late)
+        else:
+            holistic = self.stages.get("holistic", (None, None))[1]
+
+        with metrics.span("feedback.wait"):
+            wait([f for f in pending + [holistic] if f is not None], timeout=remaining(deadline))
+
+        for (q, r), evaluation in zip(turns, pending):
+            # One answer that could not be graded does not sink the rest.
+            status, evaluation = outcome(evaluation, f"grading of question {q['question_id']}")
+
+            if status != "complete":
+                evaluation = {"error": GRADING_ERRORS[status], "grade": None}
+
+            feedback = {
+                "question"    : q['content'],
+                "answer"      : r['content'],
+                "question_id" : q['question_id'],
+                "status"      : status,
+                "evaluation"  : evaluation,
+            }
+
+            questions.append(q['content'])
+            answers.append(feedback)
+
+        grades = []
+
+        for answer in answers:
+            if answer['evaluation']['grade'] is not None:
+                grades.append(
+                    answer['evaluation']['grade']
+                )
+
+        if grades:
+            grades = [grade_to_score(x) for x in grades]
+            grades = sum(grades) / len(grades)
+            grade  = score_to_grade(grades)
+        else:
+            grade  = "N/A"
 
         grade_value = 0.0
 
@@ -327,11 +581,129 @@ class Interviewer:
             "full_transcript"    : history,
         }
         
+        status, overall = outcome(holistic, "holistic feedback")
+
         output['analysis']['performance_metrics'] = performance_metrics
-        output['analysis']['overall_feedback']    = response.message.content
+        output['analysis']['overall_feedback']    = overall if status == "complete" else ""
+        output['analysis']['status']              = status
+
+        statuses         = [answer['status'] for answer in answers] + [status]
+        output['status'] = "complete" if all(s == "complete" for s in statuses) else "partial"
 
         return output
 
+def outcome(future, stage):
+    """(status, result) of a stage's Future, as reported by /feedback."""
+    if future is None or not future.done():
+        return "pending", None
+
+    error = future.exception()
+
+    if error is None:
+        return "complete", future.result()
+
+    if timed_out(error):
+        log.warning("%s timed out: %s", stage, error)
+        return "timed_out", None
+
+    log.warning("%s failed: %s", stage, error)
+    return "failed", None
+
+GRADING_ERRORS = {
+    "pending"   : "This answer is still being graded",
+    "timed_out" : "Grading this answer timed out",
+    "failed"    : "Could not grade this answer",
+}
+
+def holistic_feedback(prompt, deadline=None):
+    with metrics.span("feedback.holistic"):
+        response = chat(
+            "holistic_feedback",
+            **route("holistic_feedback"),
+            deadline = deadline,
+            messages = [
+                {'role': 'system', 'content': prompt}
+            ]
+        )
+
+    return response.message.content
+
+def structured(call, schema, messages, deadline=None):
+    """
+    Chat with the reply constrained to a pydantic `schema`, and return the
+    validated instance. Generation is capped at NUM_PREDICT for the schema;
+    an invalid reply is retried up to REPAIR_RETRIES times before the last
+    pydantic.ValidationError is raised. Repairs count against `deadline` too.
+    """
+    name     = schema.__name__
+    limit    = NUM_PREDICT[name]
+    messages = list(messages)
+    target   = route(call)
+
+    for attempt in range(REPAIR_RETRIES + 1):
+        response = chat(
+            call,
+            messages = messages,
+            options  = {**target['options'], 'num_predict': limit},
+            model    = target['model'],
+            format   = schema.model_json_schema(),
+            deadline = deadline
+        )
+
+        if response.eval_count:
+            metrics.LLM_SCHEMA_TOKENS.observe(response.eval_count, schema=name)
+
+        try:
+            result = schema.model_validate_json(response.message.content)
+        except pydantic.ValidationError as e:
+            if attempt == REPAIR_RETRIES:
+                metrics.LLM_INVALID_OUTPUTS.inc(schema=name, outcome="failed")
+                raise
+
+            metrics.sample_debug(log, "Invalid %s output: %s", name, response.message.content)
+
+            messages += [
+                {'role': 'assistant', 'content': response.message.content},
+                {'role': 'user', 'content': f"That reply does not match the required JSON schema ({e.error_count()} errors, first: {e.errors()[0]['msg']}). Reply again with only the corrected JSON."}
+            ]
+            limit *= 2
+
+            continue
+
+        if attempt > 0:
+            metrics.LLM_INVALID_OUTPUTS.inc(schema=name, outcome="repaired")
+
+        return result
+
+def generate_reply(call, messages):
+    response = chat(
+        call,
+        messages = messages,
+        **route(call)
+    )
+
+    return response.message.content
+
+def grade_answer(question, answer, deadline=None):
+    prompt = TEMPLATES['feedback'] % (question, answer)
+    metrics.sample_debug(log, "Grading prompt: %s", prompt)
+
+    feedback = structured(
+        "grading",
+        Feedback,
+        [
+            {'role': 'system', 'content': prompt}
+        ],
+        deadline
+    )
+
+    return {
+        'strengths'             : feedback.strengths,
+        'areas_for_improvement' : feedback.areas_for_improvement,
+        'suggestions'           : feedback.suggestions,
+        'grade'                 : feedback.grade,
+    }
+
 def grade_to_score(grade):
         if grade == "A":
             return 4.0
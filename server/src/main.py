@@ -2,21 +2,37 @@ import os
 
 import pypdf
 import json
+import time
 import base64
-import ollama
+import hashlib
+import logging
+
+from concurrent.futures  import Future, wait
+from flask               import Flask, request, jsonify, g, send_file
+from flask_cors          import CORS
+from flask_sock          import Sock
+from uuid                import uuid4
+from pathlib             import Path
+from datetime            import datetime
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from llm           import Interviewer, VoiceAnalysis, LATE_SECONDS, structured, route, outcome
+from gateway       import chat, remaining, Overloaded, DeadlineExceeded
+from transcription import transcribe_webm, StreamingTranscriber
+from scraping      import scrape_job, save_to_json
+from coach         import coach_video_file, analysis_key
+from media         import analyse_media, NoStreams
+from summarize     import summarize
+from cohorts       import CohortStore, ANSWER_FILTERS
+from profiling     import profiled, authorized, captures, capture_path
+from storage       import UPLOAD_FOLDER, RECORD_FOLDER, COACH_FOLDER, CACHE_FOLDER, CACHE_QUOTA_MB, SESSION_IDLE_HOURS, Janitor, ResultCache, touch_session, session_dir, session_files, discard
 
-from flask       import Flask, request, jsonify
-from flask_cors  import CORS
-from uuid        import uuid4
-from pathlib     import Path
-from datetime    import datetime
+import metrics
 
-from llm           import Interviewer, LLM, CFG, VoiceAnalysis
-from transcription import transcribe_webm
-from scraping      import scrape_job, save_to_json
-from coach         import coach_video_file
+logging.basicConfig(level = os.environ.get('LOG_LEVEL', 'INFO'))
 
-app = Flask(__name__)
+app  = Flask(__name__)
+sock = Sock(app)
 
 CORS(
     app,
@@ -29,13 +45,73 @@ CORS(
 app.config['CORS_HEADERS'] = 'Content-Type'
 app.config['CORS_SUPPORTS_CREDENTIALS'] = True
 
-ctx = {}
+# Largest request body accepted on any route, in megabytes. Recordings sent
+# as base64 JSON are roughly a third larger than the audio itself.
+MAX_UPLOAD_MB = int(os.environ.get('MAX_UPLOAD_MB', 256))
+CHUNK_SIZE    = 64 * 1024
+
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024
+
+# Longest a client can block on /reply (or the stream) for the interviewer's
+# comment on an answer, in seconds.
+REPLY_WAIT = 30
+
+# next_response results kept per session for retried requests.
+REMEMBERED_RESPONSES = 32
+
+# Seconds /feedback and /voice_sentiment spend on a report before answering
+# with whatever is ready. Clients can ask for up to MAX_BUDGET with ?budget=,
+# and block for up to LATE_WAIT on /feedback/late for the rest.
+FEEDBACK_BUDGET = 45
+MAX_BUDGET      = 300
+LATE_WAIT       = 30
+
+ctx       = {}
+last_seen = {}
 
-UPLOAD_FOLDER = 'uploads'
-RECORD_FOLDER = 'recordings'
+SESSIONS = metrics.Gauge(
+    "interview_sessions",
+    "Interview sessions held in memory",
+    function = lambda: len(ctx)
+)
+
+def live_sessions():
+    """Drop sessions idle for SESSION_IDLE_HOURS from ctx; returns the rest."""
+    cutoff = time.time() - SESSION_IDLE_HOURS * 3600
+
+    for session_id, seen in list(last_seen.items()):
+        if seen < cutoff:
+            ctx.pop(session_id, None)
+            last_seen.pop(session_id, None)
+
+    return list(ctx)
 
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(RECORD_FOLDER, exist_ok=True)
+# Set up by start(), in each process that serves requests.
+janitor      = None
+coach_cache  = None
+cohort_store = None
+
+def start(sweep=True):
+    """
+    Open the stores and start the janitor if `sweep`. Not done on import:
+    coach's spawned shard workers can import this module again, and need
+    none of it.
+    """
+    global janitor, coach_cache, cohort_store
+
+    # Deletes old uploads and recordings, except for live sessions. With
+    # several workers only one of them runs it (see serve.py); the others'
+    # sessions are kept by their markers.
+    janitor = Janitor(active = live_sessions)
+
+    if sweep:
+        janitor.start()
+
+    # /api/coach reports for videos that were uploaded before.
+    coach_cache = ResultCache(CACHE_FOLDER, CACHE_QUOTA_MB, "coach")
+
+    # Finished evaluations and coach reports, for the /admin/cohorts statistics.
+    cohort_store = CohortStore()
 
 def extract_resume(stream) -> str:
     reader = pypdf.PdfReader(stream)
@@ -53,7 +129,104 @@ def extract_resume(stream) -> str:
 def bad_request(msg):
     return jsonify({"error": msg}), 400
 
+class EmptyRecording(Exception):
+    pass
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    return jsonify({"error": str(e)}), 503, {'Retry-After': '5'}
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.before_request
+def record_activity():
+    session_id = (request.view_args or {}).get('session_id')
+
+    if session_id in ctx:
+        last_seen[session_id] = time.time()
+        touch_session(session_id)
+
+@app.after_request
+def record_latency(response):
+    if 'request_start' in g:
+        metrics.REQUEST_SECONDS.observe(
+            time.perf_counter() - g.request_start,
+            route  = request.url_rule.rule if request.url_rule else "unmatched",
+            method = request.method,
+            status = response.status_code
+        )
+
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
+
+@app.route('/admin/profiles', methods=['GET'])
+def list_profiles():
+    if not authorized():
+        return jsonify({"error": "Forbidden"}), 403
+
+    return jsonify(captures(request.args.get('limit', type = int))), 200
+
+@app.route('/admin/profiles/<request_id>/<name>', methods=['GET'])
+def download_profile(request_id, name):
+    """Download a capture's profile.json (summary and function table) or stacks.folded."""
+    if not authorized():
+        return jsonify({"error": "Forbidden"}), 403
+
+    path = capture_path(request_id, name)
+
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+
+    return send_file(os.path.abspath(path), as_attachment = True, download_name = f"{request_id}-{name}")
+
+@app.route('/admin/cohorts/answers', methods=['GET'])
+def answer_cohorts():
+    """
+    Grade statistics of recorded answers, e.g. the average grade per focus
+    area this week: ?group_by=focus_area&since=2025-04-07. Also takes until
+    and interview_type / interviewer / focus_area filters.
+    """
+    if not authorized():
+        return jsonify({"error": "Forbidden"}), 403
+
+    filters = {column: request.args[column] for column in ANSWER_FILTERS if column in request.args}
+
+    try:
+        rows = cohort_store.answer_stats(
+            request.args.getlist('group_by'),
+            request.args.get('since'),
+            request.args.get('until'),
+            **filters
+        )
+    except ValueError as e:
+        return bad_request(str(e))
+
+    return jsonify(rows), 200
+
+@app.route('/admin/cohorts/coach', methods=['GET'])
+def coach_cohorts():
+    """Eye contact, posture and duration statistics of recorded coach reports, by day or week."""
+    if not authorized():
+        return jsonify({"error": "Forbidden"}), 403
+
+    try:
+        rows = cohort_store.coach_stats(
+            request.args.getlist('group_by'),
+            request.args.get('since'),
+            request.args.get('until')
+        )
+    except ValueError as e:
+        return bad_request(str(e))
+
+    return jsonify(rows), 200
+
 @app.route('/api/start_interview', methods = ['POST'])
+@profiled
 def start_interview():
     REQUIRED_FIELDS = [
         'interviewer',
@@ -79,33 +252,49 @@ def start_interview():
         return bad_request("Must provide a PDF file")
     
     uuid = f"{uuid4()}"
-    path = os.path.join(UPLOAD_FOLDER, uuid)
-    text = extract_resume(file)
+    path = os.path.join(session_dir(UPLOAD_FOLDER, uuid), "resume.txt")
+
+    with metrics.span("start_interview.resume"):
+        text = extract_resume(file)
 
     with open(path, "w") as dest:
         dest.write(text)
 
     interviewer    = request.form['interviewer']
     interview_type = request.form['interview_type']
-    focus_areas    = request.form['focus_areas']
+    focus_areas    = json.loads(request.form['focus_areas'])
     job_link       = request.form['job_link']
     
     # https://careers.servicenow.com/jobs/744000052094688/sr-manager-product-design-crm-industry-workflows/
-    job_data = scrape_job(job_link)
-    save_to_json(job_data, "../static/job_data.json") 
-
-    ctx[uuid] = Interviewer(
-        interviewer,
-        interview_type,
-        job_link,
-        open("../static/job_data.json").read(),
-        text,
-        json.loads(focus_areas)
-    )
+    with metrics.span("start_interview.scrape"):
+        job_data = scrape_job(job_link)
+        save_to_json(job_data, "../static/job_data.json") 
+
+    with metrics.span("start_interview.questions"):
+        ctx[uuid] = Interviewer(
+            interviewer,
+            interview_type,
+            job_link,
+            open("../static/job_data.json").read(),
+            text,
+            focus_areas,
+            on_evaluated = lambda question_id, evaluation: cohort_store.record_evaluation(
+                uuid, question_id, interviewer, interview_type, focus_areas, evaluation
+            )
+        )
+
+    last_seen[uuid] = time.time()
+    touch_session(uuid)
+
+    # Workers without the janitor expire their idle sessions here instead.
+    live_sessions()
+
+    with metrics.span("start_interview.introduction"):
+        introduction = ctx[uuid].generate_introduction()
 
     response = {
         "session_id"   : uuid,
-        'introduction' : ctx[uuid].generate_introduction(),
+        'introduction' : introduction,
     }
     
     return jsonify(response), 200
@@ -135,22 +324,152 @@ def next_question(session_id):
 
     return response, 200
 
+def recording_path(session_id):
+    time = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+
+    return os.path.join(session_dir(RECORD_FOLDER, session_id), f"{time}.wav")
+
+def reply_to_transcript(session, text):
+    # The reply is usually still being generated; it is fetched from /reply.
+    reply, follow_up, reply_id = session.process_response(text)
+
+    return {
+        "transcription"     : text,
+        "interviewer_reply" : reply,
+        "is_follow_up"      : follow_up,
+        "reply_id"          : reply_id,
+        "reply_ready"       : reply_id is None or bool(reply),
+    }
+
+def reply_status(reply, reply_id, timeout):
+    future = reply['future']
+
+    wait([future], timeout = timeout)
+
+    response = {
+        "reply_id"     : reply_id,
+        "is_follow_up" : reply['follow_up'],
+        "ready"        : future.done(),
+    }
+
+    if future.done():
+        if future.cancelled() or future.exception() is not None:
+            response['error'] = "Could not generate a reply"
+        else:
+            response['interviewer_reply'] = future.result()
+
+    return response
+
+def respond_to_recording(session, path):
+    # Transcribe the recording
+    try:
+        text = transcribe_webm(path, auto_translate_non_english = True)['text']
+    except Exception as e:
+        return {"error": f"Error transcribing recording: {str(e)}"}, 500
+    
+    return reply_to_transcript(session, text), 200
+
+def idempotent(session, key, work, duplicate=None):
+    """
+    Run work() -> (body, status) once per key for this session. A request
+    with the same key waits for the one in flight, or gets its stored
+    result, and calls duplicate() instead of doing the work again. Only
+    successful results are kept, so a failed request can be retried.
+    """
+    with session.lock:
+        future = session.responses.get(key)
+        owner  = future is None
+
+        if owner:
+            future = session.responses[key] = Future()
+
+            while len(session.responses) > REMEMBERED_RESPONSES:
+                session.responses.pop(next(iter(session.responses)))
+
+    if not owner:
+        metrics.RESPONSE_REPLAYS.inc(state = "stored" if future.done() else "in_flight")
+
+        if duplicate is not None:
+            duplicate()
+
+        return future.result()
+
+    def forget():
+        with session.lock:
+            if session.responses.get(key) is future:
+                del session.responses[key]
+
+    try:
+        body, status = work()
+    except BaseException as e:
+        forget()
+        future.set_exception(e)
+        raise
+
+    if status >= 300:
+        forget()
+
+    future.set_result((body, status))
+
+    return body, status
+
+def save_stream(stream, path):
+    """Copy a stream to path in CHUNK_SIZE pieces. Returns its size and sha256."""
+    digest = hashlib.sha256()
+    size   = 0
+
+    with open(path, 'wb') as dest:
+        while chunk := stream.read(CHUNK_SIZE):
+            dest.write(chunk)
+            digest.update(chunk)
+            size += len(chunk)
+
+    return size, digest.hexdigest()
+
+def answer(session_id, save):
+    """
+    Store and answer one recording for the next_response routes. save(path)
+    writes the recording and returns its sha256. With an Idempotency-Key
+    header, retries are matched before anything is written; without one, a
+    recording identical to an earlier one in the session counts as a retry.
+    """
+    session = ctx[session_id]
+    path    = recording_path(session_id)
+    key     = request.headers.get('Idempotency-Key')
+
+    def work():
+        try:
+            if key:
+                save(path)
+
+            return respond_to_recording(session, path)
+        except Exception:
+            discard(path)
+            raise
+
+    if key:
+        return idempotent(session, f"key:{key}", work)
+
+    try:
+        digest = save(path)
+    except Exception:
+        discard(path)
+        raise
+
+    return idempotent(session, f"sha256:{digest}", work, duplicate = lambda: discard(path))
+
 @app.route('/api/interview/<session_id>/next_response', methods=["POST"])
+@profiled
 def next_response(session_id):
     if session_id not in ctx:
         return bad_request("Interview session not found")
     
-    session = ctx[session_id]
-    data    = request.json
+    data = request.json
 
     if 'data' not in data:
         return jsonify({"error": "No recording data provided"}), 400
-    
-    time = datetime.now().strftime("%Y%m%d_%H%M%S")
-    name = f"{session_id}_{time}.wav"
-    path = os.path.join(RECORD_FOLDER, name)
 
-    try:
+    def save(path):
         # Decode base64 data
         encoded_data = data['data'].split(',')[1] if ',' in data['data'] else data['data']
         binary_data = base64.b64decode(encoded_data)
@@ -158,103 +477,283 @@ def next_response(session_id):
         # Save the recording
         with open(path, 'wb') as f:
             f.write(binary_data)
-        
-        # Transcribe the recording
+
+        return hashlib.sha256(binary_data).hexdigest()
+
+    try:
+        body, status = answer(session_id, save)
+    except Exception as e:
+        return jsonify({"error": f"Error processing recording: {str(e)}"}), 500
+
+    return jsonify(body), status
+
+@app.route('/api/interview/<session_id>/next_response/upload', methods=["POST"])
+@profiled
+def next_response_upload(session_id):
+    """
+    Same as next_response, but takes the recording as a multipart 'file' part
+    or as the raw request body, and streams it to disk in CHUNK_SIZE pieces
+    instead of holding the whole clip (three times over) in memory.
+    """
+    if session_id not in ctx:
+        return bad_request("Interview session not found")
+
+    if request.mimetype == 'multipart/form-data':
         try:
-            text = transcribe_webm(path, auto_translate_non_english = True)['text']
-        except Exception as e:
-            return jsonify({"error": f"Error transcribing recording: {str(e)}"}), 500
-        
-        reply, follow_up = session.process_response(text)
+            if 'file' not in request.files:
+                return bad_request("No file part in the request")
+        except RequestEntityTooLarge:
+            return jsonify({"error": f"Recording exceeds {MAX_UPLOAD_MB} MB limit"}), 413
 
-        response = {
-            "transcription"     : text,
-            "interviewer_reply" : reply,
-            "is_follow_up"      : follow_up,
-        }
+        # Werkzeug has already spooled the part to a temporary file.
+        stream = request.files['file'].stream
+    else:
+        stream = request.stream
+
+    def save(path):
+        size, digest = save_stream(stream, path)
+
+        if size == 0:
+            raise EmptyRecording()
+
+        return digest
+
+    try:
+        body, status = answer(session_id, save)
+
+    except EmptyRecording:
+        return jsonify({"error": "No recording data provided"}), 400
+
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"Recording exceeds {MAX_UPLOAD_MB} MB limit"}), 413
 
-        return jsonify(response), 200
-    
     except Exception as e:
         return jsonify({"error": f"Error processing recording: {str(e)}"}), 500
 
+    return jsonify(body), status
+
+@sock.route('/api/interview/<session_id>/stream')
+def stream_response(ws, session_id):
+    """
+    WebSocket variant of next_response that transcribes while the candidate
+    is still talking. The client sends the MediaRecorder chunks as binary
+    messages and the text message "end" once the answer is over. Partial
+    transcripts are pushed back as {"partial": ...} as segments finish, and
+    the last message has the same shape as the next_response reply.
+    """
+    if session_id not in ctx:
+        ws.send(json.dumps({"error": "Interview session not found"}))
+        return
+    
+    session = ctx[session_id]
+    path    = recording_path(session_id)
+
+    transcriber = StreamingTranscriber(
+        auto_translate_non_english = True,
+        on_segment = lambda text: ws.send(json.dumps({"partial": text}))
+    )
+
+    try:
+        # Keep the full recording around for voice_sentiment.
+        with open(path, 'wb') as recording:
+            while True:
+                chunk = ws.receive()
+
+                if isinstance(chunk, str):
+                    if chunk == "end":
+                        break
+                    continue
+
+                recording.write(chunk)
+                transcriber.feed(chunk)
+    except Exception:
+        # A partial recording must not be taken for an answer later on.
+        transcriber.cancel()
+        discard(path)
+        raise
+
+    # Start on the reply while Whisper finishes the last segment. If that
+    # segment adds words, process_response starts over with the full text.
+    if transcriber.text:
+        session.speculate_reply(transcriber.text)
+
+    try:
+        text = transcriber.finish()['text']
+    except Exception as e:
+        discard(path)
+        ws.send(json.dumps({"error": f"Error transcribing recording: {str(e)}"}))
+        return
+
+    response = reply_to_transcript(session, text)
+    ws.send(json.dumps(response))
+
+    if not response['reply_ready']:
+        reply_id = response['reply_id']
+        ws.send(json.dumps(reply_status(session.reply(reply_id), reply_id, REPLY_WAIT)))
+
+@app.route('/api/interview/<session_id>/reply', methods=["GET"])
+def interviewer_reply(session_id):
+    """
+    The interviewer's comment on an answer: the latest one, or ?reply_id=
+    from the next_response reply. Waits up to ?wait= seconds for it to be
+    generated, and answers 202 if it is not ready by then.
+    """
+    if session_id not in ctx:
+        return bad_request("Interview session not found")
+
+    session  = ctx[session_id]
+    reply_id = request.args.get('reply_id', type = int)
+    timeout  = min(request.args.get('wait', 0, type = float), REPLY_WAIT)
+    reply    = session.reply(reply_id)
+
+    if reply is None:
+        return jsonify({"error": "No reply for this answer"}), 404
+
+    response = reply_status(reply, session.replies.index(reply), timeout)
+
+    return jsonify(response), 200 if response['ready'] else 202
+
 @app.route('/api/interview/<session_id>/feedback', methods=["GET"])
+@profiled
 def feedback(session_id):
     if session_id not in ctx:
         return bad_request("Interview session not found")
     
+    response = feedback_report(ctx[session_id], session_id, request_deadline())
+
+    return jsonify(response), 200 if response['status'] == "complete" else 202
+
+@app.route('/api/interview/<session_id>/feedback/late', methods=["GET"])
+def late_feedback(session_id):
+    """
+    The /feedback report again, with the stages that were still pending
+    filled in if they have finished since. Waits up to ?wait= seconds for
+    them, and starts no new work.
+    """
+    if session_id not in ctx:
+        return bad_request("Interview session not found")
+
     session = ctx[session_id]
 
-    response                        = session.generate_feedback()
-    response['sentiment_analysis']  = voice_sentiment(session_id)
+    if "holistic" not in session.stages:
+        return jsonify({"error": "Feedback has not been requested for this interview"}), 404
 
-    return jsonify(response), 200
+    timeout  = min(request.args.get('wait', 0, type = float), LATE_WAIT)
+    response = feedback_report(session, session_id, time.monotonic() + timeout, start = False)
 
-@app.route('/api/coach', methods=['POST'])
-def coach():
+    return jsonify(response), 200 if response['status'] == "complete" else 202
+
+def request_deadline():
+    """Now plus the request's ?budget= (FEEDBACK_BUDGET by default), on the time.monotonic() clock."""
+    budget = min(request.args.get('budget', FEEDBACK_BUDGET, type = float), MAX_BUDGET)
+
+    return time.monotonic() + budget
+
+def sentiment_stage(session, session_id, deadline, start=True):
+    if not start:
+        return session.stages.get("sentiment", (None, None))[1]
+
+    return session.stage("sentiment", len(session.turns()), voice_sentiment, session_id, deadline + LATE_SECONDS)
+
+def feedback_report(session, session_id, deadline, start=True):
+    """generate_feedback plus the voice sentiment analysis, as of `deadline`."""
+    sentiment = sentiment_stage(session, session_id, deadline, start)
+
+    with metrics.span("feedback.answers"):
+        response = session.generate_feedback(deadline, start)
+
+    with metrics.span("feedback.sentiment"):
+        if sentiment is not None:
+            wait([sentiment], timeout = max(0, remaining(deadline)))
+
+        status, result = outcome(sentiment, "voice sentiment")
+
+    response['sentiment_analysis'] = {**(result or {}), "status": status}
+
+    if status != "complete":
+        response['status'] = "partial"
+
+    if response['status'] == "partial":
+        response['late_results'] = f"/api/interview/{session_id}/feedback/late"
+
+    return response
+
+def save_webm_upload():
+    """
+    Validate and store the 'file' part of a coach upload, hashing it on the
+    way to disk. Returns (path, sha256, error).
+    """
     if 'file' not in request.files:
-        return bad_request("No file part in the request")
+        return None, None, bad_request("No file part in the request")
     
     file = request.files['file']
     name = file.filename
 
     if not name:
-        return bad_request("No file selected")
+        return None, None, bad_request("No file selected")
     
     if Path(name).suffix != ".webm":
-        return bad_request("Must provide a WEBM file")
+        return None, None, bad_request("Must provide a WEBM file")
 
-    uuid = f"{uuid4()}"
-    path = os.path.join(UPLOAD_FOLDER, uuid)
+    path = os.path.join(COACH_FOLDER, f"{uuid4()}.webm")
+
+    _, digest = save_stream(file.stream, path)
+
+    return path, digest, None
+
+@app.route('/api/coach', methods=['POST'])
+@profiled
+def coach():
+    path, digest, error = save_webm_upload()
+
+    if error:
+        return error
+
+    key = analysis_key(digest)
+
+    try:
+        analysis = coach_cache.get(key)
 
-    with open(path, "wb") as dest:
-        file.save(dest)
+        if analysis is None:
+            analysis = coach_video_file(path)
+            coach_cache.put(key, analysis)
+    finally:
+        discard(path)
 
-    analysis = coach_video_file(path)
+    cohort_store.record_coach_report(key, analysis)
 
     return jsonify(analysis), 200
 
+@app.route('/api/coach/full', methods=['POST'])
+def coach_full():
+    """
+    Like /api/coach, but the upload is demuxed once and its audio is
+    transcribed alongside the video analysis: returns the transcript, body
+    language report and speech pacing together.
+    """
+    path, _, error = save_webm_upload()
+
+    if error:
+        return error
+
+    try:
+        report = analyse_media(path)
+    except NoStreams as e:
+        return bad_request(str(e))
+    except Exception as e:
+        return jsonify({"error": f"Error analysing recording: {str(e)}"}), 500
+    finally:
+        discard(path)
+
+    return jsonify(report), 200
+
 @app.route("/api/interview/<session_id>/summarize", methods=["GET"])
 def summarize_interview(session_id):
     if session_id not in ctx:
         return bad_request("Interview session not found")
     
-    session    = ctx[session_id]
-    transcript = ""
-
-    for message in session.history:
-        transcript += f"{message['role']}: {message['content']}\n"
-    
-    # Generate summary using LLM
-    summary_prompt = f"""
-    Generate a comprehensive summary of this job interview.
-    
-    Job Type: {session.mode}
-    Focus Areas: {', '.join(session.focus_areas) if hasattr(session, 'focus_areas') else 'General'}
-    
-    Interview Content:
-    {transcript}
-    
-    Please include:
-    1. Main topics discussed
-    2. Key skills and experiences highlighted
-    3. Overall impression
-    4. Areas where the candidate showed strength
-    5. Areas where the candidate could improve
-    
-    Keep the summary concise but thorough, focusing on the most important aspects of the interview.
-    """
-    
-    response = ollama.chat(
-        model   = LLM,
-        options = CFG,
-        messages=[
-            {'role': 'system', 'content': "You are an expert interview analyst. Provide clear, balanced, and constructive interview summaries."},
-            {'role': 'user', 'content': summary_prompt}
-        ]
-    )
-    
-    summary = response['message']['content'].strip()
+    with metrics.span("summarize.map_reduce"):
+        summary = summarize(ctx[session_id])
     
     return jsonify({
         "session_id": session_id,
@@ -263,34 +762,45 @@ def summarize_interview(session_id):
 
 # New endpoint for voice sentiment analysis
 @app.route('/api/interview/<session_id>/voice_sentiment', methods=['GET'])
+@profiled
 def analyze_voice_sentiment(session_id):
     if session_id not in ctx:
         return bad_request("Interview session not found")
     
-    result = voice_sentiment(session_id)
-    
+    deadline = request_deadline()
+    future   = sentiment_stage(ctx[session_id], session_id, deadline)
+
+    wait([future], timeout = max(0, remaining(deadline)))
+
+    status, result = outcome(future, "voice sentiment")
+
+    if status != "complete":
+        return jsonify({"status": status}), 202 if status == "pending" else 504 if status == "timed_out" else 500
+
+    if 'error' in result:
+        return jsonify(result), 404
+
     return jsonify(result), 200
     
 
-def voice_sentiment(session_id):
+def voice_sentiment(session_id, deadline=None):
     # Get all recordings for this session
-    recordings = []
-    for file in os.listdir(RECORD_FOLDER):
-        if file.startswith(session_id) and (file.endswith('.wav') or file.endswith('.webm')):
-            recordings.append(file)
+    recordings = session_files(RECORD_FOLDER, session_id, ('.wav', '.webm'))
     
     if not recordings:
-        return jsonify({"error": "No recordings found for analysis"}), 404
+        return {"error": "No recordings found for analysis"}
     
     # Transcribe all recordings and combine them
     all_text = ""
-    for recording in recordings:
-        file_path = os.path.join(RECORD_FOLDER, recording)
+    for file_path in recordings:
+        if deadline is not None and remaining(deadline) <= 0:
+            raise DeadlineExceeded("Deadline passed while transcribing recordings")
+
         try:
             transcript = transcribe_webm(file_path, auto_translate_non_english = True)['text']
             all_text += transcript + " "
         except Exception as e:
-            print(f"Error transcribing {recording}: {str(e)}")
+            print(f"Error transcribing {file_path}: {str(e)}")
     
     # Analyze the emotional states using LLM
     sentiment_prompt = f"""
@@ -311,18 +821,16 @@ def voice_sentiment(session_id):
     Format your response as a JSON object with these five states as keys, each containing a score and evidence field.
     """
     
-    response = ollama.chat(
-        model    = LLM,
-        options  = CFG,
-        format   = VoiceAnalysis.model_json_schema(),
-        messages = [
+    analysis = structured(
+        "sentiment",
+        VoiceAnalysis,
+        [
             {'role': 'system', 'content': "You are an expert in analyzing emotional states from text. Provide detailed, evidence-based analysis."},
             {'role': 'user', 'content': sentiment_prompt}
-        ]
+        ],
+        deadline
     )
 
-    analysis = VoiceAnalysis.model_validate_json(response.message.content)
-
     analysis = {
         'confidence'  : analysis.confidence.to_dict(),
         'nervousness' : analysis.nervousness.to_dict(),
@@ -350,9 +858,10 @@ def voice_sentiment(session_id):
         
         Provide 3-4 sentences of constructive feedback about how these emotional states might have affected the interview performance, along with 2 specific suggestions for improvement.
         """
-        response = ollama.chat(
-            model    = LLM,
-            options  = CFG,
+        response = chat(
+            "sentiment_feedback",
+            **route("sentiment_feedback"),
+            deadline = deadline,
             messages = [
                 {'role': 'system', 'content': "You are a helpful interview coach providing constructive feedback."},
                 {'role': 'user', 'content': feedback_prompt}
@@ -373,4 +882,5 @@ def voice_sentiment(session_id):
     return result
 
 if __name__ == "__main__":
+    start()
     app.run(host = '0.0.0.0', debug=True)
\ No newline at end of file
@@ -0,0 +1,198 @@
+import os
+import re
+import json
+import time
+import threading
+import subprocess
+
+import numpy as np
+
+import metrics
+
+from coach         import FrameAnalyser, InterviewAnalytics, analyze_frames, build_report, read_exactly, CASCADE, SAMPLE_FPS, FRAME_SCALE
+from transcription import StreamingTranscriber, SAMPLE_RATE, VAD_FRAME, VAD_THRESHOLD
+
+FILLER_WORDS = ["um", "uh", "er", "ah", "like", "you know", "basically", "actually", "literally", "sort of", "kind of"]
+
+class NoStreams(Exception):
+    """Raised for an upload with neither a video nor an audio stream."""
+
+def probe(path):
+    """Video size, duration and whether there is an audio stream, via ffprobe"""
+    output = subprocess.run(
+        ['ffprobe', '-v', 'error', '-print_format', 'json', '-show_streams', '-show_format', path],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True
+    ).stdout
+
+    info    = json.loads(output)
+    streams = info.get('streams', [])
+    video   = next((s for s in streams if s.get('codec_type') == 'video'), None)
+
+    duration = info.get('format', {}).get('duration')
+
+    return {
+        "width"    : video['width'] if video else None,
+        "height"   : video['height'] if video else None,
+        "duration" : float(duration) if duration not in (None, "N/A") else None,
+        "audio"    : any(s.get('codec_type') == 'audio' for s in streams),
+    }
+
+def speech_pacing(text, speech_seconds, total_seconds):
+    words   = re.findall(r"[\w']+", text.lower())
+    fillers = {}
+
+    for filler in FILLER_WORDS:
+        count = len(re.findall(rf"\b{filler}\b", text.lower()))
+
+        if count > 0:
+            fillers[filler] = count
+
+    return {
+        "words_per_minute" : round(len(words) / (total_seconds / 60)) if total_seconds > 0 else 0,
+        "speaking_time"    : int(speech_seconds),
+        "pause_ratio"      : round(1 - speech_seconds / total_seconds, 2) if total_seconds > 0 else 0,
+        "filler_words"     : fillers,
+    }
+
+def analyse_media(path, cascade=CASCADE):
+    """
+    Full coaching report for an uploaded WebM from a single FFmpeg pass.
+
+    One FFmpeg process demuxes and decodes the container once, writing
+    downscaled RGB frames at SAMPLE_FPS to stdout and 16 kHz mono PCM to a
+    second pipe. The frames go straight to the MediaPipe analysers; the PCM
+    goes to a StreamingTranscriber (and the speech/pause counter) on its own
+    thread, so neither stream waits on the other. Returns the transcript,
+    the body-language report from coach.py and speech pacing.
+    """
+    info  = probe(path)
+    video = info['width'] is not None
+
+    if not video and not info['audio']:
+        raise NoStreams("The recording has neither a video nor an audio stream")
+
+    command = ['ffmpeg', '-loglevel', 'error', '-i', path]
+
+    if video:
+        width  = max(2, round(info['width'] * FRAME_SCALE / 2) * 2)
+        height = max(2, round(info['height'] * FRAME_SCALE / 2) * 2)
+
+        command += [
+            '-map', '0:v:0',
+            '-vf', f'fps={SAMPLE_FPS},scale={width}:{height}',
+            '-pix_fmt', 'rgb24',
+            '-f', 'rawvideo',
+            'pipe:1'
+        ]
+
+    audio_read, audio_write = os.pipe()
+    audio                   = os.fdopen(audio_read, 'rb')
+
+    if info['audio']:
+        command += [
+            '-map', '0:a:0',
+            '-ac', '1',
+            '-ar', str(SAMPLE_RATE),
+            '-f', 's16le',
+            f'pipe:{audio_write}'
+        ]
+
+    start = time.perf_counter()
+
+    try:
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            pass_fds=(audio_write,)
+        )
+    except BaseException:
+        audio.close()
+        raise
+    finally:
+        # Only FFmpeg writes to the audio pipe, so it ends when FFmpeg does.
+        os.close(audio_write)
+
+    transcriber = None
+    reader      = None
+    speech      = {"samples": 0, "voiced": 0}
+    frames      = []
+    stats       = None
+
+    def read_audio():
+        frame = int(VAD_FRAME * SAMPLE_RATE)
+
+        while chunk := audio.read(frame * 2 * 64):
+            if transcriber is None:
+                continue
+
+            transcriber.feed_pcm(chunk)
+
+            samples = np.frombuffer(chunk[:len(chunk) - len(chunk) % (frame * 2)], dtype=np.int16)
+            levels  = samples.astype(np.float32).reshape(-1, frame) / 32768.0
+
+            speech["samples"] += len(chunk) // 2
+            speech["voiced"]  += int((np.sqrt(np.mean(levels ** 2, axis=1)) >= VAD_THRESHOLD).sum()) * frame
+
+    try:
+        if info['audio']:
+            transcriber = StreamingTranscriber(auto_translate_non_english=True, decode_webm=False)
+
+        reader = threading.Thread(target=read_audio, daemon=True)
+        reader.start()
+
+        if video:
+            # Every frame is read into the same buffer (see coach.read_frames).
+            image  = np.empty((height, width, 3), dtype=np.uint8)
+            buffer = memoryview(image).cast('B')
+
+            with FrameAnalyser(cascade) as analyser:
+                while read_exactly(process.stdout, buffer):
+                    frames.append(analyser.process_rgb(image, len(frames) / SAMPLE_FPS))
+
+            stats = analyser.stats
+    except BaseException:
+        process.kill()
+
+        if transcriber is not None:
+            transcriber.cancel()
+
+        raise
+    finally:
+        process.stdout.close()
+        process.wait()
+
+        if reader is not None:
+            reader.join()
+
+        audio.close()
+
+    metrics.FFMPEG_SECONDS.observe(time.perf_counter() - start, output="combined")
+
+    duration = info['duration'] or max(len(frames) / SAMPLE_FPS, speech["samples"] / SAMPLE_RATE)
+
+    report = {"duration": int(duration)}
+
+    if video:
+        analytics = InterviewAnalytics()
+        analytics.session_start_time = 0.0
+        analytics.session_end_time   = duration
+
+        analyze_frames(frames, analytics)
+
+        report['body_language']           = build_report(analytics)
+        report['body_language']['frames'] = stats
+
+    if transcriber is not None:
+        transcript = transcriber.finish()
+
+        report['transcript'] = transcript
+        report['speech']     = speech_pacing(
+            transcript['text'],
+            speech["voiced"] / SAMPLE_RATE,
+            speech["samples"] / SAMPLE_RATE
+        )
+
+    return report
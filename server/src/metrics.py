@@ -0,0 +1,239 @@
+import time
+import random
+import logging
+import threading
+
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+# Fraction of debug messages logged through sample_debug(). Prompts are large,
+# so dumping every one of them is not an option outside of local debugging.
+DEBUG_SAMPLE_RATE = 0.05
+
+# Seconds. Covers everything from a single MediaPipe frame to a full /feedback.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+REGISTRY = []
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, description):
+        self.name        = name
+        self.description = description
+        self.values      = {}
+        self.lock        = threading.Lock()
+
+        REGISTRY.append(self)
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, labels, value) for labels, value in self.values.items()]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, description, function=None):
+        super().__init__(name, description)
+        self.function = function
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def samples(self):
+        if self.function is not None:
+            return [(self.name, (), self.function())]
+
+        return super().samples()
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, description, buckets=BUCKETS):
+        super().__init__(name, description)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+
+        with self.lock:
+            if key not in self.values:
+                self.values[key] = [[0] * len(self.buckets), 0, 0.0]
+
+            counts, _, _ = entry = self.values[key]
+
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+
+            entry[1] += 1
+            entry[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        output = []
+
+        with self.lock:
+            for labels, (counts, count, total) in self.values.items():
+                for bound, bucket in zip(self.buckets, counts):
+                    output.append((f"{self.name}_bucket", labels + (("le", str(bound)),), bucket))
+
+                output.append((f"{self.name}_bucket", labels + (("le", "+Inf"),), count))
+                output.append((f"{self.name}_count", labels, count))
+                output.append((f"{self.name}_sum", labels, total))
+
+        return output
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route"
+)
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds",
+    "Duration of named stages inside a request"
+)
+LLM_SECONDS = Histogram(
+    "llm_request_duration_seconds",
+    "Wall time of ollama chat calls"
+)
+LLM_PROMPT_SECONDS = Histogram(
+    "llm_prompt_eval_seconds",
+    "Prompt processing (prefill) time reported by ollama"
+)
+LLM_PROMPT_TOKENS = Counter(
+    "llm_prompt_tokens_total",
+    "Prompt tokens processed by ollama"
+)
+LLM_COMPLETION_TOKENS = Counter(
+    "llm_completion_tokens_total",
+    "Tokens generated by ollama"
+)
+LLM_SCHEMA_TOKENS = Histogram(
+    "llm_structured_output_tokens",
+    "Tokens generated per structured (JSON schema) reply, by schema",
+    buckets=(16, 32, 64, 128, 256, 384, 512, 768, 1024, 2048)
+)
+LLM_INVALID_OUTPUTS = Counter(
+    "llm_invalid_outputs_total",
+    "Structured replies that failed validation, by schema and whether a retry fixed them"
+)
+LLM_QUEUE_SECONDS = Histogram(
+    "llm_queue_wait_seconds",
+    "Time LLM requests waited for an admission slot, by priority"
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total",
+    "LLM requests retried after a transient error"
+)
+LLM_REJECTED = Counter(
+    "llm_rejected_total",
+    "LLM requests turned away by admission control, by priority"
+)
+WHISPER_RTF = Histogram(
+    "whisper_real_time_factor",
+    "Whisper decode time divided by audio duration",
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5)
+)
+FFMPEG_SECONDS = Histogram(
+    "ffmpeg_duration_seconds",
+    "Time spent converting recordings with ffmpeg"
+)
+MEDIAPIPE_SECONDS = Histogram(
+    "mediapipe_frame_seconds",
+    "Per-frame MediaPipe inference time by model",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+RESPONSE_REPLAYS = Counter(
+    "next_response_replays_total",
+    "Retried next_response calls answered from an earlier request, by whether it was still running"
+)
+CACHE_REQUESTS = Counter(
+    "result_cache_requests_total",
+    "Result cache lookups by cache and outcome (hit or miss)"
+)
+CACHE_BYTES = Gauge(
+    "result_cache_bytes",
+    "Bytes held by each result cache"
+)
+CACHE_EVICTIONS = Counter(
+    "result_cache_evictions_total",
+    "Entries evicted from each result cache to stay within its size limit"
+)
+STORAGE_BYTES = Gauge(
+    "storage_bytes",
+    "Bytes kept in each upload/recording folder, as of the last janitor sweep"
+)
+STORAGE_FILES = Gauge(
+    "storage_files",
+    "Files kept in each upload/recording folder, as of the last janitor sweep"
+)
+STORAGE_FREE_BYTES = Gauge(
+    "storage_free_bytes",
+    "Free space on the volume holding the uploads"
+)
+STORAGE_REMOVED = Counter(
+    "storage_removed_total",
+    "Stored entries deleted by the janitor, by folder and reason"
+)
+
+PROFILE_CAPTURES = Counter(
+    "profile_captures_total",
+    "Requests run under the sampling profiler, by route and trigger (header or sampled)"
+)
+
+def escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def render():
+    """Render every registered metric in the Prometheus text format."""
+    lines = []
+
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+
+        for name, labels, value in metric.samples():
+            if labels:
+                labels = ",".join(f'{k}="{escape(str(v))}"' for k, v in labels)
+                lines.append(f"{name}{{{labels}}} {value}")
+            else:
+                lines.append(f"{name} {value}")
+
+    return "\n".join(lines) + "\n"
+
+@contextmanager
+def span(stage):
+    """Time one stage of a request, e.g. span("start_interview.scrape")."""
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        log.debug("%s took %.3fs", stage, elapsed)
+
+def sample_debug(logger, msg, *args):
+    """Log at debug level for a DEBUG_SAMPLE_RATE fraction of calls."""
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < DEBUG_SAMPLE_RATE:
+        logger.debug(msg, *args)
@@ -0,0 +1,265 @@
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import random
+import logging
+import ipaddress
+import threading
+import functools
+
+from collections import Counter
+from datetime    import datetime
+from uuid        import uuid4
+
+from flask import request, make_response
+
+import metrics
+
+from storage import PROFILE_FOLDER
+
+log = logging.getLogger(__name__)
+
+# A view decorated with @profiled is run under a sampling profiler when the
+# request carries PROFILE_HEADER, or for a PROFILE_SAMPLE_RATE fraction of
+# requests. Other requests only pay for the header lookup.
+#
+#   X-Profile: 1     samples the thread handling the request
+#   X-Profile: all   samples every thread, e.g. the grading pool during /feedback
+#
+# When ADMIN_TOKEN is set, the header is ignored unless X-Admin-Token matches,
+# and the same token is needed for the /admin endpoints. Without a token only
+# local clients (a loopback peer, not through a proxy) may use either.
+PROFILE_HEADER      = 'X-Profile'
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+ADMIN_TOKEN         = os.environ.get('ADMIN_TOKEN')
+
+# Seconds between samples, and the number of functions kept in profile.json.
+SAMPLE_INTERVAL = 0.005
+TOP_FUNCTIONS   = 40
+
+# With every thread sampled, idle ones (pool workers waiting for work) are
+# left out: only stacks running code from this directory are kept.
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+REQUEST_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+CAPTURE_ID = re.compile(r"^[A-Za-z0-9_-]{1,80}$")
+FILES      = ("profile.json", "stacks.folded")
+
+def local():
+    """Whether the request comes straight from this machine."""
+    try:
+        peer = ipaddress.ip_address(request.remote_addr or "")
+    except ValueError:
+        return False
+
+    # A proxy on the same host connects from loopback on everyone's behalf.
+    return peer.is_loopback and 'X-Forwarded-For' not in request.headers
+
+def authorized():
+    if ADMIN_TOKEN is None:
+        return local()
+
+    # Bytes: compare_digest refuses str with non-ASCII characters.
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), ADMIN_TOKEN.encode())
+
+def request_id():
+    """
+    A new capture id, starting with the client's X-Request-Id if that is
+    usable in a file name. The suffix keeps a reused id from overwriting an
+    earlier capture.
+    """
+    given  = request.headers.get('X-Request-Id', "")
+    suffix = uuid4().hex
+
+    return f"{given}-{suffix[:12]}" if REQUEST_ID.match(given) else suffix
+
+def frame_name(frame):
+    code = frame.f_code
+
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class Sampler(threading.Thread):
+    """
+    Records the Python stack of the target thread (or of every thread) each
+    SAMPLE_INTERVAL seconds until stopped. Stacks are counted by thread name
+    and frames, root first.
+    """
+
+    def __init__(self, target=None, interval=SAMPLE_INTERVAL):
+        super().__init__(name="profiler", daemon=True)
+
+        self.target   = target
+        self.interval = interval
+        self.stacks   = Counter()
+        self.samples  = 0
+        self.stopped  = threading.Event()
+
+    def sample(self):
+        names  = {thread.ident: thread.name for thread in threading.enumerate()}
+        frames = sys._current_frames()
+
+        for ident, frame in frames.items():
+            if ident == self.ident or (self.target is not None and ident != self.target):
+                continue
+
+            stack = []
+            ours  = False
+
+            while frame is not None:
+                stack.append(frame_name(frame))
+                ours  = ours or frame.f_code.co_filename.startswith(SOURCE_DIR)
+                frame = frame.f_back
+
+            if self.target is None and not ours:
+                continue
+
+            self.stacks[(names.get(ident, str(ident)), *reversed(stack))] += 1
+
+        self.samples += 1
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+def folded(stacks):
+    """Stacks in the collapsed format read by flamegraph.pl and speedscope."""
+    return "".join(
+        ";".join(part.replace(";", ":") for part in stack) + f" {count}\n"
+        for stack, count in stacks.most_common()
+    )
+
+def top(stacks, limit=TOP_FUNCTIONS):
+    """
+    Samples per function, like pstats' tottime and cumtime: `self` counts
+    samples where it was the running frame, `total` where it was anywhere on
+    the stack. Sorted by `self`; the flamegraph shows the cumulative view.
+    """
+    own, total = Counter(), Counter()
+
+    for (_, *frames), count in stacks.items():
+        if not frames:
+            continue
+
+        own[frames[-1]] += count
+
+        for name in set(frames):
+            total[name] += count
+
+    ranked = sorted(total, key=lambda name: (own[name], total[name]), reverse=True)
+
+    return [
+        {"function": name, "self": own[name], "total": total[name]}
+        for name in ranked[:limit]
+    ]
+
+def save(capture_id, sampler, details):
+    path = os.path.join(PROFILE_FOLDER, capture_id)
+    os.makedirs(path, exist_ok=True)
+
+    with open(os.path.join(path, "stacks.folded"), 'w') as f:
+        f.write(folded(sampler.stacks))
+
+    details |= {
+        "samples"    : sampler.samples,
+        "interval_s" : sampler.interval,
+        "top"        : top(sampler.stacks),
+    }
+
+    with open(os.path.join(path, "profile.json"), 'w') as f:
+        json.dump(details, f, indent=2)
+
+def trigger():
+    """Why this request should be profiled, or None if it should not be."""
+    header = request.headers.get(PROFILE_HEADER, "0")
+
+    if header != "0" and authorized():
+        return "header"
+
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+
+    return None
+
+def profiled(view):
+    """Run the view under the sampling profiler when trigger() says so."""
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        reason = trigger()
+
+        if reason is None:
+            return view(*args, **kwargs)
+
+        every      = request.headers.get(PROFILE_HEADER) == "all"
+        capture_id = request_id()
+        sampler    = Sampler(None if every else threading.get_ident())
+        started    = datetime.now()
+        start      = time.perf_counter()
+
+        sampler.start()
+
+        response = None
+
+        try:
+            response = make_response(view(*args, **kwargs))
+            response.headers['X-Request-Id'] = capture_id
+        finally:
+            sampler.stop()
+
+            # A view that raised is still saved, with the error as its status.
+            status = response.status_code if response is not None else repr(sys.exc_info()[1])
+
+            try:
+                save(capture_id, sampler, {
+                    "request_id" : capture_id,
+                    "route"      : request.url_rule.rule,
+                    "method"     : request.method,
+                    "path"       : request.path,
+                    "status"     : status,
+                    "trigger"    : reason,
+                    "threads"    : "all" if every else "request",
+                    "started"    : started.isoformat(),
+                    "wall_s"     : round(time.perf_counter() - start, 4),
+                })
+
+                metrics.PROFILE_CAPTURES.inc(route=request.url_rule.rule, trigger=reason)
+            except OSError as e:
+                log.warning("Could not save profile %s: %s", capture_id, e)
+
+        return response
+
+    return wrapper
+
+def captures(limit=None):
+    """Saved profile summaries (without the function table), newest first."""
+    output = []
+
+    for entry in os.scandir(PROFILE_FOLDER):
+        try:
+            with open(os.path.join(entry.path, "profile.json")) as f:
+                details = json.load(f)
+        except (OSError, ValueError):
+            continue
+
+        details.pop("top", None)
+        output.append(details)
+
+    output.sort(key=lambda details: details['started'], reverse=True)
+
+    return output[:limit]
+
+def capture_path(capture_id, name):
+    """Path of one saved file, or None if there is no such capture."""
+    if not CAPTURE_ID.match(capture_id) or name not in FILES:
+        return None
+
+    path = os.path.join(PROFILE_FOLDER, capture_id, name)
+
+    return path if os.path.isfile(path) else None
@@ -1,9 +1,12 @@
 import cloudscraper
-from lxml import html
+from lxml import html, etree
+import io
 import json
 import time
 import re
 
+from urllib.parse import urlparse
+
 def extract_role_info(title):
     """Extract role, department, and workflow from title"""
     parts = title.split(' | ')[0].split(', ')
@@ -34,6 +37,229 @@ def extract_list_items(elements):
             items.append(text)
     return items
 
+# A site's job pages are read by its Adapter: the XPaths below are compiled
+# once, when the adapter is built. Fields are one of
+#   title  the page title, split by extract_role_info
+#   text   the matching text nodes, joined
+#   list   the matching list items (see extract_list_items)
+HEADING_FIELDS = {
+    "title"                    : ("title", '//title/text()'),
+    "company_description"      : ("text",  '//h3[contains(text(), "Company Description")]/following-sibling::p[1]//text()'),
+    "job_description"          : ("text",  '//h3[contains(text(), "Job Description")]/following-sibling::p[2]//text()'),
+    "key_responsibilities"     : ("list",  '//h3[contains(text(), "Job Description")]/following-sibling::ul[1]/li//text()'),
+    "basic_qualifications"     : ("list",  '//h3[contains(text(), "Qualifications")]/following-sibling::ul[1]/li//text()'),
+    "preferred_qualifications" : ("list",  '//h3[contains(text(), "Qualifications")]/following-sibling::ul[2]/li//text()'),
+}
+
+# Parse pages over SUBTREE_MIN_KB only up to the end of the last element an
+# adapter reads (its `until`), instead of building the tree for the whole
+# page. Below that the incremental parser costs more than it saves.
+SUBTREE        = True
+SUBTREE_MIN_KB = 64
+
+# Schema.org JobPosting metadata, when a page embeds it, is read straight from
+# the raw HTML without parsing the page at all.
+JSON_LD = re.compile(rb'<script[^>]*application/ld\+json[^>]*>(.*?)</script>', re.S | re.I)
+
+class Adapter:
+    """
+    How to read a job posting off one site's pages. `hosts` are the domains
+    it applies to (subdomains included), `fields` maps job_data keys to
+    (kind, XPath) and `until` is a (tag, XPath) pair naming the last element
+    needed, for SUBTREE parsing. A fixed `company` overrides the pages.
+    """
+
+    def __init__(self, name, hosts=(), company=None, fields=HEADING_FIELDS, until=None):
+        self.name    = name
+        self.hosts   = hosts
+        self.company = company
+        self.fields  = {field: (kind, etree.XPath(path)) for field, (kind, path) in fields.items()}
+        self.until   = until and (until[0], etree.XPath(until[1]))
+
+    def matches(self, host):
+        return any(host == h or host.endswith("." + h) for h in self.hosts)
+
+    def parse(self, content):
+        """The page's root element; with SUBTREE, of a tree built only up to `until`."""
+        if not (SUBTREE and self.until) or len(content) < SUBTREE_MIN_KB * 1024:
+            return html.fromstring(content)
+
+        tag, last = self.until
+        context   = etree.iterparse(io.BytesIO(content), events=("end",), tag=tag, html=True)
+
+        for _, element in context:
+            if last(element):
+                return element.getroottree().getroot()
+
+        return context.root
+
+    def extract(self, content):
+        root     = self.parse(content)
+        job_data = {}
+
+        for field, (kind, path) in self.fields.items():
+            values = path(root)
+
+            if not values:
+                continue
+
+            if kind == "title":
+                job_data.update(extract_role_info(values[0].strip()))
+            elif kind == "text":
+                job_data[field] = clean_text(' '.join(values))
+            else:
+                job_data[field] = extract_list_items(values)
+
+        if self.company:
+            job_data['company'] = self.company
+
+        return job_data
+
+ADAPTERS = [
+    Adapter(
+        "servicenow",
+        hosts   = ("servicenow.com",),
+        company = "ServiceNow",
+        # The preferred qualifications: the second list after the heading.
+        until   = ("ul", 'preceding-sibling::h3[contains(text(), "Qualifications")] and count(preceding-sibling::ul[preceding-sibling::h3[contains(text(), "Qualifications")]]) = 1'),
+    ),
+]
+
+# Any other site: the same headings, and the site name from its metadata.
+GENERIC = Adapter(
+    "generic",
+    fields = {**HEADING_FIELDS, "company": ("text", '/html/head/meta[@property="og:site_name"]/@content')},
+)
+
+def adapter_for(url):
+    host = (urlparse(url).hostname or "").lower()
+
+    return next((adapter for adapter in ADAPTERS if adapter.matches(host)), GENERIC)
+
+def empty_job():
+    return {
+        'role': '',
+        'location': '',
+        'department': '',
+        'workflow': '',
+        'company': '',
+        'company_description': '',
+        'job_description': '',
+        'key_responsibilities': [],
+        'basic_qualifications': [],
+        'preferred_qualifications': []
+    }
+
+def find_job_posting(content):
+    """The first schema.org JobPosting in the page's JSON-LD blocks, or None"""
+    for match in JSON_LD.finditer(content):
+        try:
+            data = json.loads(match.group(1))
+        except ValueError:
+            continue
+
+        items = data if isinstance(data, list) else data.get('@graph', [data]) if isinstance(data, dict) else []
+
+        for item in items:
+            kind = item.get('@type') if isinstance(item, dict) else None
+
+            if kind == 'JobPosting' or (isinstance(kind, list) and 'JobPosting' in kind):
+                return item
+
+    return None
+
+def first(value):
+    return value[0] if isinstance(value, list) and value else value
+
+def plain(value):
+    return clean_text(value) if isinstance(value, str) else ''
+
+def html_text(value):
+    """Text of a JSON-LD property that may hold HTML, without its lists"""
+    if not isinstance(value, str) or '<' not in value:
+        return plain(value)
+
+    fragment = html.fragment_fromstring(value, create_parent='div')
+
+    for element in fragment.xpath('.//ul | .//ol'):
+        element.drop_tree()
+
+    return clean_text(fragment.text_content())
+
+def html_items(value):
+    """List items of a JSON-LD property: a list, an HTML list or one per line"""
+    if isinstance(value, list):
+        return [item for v in value for item in html_items(v)]
+
+    if not isinstance(value, str):
+        return []
+
+    if '<' in value:
+        fragment = html.fragment_fromstring(value, create_parent='div')
+        items    = [li.text_content() for li in fragment.iter('li')] or [fragment.text_content()]
+    else:
+        items = [line.strip(' \t•*-') for line in value.splitlines()]
+
+    return extract_list_items(items)
+
+def job_from_posting(posting):
+    """job_data fields from a JobPosting; whatever it does not say is left out"""
+    organization = first(posting.get('hiringOrganization')) or {}
+    location     = first(posting.get('jobLocation')) or {}
+    address      = first(location.get('address')) if isinstance(location, dict) else None
+
+    if isinstance(organization, str):
+        organization = {'name': organization}
+
+    if isinstance(address, str):
+        address = {'addressLocality': address}
+
+    if not isinstance(organization, dict):
+        organization = {}
+
+    if not isinstance(address, dict):
+        address = {}
+
+    job_data = {
+        'role'                     : plain(posting.get('title')),
+        'location'                 : plain(address.get('addressLocality')),
+        'department'               : plain(first(posting.get('occupationalCategory') or posting.get('industry'))),
+        'company'                  : plain(organization.get('name')),
+        'company_description'      : html_text(organization.get('description')),
+        'job_description'          : html_text(posting.get('description')),
+        'key_responsibilities'     : html_items(posting.get('responsibilities')),
+        'basic_qualifications'     : html_items(posting.get('qualifications')) + html_items(posting.get('experienceRequirements')),
+        'preferred_qualifications' : [],
+    }
+
+    if not job_data['location'] and posting.get('jobLocationType') == 'TELECOMMUTE':
+        job_data['location'] = 'Remote'
+
+    return {field: value for field, value in job_data.items() if value}
+
+def extract_job(content, url):
+    """
+    job_data from a fetched page. JSON-LD JobPosting metadata is the fast
+    path; a site with its own adapter fills in what the metadata leaves
+    out, and any other page without it is read by GENERIC.
+    """
+    job_data = empty_job()
+    posting  = find_job_posting(content)
+    adapter  = adapter_for(url)
+
+    if posting is not None:
+        job_data.update(job_from_posting(posting))
+
+    if posting is None or (adapter is not GENERIC and not all(job_data.values())):
+        found = adapter.extract(content)
+
+        if posting is None:
+            job_data.update(found)
+        else:
+            job_data.update({field: value for field, value in found.items() if not job_data.get(field)})
+
+    return job_data
+
 def scrape_job(url):
     # Create a scraper instance
     scraper = cloudscraper.create_scraper(
@@ -50,55 +276,8 @@ def scrape_job(url):
         print(f"Fetching {url}...")
         response = scraper.get(url)
         response.raise_for_status()
-        
-        # Parse the HTML
-        tree = html.fromstring(response.content)
-        
-        # Initialize the job data structure
-        job_data = {
-            'role': '',
-            'location': '',
-            'department': '',
-            'workflow': '',
-            'company': 'ServiceNow',
-            'company_description': '',
-            'job_description': '',
-            'key_responsibilities': [],
-            'basic_qualifications': [],
-            'preferred_qualifications': []
-        }
-        
-        # Get and parse the title
-        title = tree.xpath('//title/text()')
-        if title:
-            title_info = extract_role_info(title[0].strip())
-            job_data.update(title_info)
-        
-        # Get company description from p tag under h3
-        company_desc = tree.xpath('//h3[contains(text(), "Company Description")]/following-sibling::p[1]//text()')
-        if company_desc:
-            job_data['company_description'] = clean_text(' '.join(company_desc))
-        
-        # Get job description from second p tag under Job Description h3
-        job_desc = tree.xpath('//h3[contains(text(), "Job Description")]/following-sibling::p[2]//text()')
-        if job_desc:
-            job_data['job_description'] = clean_text(' '.join(job_desc))
-        
-        # Get responsibilities from Job Description section
-        job_resp = tree.xpath('//h3[contains(text(), "Job Description")]/following-sibling::ul[1]/li//text()')
-        if job_resp:
-            job_data['key_responsibilities'] = extract_list_items(job_resp)
-        
-        # Get qualifications - first ul is basic, second ul is preferred
-        basic_quals = tree.xpath('//h3[contains(text(), "Qualifications")]/following-sibling::ul[1]/li//text()')
-        if basic_quals:
-            job_data['basic_qualifications'] = extract_list_items(basic_quals)
-        
-        preferred_quals = tree.xpath('//h3[contains(text(), "Qualifications")]/following-sibling::ul[2]/li//text()')
-        if preferred_quals:
-            job_data['preferred_qualifications'] = extract_list_items(preferred_quals)
-        
-        return job_data
+
+        return extract_job(response.content, url)
 
     except Exception as e:
         print(f"Error: {e}")
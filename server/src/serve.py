@@ -0,0 +1,131 @@
+"""
+Serve the app from WORKERS processes forked from one master, which loads
+the Whisper weights (and imports torch, MediaPipe and OpenCV) first. The
+workers then share a single copy of the weights instead of each loading
+its own on the first transcription.
+
+    WORKERS=4 uv run src/serve.py
+
+Worker i listens on PORT + i. Interview sessions live in the memory of the
+worker that started them, so the proxy in front has to keep each client on
+one worker (e.g. nginx `ip_hash` over the worker ports).
+
+Only worker 0 runs the storage janitor; every worker marks the sessions it
+holds as live in storage.SESSION_FOLDER, and the janitor keeps their files.
+The /api/coach result cache is tracked per worker, so COACH_CACHE_MB holds
+for each worker's view of the cache rather than for the folder as a whole.
+"""
+import os
+import gc
+import time
+import signal
+import logging
+
+from werkzeug.serving import make_server
+
+log = logging.getLogger(__name__)
+
+WORKERS = int(os.environ.get('WORKERS', 1))
+HOST    = os.environ.get('HOST', '0.0.0.0')
+PORT    = int(os.environ.get('PORT', 5000))
+
+# Torch threads per worker, so N workers do not each start one per core.
+TORCH_THREADS = max(1, (os.cpu_count() or 1) // WORKERS)
+
+# Seconds to wait before replacing a worker that exited.
+RESTART_DELAY = 1
+
+def preload(whisper_model_name="base"):
+    """Load everything the workers should share, then fork-proof it."""
+    # Imported here rather than at the top: coach's shard workers are spawned
+    # and import this script again, and should not load torch for nothing.
+    import transcription
+
+    transcription.preload(whisper_model_name)
+
+    # Only their Python objects matter here: the native libraries are
+    # file-backed and shared between processes either way.
+    import cv2
+    import mediapipe
+
+    # Keep the collector in the workers from touching (and so copying) the
+    # pages holding everything loaded so far.
+    gc.freeze()
+
+def run_worker(index):
+    # A replacement worker is forked after the master installed its handlers.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    import torch
+
+    torch.set_num_threads(TORCH_THREADS)
+
+    # Started after the fork: main starts threads (the janitor) of its own,
+    # and only worker 0 should sweep the shared folders.
+    import main
+
+    main.start(sweep = index == 0)
+
+    server = make_server(HOST, PORT + index, main.app, threaded=True)
+
+    log.info("Worker %d (pid %d) listening on %s:%d", index, os.getpid(), HOST, PORT + index)
+    server.serve_forever()
+
+def fork(index):
+    pid = os.fork()
+
+    if pid == 0:
+        code = 1
+
+        try:
+            run_worker(index)
+            code = 0
+        except KeyboardInterrupt:
+            code = 0
+        except Exception:
+            log.exception("Worker %d failed", index)
+        finally:
+            os._exit(code)
+
+    return pid
+
+def serve():
+    logging.basicConfig(level = os.environ.get('LOG_LEVEL', 'INFO'))
+
+    preload()
+
+    workers  = {fork(index): index for index in range(WORKERS)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+
+        index = workers.pop(pid, None)
+
+        if index is None or stopping:
+            continue
+
+        log.warning("Worker %d exited with status %d, restarting it", index, os.waitstatus_to_exitcode(status))
+        time.sleep(RESTART_DELAY)
+
+        workers[fork(index)] = index
+
+if __name__ == "__main__":
+    serve()
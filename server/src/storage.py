@@ -0,0 +1,317 @@
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+
+from collections import OrderedDict
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+UPLOAD_FOLDER = 'uploads'
+RECORD_FOLDER = 'recordings'
+
+# Coach uploads do not belong to an interview session, so each one is its
+# own entry in here.
+COACH_FOLDER  = os.path.join(UPLOAD_FOLDER, 'coach')
+
+# Sampling profiler captures (see profiling.py), one directory per request.
+PROFILE_FOLDER = 'profiles'
+
+FOLDERS = [UPLOAD_FOLDER, RECORD_FOLDER, COACH_FOLDER, PROFILE_FOLDER]
+
+# Retention. An entry (a session directory, a single coach upload or a
+# profile) is deleted once nothing in it has changed for RETENTION_HOURS, and
+# the oldest entries go first while a folder is over its quota. Sessions still
+# held in memory are never deleted.
+RETENTION_HOURS = float(os.environ.get('RETENTION_HOURS', 24))
+QUOTA_MB        = {
+    UPLOAD_FOLDER  : int(os.environ.get('UPLOAD_QUOTA_MB', 512)),
+    RECORD_FOLDER  : int(os.environ.get('RECORD_QUOTA_MB', 4096)),
+    COACH_FOLDER   : int(os.environ.get('COACH_QUOTA_MB', 2048)),
+    PROFILE_FOLDER : int(os.environ.get('PROFILE_QUOTA_MB', 256)),
+}
+
+# Interview sessions untouched for this long are dropped from memory, after
+# which their files fall under the limits above like everything else.
+SESSION_IDLE_HOURS = float(os.environ.get('SESSION_IDLE_HOURS', 2))
+
+# One empty marker file per live session, touched on every request for it.
+# Sessions live in the memory of one worker (see serve.py) but the janitor
+# runs in only one, so it learns which sessions are live from these.
+SESSION_FOLDER = 'sessions'
+
+# Stored /api/coach reports, by upload hash and analysis settings. Not swept
+# by the janitor: the cache evicts the least recently used reports itself.
+# Its index is kept per process, so with several workers each one holds the
+# folder to the quota on its own, and together they can exceed it.
+CACHE_FOLDER   = os.path.join('cache', 'coach')
+CACHE_QUOTA_MB = int(os.environ.get('COACH_CACHE_MB', 64))
+
+# Seconds between janitor sweeps, and the minimum age before the quota can
+# evict an entry (so an upload is not deleted while it is being analysed).
+JANITOR_INTERVAL = 300
+GRACE_SECONDS    = 600
+
+for folder in FOLDERS + [CACHE_FOLDER, SESSION_FOLDER]:
+    os.makedirs(folder, exist_ok=True)
+
+def session_dir(folder, session_id):
+    path = os.path.join(folder, session_id)
+    os.makedirs(path, exist_ok=True)
+
+    return path
+
+def session_files(folder, session_id, suffixes=None):
+    """Files stored for one session, oldest name first."""
+    path = os.path.join(folder, session_id)
+
+    if not os.path.isdir(path):
+        return []
+
+    return sorted(
+        entry.path for entry in os.scandir(path)
+        if entry.is_file() and (suffixes is None or entry.name.endswith(suffixes))
+    )
+
+def touch_session(session_id):
+    """Mark a session as live for the janitor of any worker."""
+    path = os.path.join(SESSION_FOLDER, session_id)
+
+    with open(path, 'a'):
+        pass
+
+    os.utime(path)
+
+def marked_sessions(now=None):
+    """Session ids with a marker newer than SESSION_IDLE_HOURS; deletes the rest."""
+    now    = time.time() if now is None else now
+    cutoff = now - SESSION_IDLE_HOURS * 3600
+    live   = set()
+
+    for entry in os.scandir(SESSION_FOLDER):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                discard(entry.path)
+            else:
+                live.add(entry.name)
+        except FileNotFoundError:
+            continue
+
+    return live
+
+def discard(path):
+    """Delete a file or directory, ignoring it if it is already gone."""
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def usage(path):
+    """Total size in bytes, file count and newest mtime under path."""
+    if not os.path.isdir(path):
+        stat = os.stat(path)
+        return stat.st_size, 1, stat.st_mtime
+
+    size, files, newest = 0, 0, 0.0
+
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                stat = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+
+            size   += stat.st_size
+            files  += 1
+            newest  = max(newest, stat.st_mtime)
+
+    # An empty directory is as old as the directory itself.
+    return size, files, newest or os.stat(path).st_mtime
+
+def entries(folder):
+    """(name, size, files, newest mtime) for each entry directly in folder."""
+    output = []
+
+    for entry in os.scandir(folder):
+        # The coach folder lives inside uploads but is swept on its own.
+        if entry.path in FOLDERS:
+            continue
+
+        try:
+            output.append((entry.name, *usage(entry.path)))
+        except FileNotFoundError:
+            continue
+
+    return output
+
+def sweep(active=frozenset(), now=None):
+    """
+    Apply the age and size limits to every folder once. `active` holds the
+    session ids that must be kept, on top of those with a recent marker.
+    Returns the number of entries deleted.
+    """
+    now     = time.time() if now is None else now
+    active  = set(active) | marked_sessions(now)
+    cutoff  = now - RETENTION_HOURS * 3600
+    removed = 0
+
+    for folder in FOLDERS:
+        kept = []
+
+        for name, size, files, newest in entries(folder):
+            if name not in active and newest < cutoff:
+                discard(os.path.join(folder, name))
+                metrics.STORAGE_REMOVED.inc(folder=folder, reason="age")
+                removed += 1
+            else:
+                kept.append((newest, name, size, files))
+
+        total = sum(size for _, _, size, _ in kept)
+        quota = QUOTA_MB[folder] * 1024 * 1024
+
+        # Oldest first, until the folder fits again.
+        for newest, name, size, files in sorted(kept):
+            if total <= quota:
+                break
+
+            if name in active or newest > now - GRACE_SECONDS:
+                continue
+
+            discard(os.path.join(folder, name))
+            metrics.STORAGE_REMOVED.inc(folder=folder, reason="quota")
+            removed += 1
+
+            kept.remove((newest, name, size, files))
+            total   -= size
+
+        if total > quota:
+            log.warning("%s is %d MB over its quota after cleanup", folder, (total - quota) // (1024 * 1024))
+
+        metrics.STORAGE_BYTES.set(total, folder=folder)
+        metrics.STORAGE_FILES.set(sum(files for _, _, _, files in kept), folder=folder)
+
+    metrics.STORAGE_FREE_BYTES.set(shutil.disk_usage(UPLOAD_FOLDER).free)
+
+    return removed
+
+class Janitor(threading.Thread):
+    """Background thread that calls sweep() every JANITOR_INTERVAL seconds."""
+
+    def __init__(self, active=lambda: (), interval=JANITOR_INTERVAL):
+        super().__init__(name="janitor", daemon=True)
+
+        self.active   = active
+        self.interval = interval
+        self.stopped  = threading.Event()
+
+    def run(self):
+        while True:
+            try:
+                removed = sweep(frozenset(self.active()))
+
+                if removed:
+                    log.info("Janitor removed %d stored entries", removed)
+            except Exception:
+                log.exception("Janitor sweep failed")
+
+            if self.stopped.wait(self.interval):
+                return
+
+    def stop(self):
+        self.stopped.set()
+
+class ResultCache:
+    """
+    JSON documents on disk, one file per key, holding at most max_mb. Reading
+    an entry marks it as used; the least recently used go first.
+    """
+
+    def __init__(self, folder, max_mb, name):
+        self.folder  = folder
+        self.limit   = max_mb * 1024 * 1024
+        self.name    = name
+        self.lock    = threading.Lock()
+        self.entries = OrderedDict()
+        self.size    = 0
+
+        files = []
+
+        for entry in os.scandir(folder):
+            if entry.name.endswith('.json'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.size        += size
+
+        self.trim()
+
+    def path(self, key):
+        return os.path.join(self.folder, f"{key}.json")
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                metrics.CACHE_REQUESTS.inc(cache=self.name, outcome="miss")
+                return None
+
+            self.entries.move_to_end(key)
+
+        try:
+            with open(self.path(key)) as f:
+                value = json.load(f)
+
+            os.utime(self.path(key))
+        except (OSError, ValueError):
+            metrics.CACHE_REQUESTS.inc(cache=self.name, outcome="miss")
+            self.remove(key)
+            return None
+
+        metrics.CACHE_REQUESTS.inc(cache=self.name, outcome="hit")
+
+        return value
+
+    def put(self, key, value):
+        data = json.dumps(value)
+        temp = self.path(key) + ".tmp"
+
+        with open(temp, 'w') as f:
+            f.write(data)
+
+        os.replace(temp, self.path(key))
+
+        with self.lock:
+            self.size        -= self.entries.pop(key, 0)
+            self.entries[key] = len(data)
+            self.size        += len(data)
+
+        self.trim()
+
+    def remove(self, key):
+        with self.lock:
+            self.size -= self.entries.pop(key, 0)
+
+        discard(self.path(key))
+
+    def trim(self):
+        with self.lock:
+            evicted = []
+
+            while self.size > self.limit and self.entries:
+                key, size  = self.entries.popitem(last=False)
+                self.size -= size
+                evicted.append(key)
+
+            metrics.CACHE_BYTES.set(self.size, cache=self.name)
+
+        for key in evicted:
+            discard(self.path(key))
+            metrics.CACHE_EVICTIONS.inc(cache=self.name)
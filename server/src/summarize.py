@@ -0,0 +1,172 @@
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+
+from gateway import chat
+from llm     import route
+
+log = logging.getLogger(__name__)
+
+# Every call made here fits in TOKEN_BUDGET tokens of context, prompt and
+# reply together, however long the interview was. Token counts are estimated
+# at CHARS_PER_TOKEN characters per token.
+TOKEN_BUDGET    = 4096
+CHARS_PER_TOKEN = 4
+PROMPT_TOKENS   = 400      # Instructions and framing around the content
+TURN_TOKENS     = 192      # Reply budget for one turn's summary
+REDUCE_TOKENS   = 512      # Reply budget for merging several summaries
+REPORT_TOKENS   = 768      # Reply budget for the final report
+
+SUMMARY_WORKERS = 4
+
+summarizer = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="summarizer")
+
+SYSTEM = "You are an expert interview analyst. Provide clear, balanced, and constructive interview summaries."
+
+def tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def clip(text, budget):
+    """Cut text down to roughly `budget` tokens."""
+    limit = budget * CHARS_PER_TOKEN
+
+    return text if len(text) <= limit else text[:limit] + " [...]"
+
+def complete(call, prompt, reply_tokens):
+    target  = route(call)
+    options = {**target['options'], 'num_ctx': TOKEN_BUDGET, 'num_predict': reply_tokens}
+
+    response = chat(
+        call,
+        model    = target['model'],
+        options  = options,
+        messages = [
+            {'role': 'system', 'content': SYSTEM},
+            {'role': 'user', 'content': prompt}
+        ]
+    )
+
+    return response.message.content.strip()
+
+def segments(history):
+    """
+    Split the history into one list of messages per question: the question,
+    the answers to it and the interviewer's replies. The introduction before
+    the first question is left out.
+    """
+    output = []
+
+    for message in history:
+        if message['role'] == "assistant" and message.get('question_id') is not None:
+            output.append([message])
+        elif output:
+            output[-1].append(message)
+
+    return output
+
+def evaluation_digest(evaluation):
+    parts = [f"Grade: {evaluation['grade']}"]
+
+    for key, title in [("strengths", "Strengths"), ("areas_for_improvement", "To improve")]:
+        if evaluation.get(key):
+            parts.append(f"{title}: " + "; ".join(evaluation[key]))
+
+    return "\n".join(parts)
+
+def summarize_turn(segment, evaluation=None):
+    """
+    A short summary of one question and its answers. When the only answer
+    has already been graded, the evaluation stands in for the LLM call.
+    """
+    question = segment[0]['content']
+    answers  = [m['content'] for m in segment[1:] if m['role'] == "user"]
+
+    if evaluation is not None and len(answers) == 1:
+        try:
+            result = evaluation.result()
+
+            if result.get('grade') is not None:
+                return f"Question: {question}\nAnswer: {clip(answers[0], TURN_TOKENS)}\n{evaluation_digest(result)}"
+        except Exception as e:
+            log.warning("Evaluation unavailable for summary, summarizing instead: %s", e)
+
+    budget = TOKEN_BUDGET - PROMPT_TOKENS - TURN_TOKENS
+    text   = "\n".join(f"{m['role']}: {m['content']}" for m in segment)
+
+    prompt = f"""
+    Summarize this part of a job interview in at most five sentences: what was asked, what the candidate said (skills, experiences, examples) and how well the answer addressed the question.
+
+    {clip(text, budget)}
+    """
+
+    return f"Question: {question}\n" + complete("summary_turn", prompt, TURN_TOKENS)
+
+def batches(parts, budget):
+    """
+    Group consecutive parts so each group fits in `budget` tokens. Parts are
+    clipped to half the budget, so every group merges at least two.
+    """
+    groups = [[]]
+    size   = 0
+
+    for part in parts:
+        part = clip(part, budget // 2)
+        cost = tokens(part)
+
+        if groups[-1] and size + cost > budget:
+            groups.append([])
+            size = 0
+
+        groups[-1].append(part)
+        size += cost
+
+    return groups
+
+def reduce(parts):
+    """Merge summaries level by level until they fit in one final prompt."""
+    budget = TOKEN_BUDGET - PROMPT_TOKENS - REPORT_TOKENS
+
+    while sum(tokens(part) for part in parts) > budget and len(parts) > 1:
+        groups  = batches(parts, TOKEN_BUDGET - PROMPT_TOKENS - REDUCE_TOKENS)
+        prompts = [
+            "Merge these summaries of consecutive parts of a job interview into one summary, keeping every distinct skill, example and assessment:\n\n"
+            + "\n\n".join(group)
+            for group in groups
+        ]
+
+        parts = list(summarizer.map(lambda prompt: complete("summary_reduce", prompt, REDUCE_TOKENS), prompts))
+
+    return [clip(part, budget) for part in parts]
+
+def summarize(session):
+    """The /summarize report, built map-reduce style from per-turn summaries."""
+    with session.lock:
+        turns = segments(session.history)
+
+    summaries = list(summarizer.map(
+        lambda segment: summarize_turn(segment, session.evaluations.get(segment[0]['question_id'])),
+        turns
+    ))
+
+    content = "\n\n".join(reduce(summaries)) if summaries else "The candidate did not answer any questions."
+
+    prompt = f"""
+    Generate a comprehensive summary of this job interview from these summaries of each question.
+
+    Job Type: {session.mode}
+    Focus Areas: {', '.join(session.keywords) if session.keywords else 'General'}
+
+    Interview Content:
+    {content}
+
+    Please include:
+    1. Main topics discussed
+    2. Key skills and experiences highlighted
+    3. Overall impression
+    4. Areas where the candidate showed strength
+    5. Areas where the candidate could improve
+
+    Keep the summary concise but thorough, focusing on the most important aspects of the interview.
+    """
+
+    return complete("summary", prompt, REPORT_TOKENS)
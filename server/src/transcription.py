@@ -2,6 +2,14 @@ import whisper
 import os
 import subprocess
 import tempfile
+import threading
+import queue
+import time
+import itertools
+
+import metrics
+
+import numpy as np
 
 from pyannote.audio import Pipeline
 from typing         import Optional, Dict, List, Any
@@ -10,6 +18,15 @@ from typing         import Optional, Dict, List, Any
 whisper_model = None
 current_whisper_model = None
 
+# Streaming transcription settings
+SAMPLE_RATE     = 16000    # Whisper's native input rate
+VAD_FRAME       = 0.03     # Seconds of audio per voice-activity decision
+VAD_THRESHOLD   = 0.01     # RMS (of full scale) above which a frame is speech
+MIN_SEGMENT     = 3.0      # Don't cut segments shorter than this
+MAX_SEGMENT     = 20.0     # Always cut here, well inside Whisper's 30s window
+SILENCE_TO_CUT  = 0.5      # Seconds of silence that end a segment
+PROMPT_CONTEXT  = 200      # Characters of previous text fed to the next segment
+
 
 def load_models(whisper_model_name="base"):
     """Load the Whisper models"""
@@ -24,6 +41,29 @@ def load_models(whisper_model_name="base"):
 
     return whisper_model
 
+def share_weights(model):
+    """
+    Prepare a loaded model to be shared by forked workers: weights are moved
+    to shared memory, so no worker ever gets a private copy-on-write copy of
+    them, and gradients are switched off since they are only read.
+    """
+    model.eval()
+
+    for parameter in model.parameters():
+        parameter.requires_grad_(False)
+
+    # Module.share_memory() fails on the sparse alignment_heads buffer,
+    # which is tiny anyway.
+    for tensor in itertools.chain(model.parameters(), model.buffers()):
+        if not tensor.is_sparse:
+            tensor.share_memory_()
+
+    return model
+
+def preload(whisper_model_name="base"):
+    """Load the Whisper model in a master process before workers are forked from it"""
+    return share_weights(load_models(whisper_model_name))
+
 def convert_webm_to_mp3(webm_file_path):
     """Convert WebM file to MP3 format using FFmpeg"""
     try:
@@ -45,12 +85,13 @@ def convert_webm_to_mp3(webm_file_path):
         ]
 
         # Run FFmpeg command
-        process = subprocess.run(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            check=True
-        )
+        with metrics.FFMPEG_SECONDS.time(output="mp3"):
+            process = subprocess.run(
+                command,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                check=True
+            )
 
         print(f"Converted {webm_file_path} to {mp3_file_path}")
         return mp3_file_path
@@ -61,6 +102,20 @@ def convert_webm_to_mp3(webm_file_path):
         print(f"Error converting WebM to MP3: {e}")
         raise
 
+def timed_transcribe(audio, **kwargs):
+    """whisper_model.transcribe on a 16 kHz float array, recording its real-time factor"""
+    start  = time.perf_counter()
+    result = whisper_model.transcribe(audio, **kwargs)
+
+    duration = len(audio) / SAMPLE_RATE
+    if duration > 0:
+        metrics.WHISPER_RTF.observe(
+            (time.perf_counter() - start) / duration,
+            task=kwargs.get("task", "transcribe")
+        )
+
+    return result
+
 def transcribe_webm(file_path, whisper_model_name="base", translate_to_english=False, auto_translate_non_english=True):
     """
     Transcribe a WebM file by first converting it to MP3, without speaker diarization.
@@ -83,9 +138,12 @@ def transcribe_webm(file_path, whisper_model_name="base", translate_to_english=F
         # Load models
         load_models(whisper_model_name)
 
+        # Decode once and reuse the samples for every pass below.
+        audio = whisper.load_audio(mp3_file_path)
+
         # First, detect the language with a transcription
-        detect_result = whisper_model.transcribe(
-            mp3_file_path,
+        detect_result = timed_transcribe(
+            audio,
             verbose=False,
             task="transcribe"
         )
@@ -94,8 +152,8 @@ def transcribe_webm(file_path, whisper_model_name="base", translate_to_english=F
         should_translate  = translate_to_english or (auto_translate_non_english and detected_language != "en")
 
         # Transcribe using just Whisper
-        whisper_result = whisper_model.transcribe(
-            mp3_file_path,
+        whisper_result = timed_transcribe(
+            audio,
             verbose=False
         )
 
@@ -103,8 +161,8 @@ def transcribe_webm(file_path, whisper_model_name="base", translate_to_english=F
         # perform translation
         if should_translate:
             # Perform translation to English
-            translate_result = whisper_model.transcribe(
-                mp3_file_path,
+            translate_result = timed_transcribe(
+                audio,
                 verbose=False,
                 task="translate"
             )
@@ -128,4 +186,231 @@ def transcribe_webm(file_path, whisper_model_name="base", translate_to_english=F
         # Clean up the temporary MP3 file
         if os.path.exists(mp3_file_path):
             os.remove(mp3_file_path)
-            print(f"Removed temporary MP3 file: {mp3_file_path}")
\ No newline at end of file
+            print(f"Removed temporary MP3 file: {mp3_file_path}")
+
+class StreamingTranscriber:
+    """
+    Transcribe a WebM recording while it is still being recorded.
+
+    Chunks passed to feed() are piped through a single FFmpeg process that
+    decodes them to 16 kHz mono PCM. With decode_webm=False there is no
+    FFmpeg process, and callers that already have 16 kHz mono s16le PCM
+    pass it to feed_pcm() instead. The PCM is cut into segments at pauses
+    (a simple energy-based VAD), and each finished segment is handed to
+    Whisper on a background thread, with the tail of the previous text as
+    its prompt so context carries across the cut. When the answer ends,
+    finish() only has to decode the last partial segment.
+
+    finish() returns the same shape as transcribe_webm.
+    """
+
+    def __init__(self, whisper_model_name="base", translate_to_english=False, auto_translate_non_english=True, on_segment=None, decode_webm=True):
+        load_models(whisper_model_name)
+
+        self.translate_to_english       = translate_to_english
+        self.auto_translate_non_english = auto_translate_non_english
+        self.on_segment                 = on_segment
+
+        self.language   = None
+        self.translated = False
+        self.texts      = []
+
+        self.segmenter = Segmenter()
+        self.partial   = b""
+        self.segments  = queue.Queue()
+        self.error     = None
+        self.ffmpeg    = None
+        self.decoder   = threading.Thread(target=self._decode, daemon=True)
+
+        self.decoder.start()
+
+        if not decode_webm:
+            return
+
+        self.ffmpeg = subprocess.Popen(
+            [
+                'ffmpeg',
+                '-loglevel', 'error',
+                '-i', 'pipe:0',          # WebM chunks as they arrive
+                '-vn',                   # No video
+                '-ac', '1',              # Mono
+                '-ar', str(SAMPLE_RATE), # Whisper sample rate
+                '-f', 's16le',           # Raw PCM
+                'pipe:1'
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    def feed(self, chunk):
+        """Append a chunk of the WebM stream."""
+        self.ffmpeg.stdin.write(chunk)
+        self.ffmpeg.stdin.flush()
+
+    def feed_pcm(self, chunk):
+        """Append 16 kHz mono s16le PCM, cutting off any finished segments."""
+        chunk        = self.partial + chunk
+        usable       = len(chunk) - len(chunk) % 2
+        self.partial = chunk[usable:]
+
+        samples = np.frombuffer(chunk[:usable], dtype=np.int16)
+
+        for segment in self.segmenter.push(samples.astype(np.float32) / 32768.0):
+            self.segments.put(segment)
+
+    @property
+    def text(self):
+        """The transcript of the segments decoded so far."""
+        return "".join(self.texts)
+
+    def finish(self):
+        """Flush the last partial segment and return the full result."""
+        if self.ffmpeg is not None:
+            self.ffmpeg.stdin.close()
+            self.reader.join()
+            self.ffmpeg.wait()
+        else:
+            self._flush()
+
+        self.decoder.join()
+
+        if self.error is not None:
+            raise self.error
+
+        return {
+            "text": self.text,
+            "language": self.language or "unknown",
+            "translated": self.translated
+        }
+
+    def cancel(self):
+        """Abandon the stream, e.g. when the client disconnects."""
+        self.error = RuntimeError("Transcription cancelled")
+
+        if self.ffmpeg is not None:
+            self.ffmpeg.kill()
+        else:
+            self._flush()
+
+    def _read(self):
+        frame = int(VAD_FRAME * SAMPLE_RATE) * 2
+
+        while chunk := self.ffmpeg.stdout.read(frame * 8):
+            self.feed_pcm(chunk)
+
+        self._flush()
+
+    def _flush(self):
+        # End of stream: whatever is left is the final segment.
+        rest = self.segmenter.rest()
+
+        if len(rest) > 0:
+            self.segments.put(rest)
+
+        self.segments.put(None)
+
+    def _decode(self):
+        while (segment := self.segments.get()) is not None:
+            if self.error is not None:
+                continue
+
+            try:
+                self.texts.append(self._transcribe(segment))
+            except Exception as e:
+                self.error = e
+                continue
+
+            if self.on_segment is not None:
+                self.on_segment(self.text)
+
+    def _transcribe(self, segment):
+        prompt = self.text[-PROMPT_CONTEXT:] or None
+
+        if self.language is None:
+            # The first segment decides the language for the whole answer.
+            result        = timed_transcribe(segment, verbose=False, task="transcribe", initial_prompt=prompt)
+            self.language = result.get("language", "unknown")
+
+            self.translated = self.translate_to_english or (self.auto_translate_non_english and self.language != "en")
+
+            if not self.translated:
+                return result["text"]
+
+        task = "translate" if self.translated else "transcribe"
+
+        return timed_transcribe(
+            segment,
+            verbose=False,
+            task=task,
+            language=self.language,
+            initial_prompt=prompt
+        )["text"]
+
+class Segmenter:
+    """
+    Cuts PCM into segments as it arrives: at the first pause of
+    SILENCE_TO_CUT after MIN_SEGMENT seconds, or unconditionally at
+    MAX_SEGMENT. Chunks are joined once per segment and each VAD frame's
+    level is computed once, so the cost stays linear in the audio.
+    """
+
+    def __init__(self):
+        self.frame   = int(VAD_FRAME * SAMPLE_RATE)
+        self.minimum = int(MIN_SEGMENT * SAMPLE_RATE) // self.frame
+        self.maximum = int(MAX_SEGMENT * SAMPLE_RATE)
+        self.needed  = int(SILENCE_TO_CUT / VAD_FRAME)
+
+        self.reset()
+
+    def reset(self):
+        self.chunks = []
+        self.tail   = np.zeros(0, dtype=np.float32)
+        self.frames = 0
+        self.run    = 0
+
+    def push(self, samples):
+        """Add samples, returning the segments they complete."""
+        segments = []
+
+        while (cut := self.scan(samples)) is not None:
+            audio   = self.rest()
+            samples = audio[cut:]
+
+            segments.append(audio[:cut])
+            self.reset()
+
+        return segments
+
+    def scan(self, samples):
+        """Buffer samples; the index to cut the segment at, or None."""
+        self.chunks.append(samples)
+
+        # Only the frame left incomplete by the last chunk is joined here.
+        tail      = np.concatenate([self.tail, samples])
+        count     = len(tail) // self.frame
+        levels    = np.sqrt(np.mean(tail[:count * self.frame].reshape(count, self.frame) ** 2, axis=1))
+        self.tail = tail[count * self.frame:]
+
+        for level in levels:
+            index        = self.frames
+            self.frames += 1
+
+            if index >= self.minimum:
+                self.run = self.run + 1 if level < VAD_THRESHOLD else 0
+
+            if self.run >= self.needed:
+                # Cut in the middle of the pause.
+                return (index + 1 - self.needed // 2) * self.frame
+
+        if self.frames * self.frame + len(self.tail) >= self.maximum:
+            return self.maximum
+
+        return None
+
+    def rest(self):
+        """The samples buffered since the last cut."""
+        return np.concatenate(self.chunks) if self.chunks else np.zeros(0, dtype=np.float32)